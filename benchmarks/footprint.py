@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Report the memory used by the objects of the package.
+
+Run it with ``python benchmarks/footprint.py``.  We allocate many instances of
+each type and measure the bytes they take with `tracemalloc`:mod:.  The
+shared parts (e.g. the process of each replica) are allocated beforehand, so
+they are not accounted.
+
+Then we report how the memory grows with the data: the bytes per element of
+the sets (each one adds the elements one at a time and removes half of them),
+and the bytes per process of clocks and counters.  Next to the bytes measured
+with `tracemalloc`:mod:, we show the share of causal metadata and tombstones
+reported by `~xotl.crdt.base.CvRDT.sizeof`:meth:.
+
+"""
+
+import gc
+import tracemalloc
+
+from xotl.crdt.base import Process
+from xotl.crdt.clocks import Dot, VClock
+from xotl.crdt.counter import GCounter, PNCounter
+from xotl.crdt.register import LWWRegister
+from xotl.crdt.sets import GSet, ORSet, TwoPhaseSet, USet
+
+INSTANCES = 10_000
+
+PROCESSES = [Process(f"R{i}", i) for i in range(3)]
+R0 = PROCESSES[0]
+DOTS = [Dot(p, 1) for p in PROCESSES]
+
+CASES = {
+    "Process": lambda i: Process(f"R{i}", i),
+    "Dot": lambda i: Dot(R0, i),
+    "VClock (3 processes)": lambda i: VClock(DOTS),
+    "GCounter": lambda i: GCounter(process=R0),
+    "PNCounter": lambda i: PNCounter(process=R0),
+    "LWWRegister": lambda i: LWWRegister(process=R0),
+    "GSet": lambda i: GSet(process=R0),
+    "TwoPhaseSet": lambda i: TwoPhaseSet(process=R0),
+    "USet": lambda i: USet(process=R0),
+    "ORSet": lambda i: ORSet(process=R0),
+}
+
+
+def measure(factory, instances=INSTANCES):
+    "Return the average number of bytes of the objects built by `factory`."
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = [factory(i) for i in range(instances)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # Discount the list holding the objects.
+    overhead = objects.__sizeof__()
+    return (after - before - overhead) / instances
+
+
+SIZES = (10, 100, 1000, 10_000)
+# Merging counters is quadratic on the number of processes.
+PROCESS_SIZES = (10, 100, 1000)
+
+
+def grow_set(cls, size):
+    "Return a factory of a set with `size` elements added (half removed)."
+    items = list(range(1000, 1000 + size))
+
+    def factory():
+        result = cls(process=R0)
+        for item in items:
+            result.add(item)
+        if hasattr(result, "remove"):
+            for item in items[::2]:
+                result.remove(item)
+        return result
+
+    return factory
+
+
+def grow_clock(size):
+    "Return a factory of a clock with `size` processes."
+    processes = [Process(f"R{i}", i) for i in range(size)]
+    return lambda: VClock([Dot(p, 1) for p in processes])
+
+
+def grow_counter(size):
+    "Return a factory of a counter which has seen `size` processes."
+    processes = [Process(f"R{i}", i) for i in range(size)]
+
+    def factory():
+        result = GCounter(process=R0)
+        for p in processes:
+            other = GCounter(process=p)
+            other.incr()
+            result.merge(other)
+        return result
+
+    return factory
+
+
+def measure_one(factory):
+    "Return the object built by `factory` and the bytes it allocated."
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = factory()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+
+def growth():
+    print(f"{'':<12} {'size':>6} {'bytes/element':>14} {'metadata':>9}")
+    for cls in (GSet, TwoPhaseSet, USet, ORSet):
+        for size in SIZES:
+            replica, used = measure_one(grow_set(cls, size))
+            footprint = replica.sizeof()
+            share = footprint.metadata / footprint.total
+            print(f"{cls.__name__:<12} {size:>6} {used / size:14.1f} {share:9.1%}")
+    print()
+    print(f"{'':<12} {'size':>6} {'bytes/process':>14} {'metadata':>9}")
+    for name, build in (("VClock", grow_clock), ("GCounter", grow_counter)):
+        for size in PROCESS_SIZES:
+            obj, used = measure_one(build(size))
+            if isinstance(obj, VClock):
+                share = 1.0
+            else:
+                footprint = obj.sizeof()
+                share = footprint.metadata / footprint.total
+            print(f"{name:<12} {size:>6} {used / size:14.1f} {share:9.1%}")
+
+
+def main():
+    width = max(len(name) for name in CASES)
+    for name, factory in CASES.items():
+        print(f"{name:<{width}}  {measure(factory):8.1f} bytes")
+    print()
+    growth()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""The benchmark suite of the package.
+
+Run it with ``python benchmarks/run.py``.  It measures the time per call of
+the operations on clocks, counters, registers and sets, and of
+`~xotl.crdt.base.get_state`:func: and `~xotl.crdt.base.from_state`:func:.
+Sets are measured with 10**3 to 10**5 items; pass ``--full`` to include
+10**6.
+
+Options:
+
+``--output FILE``
+   Write the results as JSON to FILE.
+
+``--baseline FILE``
+   Compare the results with those in FILE (written with ``--output``), and
+   exit with status 1 if any benchmark is slower than the baseline by more
+   than the tolerance (``--tolerance``, 0.25 by default) plus the spread of
+   both measures.
+
+``--filter TEXT``
+   Only run the benchmarks whose name contains TEXT.
+
+Each benchmark is timed several times (with the garbage collector
+disabled); the result is the median, and the *spread* is the interquartile
+range relative to the median.  A noisy benchmark gets a wider margin.
+
+Timings depend on the host; keep a baseline per host (e.g. save it with
+``--output benchmarks/baseline.json`` before upgrading).
+
+"""
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import typing as t
+from itertools import cycle
+
+from xotl.crdt.base import Process, from_state, get_state
+from xotl.crdt.clocks import Dot, VClock
+from xotl.crdt.counter import GCounter, PNCounter
+from xotl.crdt.register import LWWRegister
+from xotl.crdt.sets import GSet, ORSet
+
+CLOCK_SIZES = (2, 10, 100, 1000)
+SET_SIZES = (10**3, 10**4, 10**5)
+FULL_SET_SIZES = SET_SIZES + (10**6,)
+# The (approximate) time to spend in each benchmark.
+TARGET = 0.5
+
+R0 = Process("R0", 0)
+R1 = Process("R1", 1)
+
+# A benchmark returns a pair `(prepare, action)`.  `prepare()` returns the
+# argument for each call of `action` (not timed).
+Benchmark = t.Callable[
+    [], t.Tuple[t.Callable[[], t.Any], t.Callable[[t.Any], t.Any]]
+]
+
+
+def clock(size: int, offset: int = 0) -> VClock:
+    "Return a clock with `size` processes."
+    return VClock([Dot(Process(f"R{i}", i), i + 1 + offset) for i in range(size)])
+
+
+def gset(size: int, start: int = 0, process: Process = R0) -> GSet:
+    result = GSet(process=process)
+    result.add_many(range(start, start + size))
+    return result
+
+
+def orset(size: int, start: int = 0, process: Process = R0) -> ORSet:
+    result = ORSet(process=process)
+    result.add_many(range(start, start + size))
+    return result
+
+
+def none():
+    return None
+
+
+def benchmarks(full: bool = False) -> t.Dict[str, Benchmark]:
+    "Return the benchmarks by name."
+    result: t.Dict[str, Benchmark] = {}
+    for size in CLOCK_SIZES:
+        # Comparing equal (but not identical) clocks is the worst case: no
+        # early exit.
+        a, b, c = clock(size), clock(size, offset=1), clock(size)
+        p = Process("R0", 0)
+        result[f"vclock.compare[{size}]"] = lambda a=a, c=c: (none, lambda _: a >= c)
+        result[f"vclock.merge[{size}]"] = lambda a=a, b=b: (none, lambda _: a + b)
+        result[f"vclock.bump[{size}]"] = lambda a=a, p=p: (none, lambda _: a.bump(p))
+
+    def counter_incr():
+        counter = GCounter(process=R0)
+        return none, lambda _: counter.incr()
+
+    def counter_value():
+        counter = PNCounter(process=R0)
+        for i in range(100):
+            other = PNCounter(process=Process(f"R{i}", i))
+            other.incr(i + 1)
+            other.decr()
+            counter.merge(other)
+        return none, lambda _: counter.value
+
+    def register_set():
+        reg = LWWRegister(process=R0)
+        return none, lambda _: reg.set(1)
+
+    def register_merge():
+        ours, theirs = LWWRegister(process=R0), LWWRegister(process=R1)
+        ours.set(1)
+        theirs.set(2)
+        return ours.clone, lambda reg: reg.merge(theirs)
+
+    result["counter.incr"] = counter_incr
+    result["counter.value[100]"] = counter_value
+    result["register.set"] = register_set
+    result["register.merge"] = register_merge
+
+    for size in FULL_SET_SIZES if full else SET_SIZES:
+        for name, build in (("gset", gset), ("orset", orset)):
+
+            def add(build=build, size=size):
+                replica = build(size)
+                counter = iter(range(size, sys.maxsize))
+                return none, lambda _: replica.add(next(counter))
+
+            def merge(build=build, size=size):
+                ours = build(size)
+                theirs = build(size, start=size // 2, process=R1)
+                return ours.clone, lambda replica: replica.merge(theirs)
+
+            def value(build=build, size=size):
+                replica = build(size)
+                return none, lambda _: replica.value
+
+            def encode(build=build, size=size):
+                replica = build(size)
+                return none, lambda _: get_state(replica)
+
+            def decode(build=build, size=size):
+                state = get_state(build(size))
+                return none, lambda _: from_state(state)
+
+            result[f"{name}.add[{size}]"] = add
+            result[f"{name}.merge[{size}]"] = merge
+            result[f"{name}.value[{size}]"] = value
+            result[f"{name}.get_state[{size}]"] = encode
+            result[f"{name}.from_state[{size}]"] = decode
+
+        def remove(size=size):
+            replica = orset(size)
+            items = cycle(range(size))
+            return replica.clone, lambda replica: replica.remove(next(items))
+
+        result[f"orset.remove[{size}]"] = remove
+
+    return result
+
+
+def measure(benchmark: Benchmark, repeat: int = 9) -> t.Tuple[float, float]:
+    """Return the time (in seconds) per call of `benchmark`, and its spread.
+
+    The time is the median of `repeat` runs; the spread is the interquartile
+    range of the runs relative to the median.
+
+    """
+    prepare, action = benchmark()
+
+    def run(number):
+        args = [prepare() for _ in range(number)]
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for arg in args:
+                action(arg)
+            return time.perf_counter() - start
+        finally:
+            if enabled:
+                gc.enable()
+
+    number = 1
+    while run(number) < TARGET / repeat:
+        number *= 2
+    times = [run(number) / number for _ in range(repeat)]
+    q1, median, q3 = statistics.quantiles(times, n=4)
+    return median, (q3 - q1) / median
+
+
+def compare(
+    results: t.Dict[str, float],
+    baseline: t.Dict[str, float],
+    tolerance: float,
+    spreads: t.Optional[t.Dict[str, float]] = None,
+    baseline_spreads: t.Optional[t.Dict[str, float]] = None,
+) -> t.List[str]:
+    """Return the names of the benchmarks slower than the `baseline`.
+
+    A benchmark is slower if its time exceeds the baseline by more than the
+    `tolerance` plus the spreads of both measures.
+
+    """
+    spreads = spreads or {}
+    baseline_spreads = baseline_spreads or {}
+    return [
+        name
+        for name, seconds in results.items()
+        if name in baseline
+        and seconds
+        > baseline[name]
+        * (1 + tolerance + spreads.get(name, 0) + baseline_spreads.get(name, 0))
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--filter", default="")
+    parser.add_argument("--full", action="store_true")
+    args = parser.parse_args(argv)
+
+    baseline, baseline_spreads = {}, {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            report = json.load(f)
+        baseline = report["results"]
+        # Baselines written by previous versions have no spreads.
+        baseline_spreads = report.get("spreads", {})
+
+    results, spreads = {}, {}
+    for name, benchmark in benchmarks(args.full).items():
+        if args.filter in name:
+            seconds, spread = measure(benchmark)
+            results[name], spreads[name] = seconds, spread
+            line = f"{name:<32} {seconds * 1e6:14.3f} us {spread:7.1%}"
+            if name in baseline:
+                line += f" {seconds / baseline[name]:8.2f}x"
+            print(line, flush=True)
+
+    if args.output:
+        report = {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "results": results,
+            "spreads": spreads,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    regressions = compare(
+        results, baseline, args.tolerance, spreads, baseline_spreads
+    )
+    if regressions:
+        print(f"Slower than the baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
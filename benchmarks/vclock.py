@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Micro-benchmark of the comparison and hashing of vector clocks.
+
+Run it with ``python benchmarks/vclock.py``.  It reports the time per call (in
+microseconds) of ``>=``, ``==`` and `hash`:func: for clocks of several sizes.
+Each clock is built with a zero dot per process (like the one
+`~xotl.crdt.register.LWWRegister`:class: creates), plus the actual dots.
+
+"""
+
+import timeit
+
+from xotl.crdt.base import Process
+from xotl.crdt.clocks import Dot, VClock
+
+SIZES = (2, 10, 100, 1000)
+NUMBER = 2000
+
+
+def build(size):
+    "Return two equal clocks with `size` processes."
+    processes = [Process(f"R{i}", i) for i in range(size)]
+    zeros = [Process(f"Z{i}", size + i) for i in range(size)]
+    dots = [Dot(p, i + 1) for i, p in enumerate(processes)]
+    dots += [Dot(p, 0) for p in zeros]
+    copies = [Dot(d.process, d.counter) for d in reversed(dots)]
+    return VClock(dots), VClock(copies)
+
+
+def main():
+    print(f"{'size':>6} {'>=':>10} {'==':>10} {'hash':>10}")
+    for size in SIZES:
+        a, b = build(size)
+        number = max(NUMBER // size, 20)
+        namespace = {"a": a, "b": b}
+        results = [
+            min(timeit.repeat(stmt, globals=namespace, number=number, repeat=5))
+            / number
+            * 1e6
+            for stmt in ("a >= b", "a == b", "hash(a)")
+        ]
+        print(f"{size:>6}" + "".join(f" {r:10.2f}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
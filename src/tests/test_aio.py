@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+import asyncio
+import gc
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from xotl.crdt.aio import afrom_state, aget_state, amerge, amerge_chunked, weight
+from xotl.crdt.base import Process, from_state
+from xotl.crdt.sets import GSet, ORSet, TwoPhaseSet
+from xotl.crdt.sharded import ShardedORSet
+
+R0 = Process("R0", 0)
+R1 = Process("R1", 1)
+CLASSES = [GSet, ORSet, TwoPhaseSet, ShardedORSet]
+
+
+def replicas(cls):
+    ours, theirs = cls(process=R0), cls(process=R1)
+    ours.add_many(range(3000))
+    theirs.add_many(range(2000, 5000))
+    if hasattr(theirs, "remove_many"):
+        theirs.remove_many(range(2500, 2600))
+    expected = ours.clone()
+    expected.merge(theirs)
+    return ours, theirs, expected
+
+
+async def mutate(replica):
+    # Another coroutine changing the replica while it's being merged.
+    for i in range(1, 11):
+        replica.add(-i)
+        await asyncio.sleep(0)
+
+
+@pytest.mark.parametrize("cls", CLASSES)
+@pytest.mark.parametrize("executor", [None, ThreadPoolExecutor, ProcessPoolExecutor])
+def test_amerge(cls, executor):
+    ours, theirs, expected = replicas(cls)
+    expected.add_many(range(-10, 0))
+
+    async def main():
+        if executor is None:
+            await asyncio.gather(amerge(ours, theirs, threshold=1), mutate(ours))
+        else:
+            with executor(max_workers=2) as pool:
+                merge = amerge(ours, theirs, executor=pool, threshold=1)
+                await asyncio.gather(merge, mutate(ours))
+
+    asyncio.run(main())
+    assert ours.value == expected.value
+    assert theirs <= ours
+
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_amerge_chunked_yields(cls):
+    ours, theirs, expected = replicas(cls)
+    expected.add_many(range(-10, 0))
+
+    async def main():
+        await asyncio.gather(
+            amerge_chunked(ours, theirs, chunk_size=100), mutate(ours)
+        )
+
+    asyncio.run(main())
+    assert ours.value == expected.value
+    assert theirs <= ours
+
+
+def test_encode_and_decode():
+    ours, _, _ = replicas(ORSet)
+    assert weight(ours) >= 3000
+
+    async def main():
+        state = await aget_state(ours, threshold=1)
+        assert from_state(state) == ours
+        return await afrom_state(state, threshold=1)
+
+    assert asyncio.run(main()) == ours
+
+
+async def stalls(coro):
+    # Run `coro` and return the longest wait of the loop and the total time.
+    gaps = []
+    done = False
+
+    async def tick():
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    ticker = asyncio.create_task(tick())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    result = await coro
+    elapsed = time.perf_counter() - start
+    done = True
+    await ticker
+    return max(gaps), elapsed, result
+
+
+def test_the_loop_is_not_stalled():
+    # The longest wait of the loop must be a small part of the whole work; the
+    # collector is disabled because its collections stall the loop anyway.
+    ours, theirs = ORSet(process=R0), ORSet(process=R1)
+    ours.add_many(range(100_000))
+    theirs.add_many(range(50_000, 150_000))
+    expected = ours.clone()
+    expected.merge(theirs)
+
+    async def main():
+        results = [await stalls(amerge(ours, theirs))]
+        results.append(await stalls(aget_state(ours)))
+        state = results[-1][-1]
+        results.append(await stalls(afrom_state(state)))
+        return results
+
+    gc.disable()
+    try:
+        results = asyncio.run(main())
+    finally:
+        gc.enable()
+    for stall, elapsed, _ in results:
+        assert stall < elapsed / 4
+    assert ours == expected == results[-1][-1]
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+from base64 import b64decode
+
+import pytest
+
+from xotl.crdt.base import (
+    Footprint,
+    Metrics,
+    Process,
+    deep_sizeof,
+    from_state,
+    get_state,
+    set_metrics_sink,
+)
+from xotl.crdt.clocks import Dot, VClock
+from xotl.crdt.counter import GCounter, PNCounter
+from xotl.crdt.register import LWWRegister
+from xotl.crdt.sets import GSet, ORSet, TwoPhaseSet, USet
+
+R0 = Process("R0", 0)
+R1 = Process("R1", 1)
+
+# States dumped by release 0.3.0, before the classes used __slots__.
+PNCOUNTER_0_3 = (
+    "gASVHwEAAAAAAACMEXhvdGwuY3JkdC5jb3VudGVylIwJUE5Db3VudGVylJOUKYGUfZQojAdwcm9jZXNz"
+    "lIwOeG90bC5jcmR0LmJhc2WUjAdQcm9jZXNzlJOUKYGUfZQojARuYW1llIwCUjCUjAVvcmRlcpRLAHVi"
+    "jANwb3OUaACMCEdDb3VudGVylJOUKYGUfZQoaAVoCYwGdmNsb2NrlIwQeG90bC5jcmR0LmNsb2Nrc5SM"
+    "BlZDbG9ja5STlCmBlH2UjARkb3RzlGgUjANEb3SUk5QpgZR9lChoBWgJjAdjb3VudGVylEsCdWKFlHNi"
+    "dWKMA25lZ5RoECmBlH2UKGgFaAloE2gWKYGUfZRoGWgbKYGUfZQoaAVoCWgeSwF1YoWUc2J1YnViLg=="
+)
+REGISTER_0_3 = (
+    "gASV5QAAAAAAAACMEnhvdGwuY3JkdC5yZWdpc3RlcpSMC0xXV1JlZ2lzdGVylJOUKYGUfZQojAdwcm9j"
+    "ZXNzlIwOeG90bC5jcmR0LmJhc2WUjAdQcm9jZXNzlJOUKYGUfZQojARuYW1llIwCUjCUjAVvcmRlcpRL"
+    "AHVijAZ2Y2xvY2uUjBB4b3RsLmNyZHQuY2xvY2tzlIwGVkNsb2NrlJOUKYGUfZSMBGRvdHOUaA+MA0Rv"
+    "dJSTlCmBlH2UKGgFaAmMB2NvdW50ZXKUSwF1YoWUc2KMCXRpbWVzdGFtcJRLAYwEYXRvbZSMAXiUdWIu"
+)
+ORSET_0_3 = (
+    "gASV+QAAAAAAAACMDnhvdGwuY3JkdC5zZXRzlIwFT1JTZXSUk5QpgZR9lCiMB3Byb2Nlc3OUjA54b3Rs"
+    "LmNyZHQuYmFzZZSMB1Byb2Nlc3OUk5QpgZR9lCiMBG5hbWWUjAJSMJSMBW9yZGVylEsAdWKMBWl0ZW1z"
+    "lGgAjARVU2V0lJOUKYGUfZQoaAVoCYwGdmNsb2NrlIwQeG90bC5jcmR0LmNsb2Nrc5SMBlZDbG9ja5ST"
+    "lCmBlH2UjARkb3RzlGgUjANEb3SUk5QpgZR9lChoBWgJjAdjb3VudGVylEsDdWKFlHNiaA6PlChLAmgJ"
+    "SwKHlJB1YowFdGlja3OUSwJ1Yi4="
+)
+TPSET_0_3 = (
+    "gASVvAAAAAAAAACMDnhvdGwuY3JkdC5zZXRzlIwLVHdvUGhhc2VTZXSUk5QpgZR9lCiMB3Byb2Nlc3OU"
+    "jA54b3RsLmNyZHQuYmFzZZSMB1Byb2Nlc3OUk5QpgZR9lCiMBG5hbWWUjAJSMJSMBW9yZGVylEsAdWKM"
+    "BmxpdmluZ5RoAIwER1NldJSTlCmBlH2UKGgFaAmMBWl0ZW1zlI+UKEsBSwKQdWKMBGRlYWSUaBApgZR9"
+    "lChoBWgJaBOPlChLApB1YnViLg=="
+)
+
+
+@pytest.mark.parametrize(
+    "cls", [GCounter, PNCounter, LWWRegister, GSet, TwoPhaseSet, USet, ORSet]
+)
+def test_crdts_have_no_dict(cls):
+    crdt = cls(process=R0)
+    assert not hasattr(crdt, "__dict__")
+    assert from_state(get_state(crdt)) == crdt
+
+
+def test_value_types_have_no_dict():
+    for obj in (R0, Dot(R0, 1), VClock([Dot(R0, 1)])):
+        assert not hasattr(obj, "__dict__")
+
+
+def test_states_pickled_before_slots():
+    counter = from_state(b64decode(PNCOUNTER_0_3))
+    assert isinstance(counter, PNCounter)
+    assert counter.process == R0
+    assert counter.value == 1
+
+    register = from_state(b64decode(REGISTER_0_3))
+    assert isinstance(register, LWWRegister)
+    assert register.value == "x"
+    assert register.timestamp == 1
+
+    orset = from_state(b64decode(ORSET_0_3))
+    assert isinstance(orset, ORSet)
+    assert orset.value == {2}
+    orset.add(3)
+    assert orset.value == {2, 3}
+
+    tpset = from_state(b64decode(TPSET_0_3))
+    assert isinstance(tpset, TwoPhaseSet)
+    assert tpset.value == {1}
+
+
+def test_deep_sizeof_counts_shared_objects_once():
+    item = "x" * 100
+    assert deep_sizeof([item, item]) < deep_sizeof([item, "y" * 100])
+    seen: set = set()
+    assert deep_sizeof(item, seen) > 100
+    assert deep_sizeof(item, seen) == 0
+
+
+@pytest.mark.parametrize(
+    "cls", [GCounter, PNCounter, LWWRegister, GSet, TwoPhaseSet, USet, ORSet]
+)
+def test_sizeof(cls):
+    crdt = cls(process=R0)
+    footprint = crdt.sizeof()
+    assert isinstance(footprint, Footprint)
+    assert footprint.payload > 0
+    assert crdt.metadata_bytes == footprint.clock + footprint.tombstones
+
+
+def test_sizeof_splits_metadata():
+    gset = GSet(process=R0)
+    gset.add_many(range(1000, 2000))
+    assert gset.metadata_bytes == 0
+
+    tpset = TwoPhaseSet(process=R0)
+    tpset.add_many(range(1000, 2000))
+    before = tpset.sizeof()
+    tpset.remove_many(range(1000, 1500))
+    after = tpset.sizeof()
+    assert before.tombstones < after.tombstones
+    assert before.payload == after.payload
+
+    orset = ORSet(process=R0)
+    orset.add_many(range(1000, 2000))
+    footprint = orset.sizeof()
+    assert footprint.tombstones == 0
+    assert footprint.clock > 1000 * 8  # at least the tags
+    orset.remove_many(range(1000, 2000))
+    assert orset.sizeof().total < footprint.total
+
+    counter = GCounter(process=R0)
+    small = counter.metadata_bytes
+    for i in range(1, 10):
+        other = GCounter(process=Process(f"R{i}", i))
+        other.incr()
+        counter.merge(other)
+    assert counter.metadata_bytes > small
+
+
+def test_metrics():
+    ours, theirs = PNCounter(process=R0), PNCounter(process=R1)
+    theirs.incr()
+    merge = PNCounter.merge
+    metrics = Metrics()
+    assert set_metrics_sink(metrics) is None
+    try:
+        assert PNCounter.merge is not merge
+        ours.merge(theirs)
+        ours.merge(theirs)
+        assert ours <= theirs
+        state = get_state(ours)
+        assert from_state(state) == ours
+    finally:
+        assert set_metrics_sink(None) is metrics
+    assert PNCounter.merge is merge
+
+    counters = metrics.counters
+    # Nested merges and comparisons (of the GCounters) are not measured.
+    assert counters[("PNCounter", "merge")] == 2
+    assert counters[("PNCounter", "merge.noop")] == 1
+    assert counters[("PNCounter", "compare")] == 2
+    assert counters[("PNCounter", "encode")] == 1
+    assert counters[("PNCounter", "decode")] == 1
+    assert not any(kind == "GCounter" for kind, _ in counters)
+    histogram = metrics.histograms[("PNCounter", "encode.bytes")]
+    assert histogram.count == 1 and histogram.total == len(state)
+    assert metrics.histograms[("PNCounter", "merge.seconds")].count == 2
+
+    # Disabled metrics are not recorded.
+    ours.merge(theirs)
+    assert counters[("PNCounter", "merge")] == 2
+
+
+def test_metrics_of_classes_defined_while_enabled():
+    metrics = Metrics()
+    set_metrics_sink(metrics)
+    try:
+
+        class Max(GCounter):
+            __slots__ = ()
+
+            def merge(self, other):
+                super().merge(other)
+
+        Max(process=R0).merge(Max(process=R1))
+    finally:
+        set_metrics_sink(None)
+    assert metrics.counters[("Max", "merge")] == 1
+    assert not hasattr(Max.merge, "_measured")
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+from xotl.crdt.base import Process
+from xotl.crdt.cmrdt import OpORSet
+from xotl.crdt.testing.cmrdt import (
+    OpGCounterMachine,
+    OpLWWRegisterMachine,
+    OpORSetMachine,
+    OpPNCounterMachine,
+)
+
+TestOpGCounter = OpGCounterMachine.TestCase
+TestOpPNCounter = OpPNCounterMachine.TestCase
+TestOpLWWRegister = OpLWWRegisterMachine.TestCase
+TestOpORSet = OpORSetMachine.TestCase
+
+
+def test_operations_wait_for_their_dependencies():
+    r0, r1, r2 = (OpORSet(process=Process(f"R{i}", i)) for i in range(3))
+    added = r0.add(1)
+    r1.deliver(added)
+    removed = r1.remove(1)
+    # r2 gets the removal first: it must wait for the addition.
+    assert r2.deliver(removed) == []
+    assert len(r2.buffer) == 1
+    assert r2.deliver(added) == [added, removed]
+    assert r2.deliver(added) == []
+    assert r2.value == frozenset()
+    assert len(r2.buffer) == 0
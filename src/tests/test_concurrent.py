@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+import asyncio
+from threading import Barrier, Thread
+
+from xotl.crdt.aio import amerge
+from xotl.crdt.base import Process, from_state, get_state
+from xotl.crdt.concurrent import ConcurrentGSet, ConcurrentTwoPhaseSet
+from xotl.crdt.feed import subscribe
+from xotl.crdt.sets import GSet, TwoPhaseSet
+from xotl.crdt.testing.sets import ConcurrentGSetMachine, ConcurrentTPSetMachine
+
+TestConcurrentGSet = ConcurrentGSetMachine.TestCase
+TestConcurrentTPSet = ConcurrentTPSetMachine.TestCase
+
+R0 = Process("R0", 0)
+R1 = Process("R1", 1)
+
+
+def test_merge_in_parallel_with_local_writes():
+    local = ConcurrentGSet(process=R0, stripes=4)
+    remotes = []
+    for start in range(0, 4000, 1000):
+        remote = GSet(process=R1)
+        for i in range(start, start + 1000):
+            remote.add(i)
+        remotes.append(remote)
+
+    def write():
+        for i in range(-1000, 0):
+            local.add(i)
+
+    def merge():
+        for remote in remotes:
+            local.merge(remote)
+
+    def encode():
+        for _ in range(20):
+            assert from_state(get_state(local)) == local
+
+    threads = [Thread(target=fn) for fn in (write, merge, encode)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert local.value == frozenset(range(-1000, 4000))
+
+
+def test_snapshots_are_reused_until_mutated():
+    local = ConcurrentGSet(process=R0, stripes=2)
+    local.add(1)
+    first = local.shard_snapshot(1)
+    assert first is local.shard_snapshot(1)
+    local.add(3)
+    assert local.shard_snapshot(1) == {1, 3}
+    assert first == {1}
+
+
+def test_tpset_remove():
+    tpset = ConcurrentTwoPhaseSet(process=R0)
+    assert not tpset.remove(1)
+    tpset.add(1)
+    assert tpset.remove(1)
+    tpset.add(1)
+    assert tpset.value == frozenset()
+
+
+def test_inherited_code_sees_the_items_and_digest():
+    local = ConcurrentGSet(process=R0, stripes=4)
+    local.add_many(range(10))
+    remote = GSet(process=R1)
+    remote.add_many(range(5, 15))
+    assert 3 in local.items and 12 not in local.items
+    assert len(local.items) == 10
+    remote.merge(local)
+    local.merge(remote)
+    assert local.items == remote.items == set(range(15))
+    assert local.digest == remote.digest
+    assert local <= remote and remote <= local
+    local.reset([1, 2])
+    remote.reset([1, 2])
+    assert local.items == {1, 2}
+    assert local.digest == remote.digest
+
+
+def test_tpset_concurrent_removes():
+    tpset = ConcurrentTwoPhaseSet(process=R0, stripes=2)
+    tpset.add_many(range(100))
+    barrier = Barrier(4)
+    results = []
+
+    def remove():
+        barrier.wait()
+        results.append([item for item in range(100) if tpset.remove(item)])
+
+    threads = [Thread(target=remove) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(sum(results, [])) == list(range(100))
+    assert tpset.value == frozenset()
+
+
+def test_tpset_changes():
+    ours = ConcurrentTwoPhaseSet(process=R0)
+    theirs = TwoPhaseSet(process=R1)
+    changes = []
+    subscribe(ours, lambda replica, change: changes.append(change))
+    ours.add_many([1, 2, 3])
+    ours.remove(1)
+    ours.remove(1)
+    ours.remove_many([2, 4])
+    theirs.add_many([3, 5])
+    theirs.remove(3)
+    ours.merge(theirs)
+    assert [(set(c.added), set(c.removed)) for c in changes] == [
+        ({1, 2, 3}, set()),
+        (set(), {1}),
+        (set(), {2}),
+        ({5}, {3}),
+    ]
+
+
+def test_async_merges_keep_the_stripes():
+    local = ConcurrentGSet(process=R0, stripes=4)
+    local.add_many(range(10))
+    remote = GSet(process=R1)
+    remote.add_many(range(5, 30))
+    locks = local.locks
+    asyncio.run(amerge(local, remote, threshold=1))
+    assert local.locks is locks and local.items.owner is local
+    assert local.value == frozenset(range(30))
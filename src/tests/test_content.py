@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+import asyncio
+
+import pytest
+
+from xotl.crdt.aio import amerge
+from xotl.crdt.base import Process, from_state, get_state
+from xotl.crdt.content import (
+    DEFAULT_STORE,
+    MissingValue,
+    StoredLWWRegister,
+    ValueStore,
+)
+
+DOCUMENT = tuple(f"paragraph {i}" for i in range(10000))
+
+
+def test_state_carries_only_the_key():
+    store = ValueStore()
+    register = StoredLWWRegister(process=Process("R0", 0), store=store)
+    register.set(DOCUMENT)
+    assert register.value is DOCUMENT
+    assert len(get_state(register)) < 1000 < store.nbytes
+
+    decoded = from_state(get_state(register))
+    assert decoded == register
+    assert decoded.store is DEFAULT_STORE
+    assert decoded.key == register.key
+
+
+def test_values_are_fetched_only_when_missing():
+    ours, theirs = ValueStore(), ValueStore()
+    receiver = StoredLWWRegister(process=Process("R0", 0), store=ours)
+    sender = StoredLWWRegister(process=Process("R1", 1), store=theirs)
+    sender.set(DOCUMENT)
+
+    received = from_state(get_state(sender))
+    received.attach(ours)
+    receiver.merge(received)
+    assert receiver.key == sender.key
+    assert receiver.missing() == {sender.key}
+    with pytest.raises(MissingValue):
+        receiver.value
+
+    assert ours.fetch(theirs, receiver.missing()) == 1
+    assert receiver.value == DOCUMENT
+    assert not receiver.missing()
+    assert ours.fetch(theirs, [receiver.key]) == 0
+
+
+def test_load_checks_the_keys():
+    store = ValueStore()
+    key = store.put("value")
+    with pytest.raises(ValueError):
+        ValueStore().load({key: b"tampered"})
+
+
+def test_collect():
+    store = ValueStore()
+    register = StoredLWWRegister(process=Process("R0", 0), store=store)
+    register.set(1)
+    register.set(2)
+    assert len(store) == 2
+    assert store.collect([register.key]) == 1
+    assert register.value == 2
+    register.reset()
+    assert register.value is None
+
+
+def test_the_default_store_forgets_unreferenced_values():
+    register = StoredLWWRegister(process=Process("R0", 0))
+    register.set(("first", DOCUMENT))
+    first = register.key
+    assert first in DEFAULT_STORE
+    decoded = from_state(get_state(register))
+    register.set(("second", DOCUMENT))
+    second = register.key
+    # The decoded replica still refers to the first value.
+    assert first in DEFAULT_STORE
+    del decoded
+    assert first not in DEFAULT_STORE
+    clone = register.clone()
+    del register
+    assert clone.value == ("second", DOCUMENT)
+    store = ValueStore()
+    clone.attach(store)
+    assert second not in DEFAULT_STORE
+    assert second in store
+    assert clone.value == ("second", DOCUMENT)
+
+
+def test_other_stores_keep_values_until_collected():
+    store = ValueStore()
+    register = StoredLWWRegister(process=Process("R0", 0), store=store)
+    register.set(1)
+    del register
+    assert len(store) == 1
+    assert store.collect([]) == 1
+
+
+def test_async_merges_keep_the_references():
+    ours = StoredLWWRegister(process=Process("R0", 0))
+    theirs = StoredLWWRegister(process=Process("R1", 1))
+    ours.set("ours")
+    theirs.set("theirs")
+    old = ours.key
+    asyncio.run(amerge(ours, theirs, threshold=1))
+    del theirs
+    assert ours.value == "theirs"
+    assert old not in DEFAULT_STORE
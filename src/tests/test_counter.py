@@ -6,7 +6,21 @@
 #
 # This is free software; you can do what the LICENCE file allows you to.
 #
+import pytest
+
+from xotl.crdt.base import Process
+from xotl.crdt.counter import PNCounter
 from xotl.crdt.testing.counters import GCounterMachine, PNCounterMachine
 
 TestGCounter = GCounterMachine.TestCase
 TestPNCounter = PNCounterMachine.TestCase
+
+
+def test_incr_by_n():
+    counter = PNCounter(process=Process("R0", 0))
+    counter.incr(1000)
+    counter.decr(10)
+    assert counter.value == 990
+    assert len(counter.pos.vclock.dots) == 1
+    with pytest.raises(ValueError):
+        counter.incr(0)
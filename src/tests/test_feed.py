@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+import asyncio
+import gc
+import random
+
+import pytest
+
+from xotl.crdt.aio import amerge, amerge_chunked
+from xotl.crdt.base import Process
+from xotl.crdt.content import StoredLWWRegister, ValueStore
+from xotl.crdt.counter import GCounter, PNCounter
+from xotl.crdt.feed import (
+    CounterChange,
+    RegisterChange,
+    SetChange,
+    subscribe,
+    subscribers,
+    watched,
+)
+from xotl.crdt.register import LWWRegister
+from xotl.crdt.sets import AWSet, GSet, ORSet, TwoPhaseSet, USet
+
+R0 = Process("R0", 0)
+R1 = Process("R1", 1)
+R2 = Process("R2", 2)
+SETS = [GSet, TwoPhaseSet, ORSet, AWSet]
+
+
+class Mirror:
+    "A set kept in sync with the changes of a replica."
+
+    def __init__(self, replica):
+        self.items = set()
+        self.changes = []
+        subscribe(replica, self)
+
+    def __call__(self, replica, change):
+        assert isinstance(change, SetChange)
+        assert change.added or change.removed
+        assert not change.added & self.items
+        assert change.removed <= self.items
+        self.items |= change.added
+        self.items -= change.removed
+        self.changes.append(change)
+
+
+def test_set_changes():
+    replica = ORSet(process=R0)
+    mirror = Mirror(replica)
+    replica.add(1)
+    replica.add(1)
+    replica.add_many([1, 2, 3])
+    replica.remove(1)
+    replica.remove(1)
+    assert mirror.changes == [
+        SetChange(frozenset({1}), frozenset()),
+        SetChange(frozenset({2, 3}), frozenset()),
+        SetChange(frozenset(), frozenset({1})),
+    ]
+
+
+@pytest.mark.parametrize("cls", SETS)
+def test_set_changes_match_the_value(cls):
+    random.seed(cls.__name__)
+    replicas = [cls(process=process) for process in (R0, R1, R2)]
+    mirrors = [Mirror(replica) for replica in replicas]
+    for _ in range(500):
+        index = random.randrange(3)
+        replica = replicas[index]
+        choice = random.random()
+        if choice < 0.3:
+            replica.add(random.randrange(20))
+        elif choice < 0.4:
+            replica.add_many(random.sample(range(20), 3))
+        elif choice < 0.55 and hasattr(replica, "remove"):
+            replica.remove(random.randrange(20))
+        elif choice < 0.6 and hasattr(replica, "remove_many"):
+            replica.remove_many(random.sample(range(20), 3))
+        elif choice < 0.98:
+            replica.merge(random.choice(replicas).clone())
+        else:
+            replica.reset(random.sample(range(20), 2))
+        assert mirrors[index].items == replica.value
+
+
+def test_uset_changes():
+    ours, theirs = USet(process=R0), USet(process=R1)
+    mirror = Mirror(ours)
+    ours.add(1)
+    theirs.add_many([2, 3])
+    ours.merge(theirs)
+    ours.remove_many([1, 2])
+    assert mirror.items == ours.value == {3}
+    theirs.merge(ours)
+    theirs.add(4)
+    ours.merge(theirs)
+    assert mirror.items == ours.value == {3, 4}
+
+
+def test_merges_without_changes_emit_nothing():
+    ours, theirs = GSet(process=R0), GSet(process=R1)
+    ours.add_many([1, 2])
+    theirs.add(1)
+    mirror = Mirror(ours)
+    ours.merge(theirs)
+    ours.merge(ours.clone())
+    assert mirror.changes == []
+
+
+def test_counter_changes():
+    ours, theirs = PNCounter(process=R0), PNCounter(process=R1)
+    changes = []
+    subscribe(ours, lambda replica, change: changes.append(change))
+    ours.incr(3)
+    ours.decr()
+    theirs.incr(5)
+    theirs.decr(7)
+    ours.merge(theirs)
+    ours.merge(theirs)
+    assert changes == [CounterChange(3), CounterChange(-1), CounterChange(-2)]
+    assert sum(change.delta for change in changes) == ours.value
+
+
+def test_gcounter_changes():
+    ours, theirs = GCounter(process=R0), GCounter(process=R1)
+    changes = []
+    subscribe(ours, lambda replica, change: changes.append(change))
+    ours.incr()
+    theirs.incr(4)
+    ours.merge(theirs)
+    ours.reset()
+    assert changes == [CounterChange(1), CounterChange(4), CounterChange(-5)]
+
+
+def test_register_changes():
+    ours, theirs = LWWRegister(process=R0), LWWRegister(process=R1)
+    changes = []
+    subscribe(ours, lambda replica, change: changes.append(change))
+    ours.set(1, _timestamp=1)
+    ours.set(1, _timestamp=2)
+    theirs.set(2, _timestamp=3)
+    ours.merge(theirs)
+    theirs.set(0, _timestamp=0)
+    ours.merge(theirs)
+    assert changes == [RegisterChange(None, 1), RegisterChange(1, 2)]
+
+
+def test_stored_register_changes_carry_keys():
+    store = ValueStore()
+    register = StoredLWWRegister(process=R0, store=store)
+    changes = []
+    subscribe(register, lambda replica, change: changes.append(change))
+    register.set("a document")
+    assert changes == [RegisterChange(None, register.key)]
+
+
+def test_unsubscribe():
+    replica = GSet(process=R0)
+    changes = []
+    unsubscribe = subscribe(replica, lambda replica, change: changes.append(1))
+    assert watched(replica)
+    replica.add(1)
+    unsubscribe()
+    unsubscribe()
+    assert not watched(replica)
+    replica.add(2)
+    assert changes == [1]
+
+
+def test_clones_are_not_subscribed():
+    replica = GSet(process=R0)
+    changes = []
+    subscribe(replica, lambda replica, change: changes.append(change))
+    clone = replica.clone()
+    clone.add(1)
+    assert not watched(clone)
+    assert changes == []
+
+
+def test_subscriptions_are_dropped_with_the_replica():
+    replica = GSet(process=R0)
+    subscribe(replica, lambda replica, change: None)
+    key = id(replica)
+    assert key in subscribers
+    del replica
+    gc.collect()
+    assert key not in subscribers
+
+
+@pytest.mark.parametrize("cls", [GSet, USet, ORSet, TwoPhaseSet])
+@pytest.mark.parametrize("chunked", [False, True])
+def test_async_merges_emit_changes(cls, chunked):
+    ours, theirs = cls(process=R0), cls(process=R1)
+    ours.add_many(range(10))
+    theirs.add_many(range(100, 150))
+    mirror = Mirror(ours)
+    mirror.items = set(ours.value)
+
+    async def main():
+        if chunked:
+            await amerge_chunked(ours, theirs, chunk_size=7)
+        else:
+            await amerge(ours, theirs, threshold=1)
+
+    asyncio.run(main())
+    assert ours.value == set(range(10)) | set(range(100, 150))
+    assert mirror.items == ours.value
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+import asyncio
+
+import pytest
+
+from xotl.crdt.base import Process
+from xotl.crdt.counter import PNCounter
+from xotl.crdt.gossip import MODES, GossipEngine, LoopbackNetwork
+from xotl.crdt.sets import ORSet
+from xotl.crdt.store import ReplicaStore
+
+NODES = 5
+
+
+async def gossip(mode, store=False):
+    network = LoopbackNetwork(inbox_size=2)
+    engines = []
+    for i in range(NODES):
+        process = Process(f"R{i}", i)
+        replicas = {"counter": PNCounter(process=process)}
+        replicas["counter"].incr(i + 1)
+        replicas.update((f"set-{j}", ORSet(process=process)) for j in range(10))
+        replicas[f"set-{i}"].add(i)
+        if store:
+            replicas = ReplicaStore(replicas)
+        engine = GossipEngine(
+            replicas,
+            network.connect(process.name),
+            mode=mode,
+            fanout=2,
+            batch_size=3,
+            seed=i,
+        )
+        engines.append(engine)
+    servers = [asyncio.create_task(engine.serve()) for engine in engines]
+    try:
+        for _ in range(10):
+            await asyncio.gather(*(engine.round() for engine in engines))
+            await network.join()
+    finally:
+        for server in servers:
+            server.cancel()
+    return engines
+
+
+@pytest.mark.parametrize("store", [False, True])
+@pytest.mark.parametrize("mode", MODES)
+def test_engines_converge(mode, store):
+    engines = asyncio.run(gossip(mode, store))
+    for engine in engines:
+        assert engine.replicas["counter"].value == sum(range(1, NODES + 1))
+        for j in range(10):
+            expected = frozenset({j}) if j < NODES else frozenset()
+            assert engine.replicas[f"set-{j}"].value == expected
+    assert all(engine.sent_messages for engine in engines)
+
+
+def test_stores_push_less():
+    full = sum(engine.sent_bytes for engine in asyncio.run(gossip("push")))
+    tracked = sum(
+        engine.sent_bytes for engine in asyncio.run(gossip("push", store=True))
+    )
+    assert tracked < full
+
+
+def test_states_are_acknowledged_when_merged():
+    async def main():
+        network = LoopbackNetwork()
+        stores = []
+        engines = []
+        for i in range(2):
+            process = Process(f"R{i}", i)
+            store = ReplicaStore({"counter": PNCounter(process=process)})
+            with store.mutate("counter") as counter:
+                counter.incr(i + 1)
+            stores.append(store)
+            engines.append(
+                GossipEngine(store, network.connect(process.name), mode="push")
+            )
+        await engines[0].round()
+        # The peer hasn't handled the message yet.
+        assert stores[0].outdated("R1") == ["counter"]
+        server = asyncio.create_task(engines[1].serve())
+        try:
+            await asyncio.sleep(0)
+            assert stores[1]["counter"].value == 3
+            assert stores[0].outdated("R1") == ["counter"]
+            sender = asyncio.create_task(engines[0].serve())
+            await network.join()
+            sender.cancel()
+        finally:
+            server.cancel()
+        assert stores[0].outdated("R1") == []
+
+    asyncio.run(main())
+
+
+def test_pulls_learn_the_keys_of_peers():
+    async def main():
+        network = LoopbackNetwork()
+        process = Process("R0", 0)
+        ours = GossipEngine(
+            {},
+            network.connect("R0"),
+            mode="pull",
+            factory=lambda key: ORSet(process=process),
+        )
+        theirs = GossipEngine(
+            {"set": ORSet(process=Process("R1", 1))}, network.connect("R1")
+        )
+        theirs.replicas["set"].add(1)
+        servers = [asyncio.create_task(e.serve()) for e in (ours, theirs)]
+        try:
+            await ours.round()
+            await network.join()
+        finally:
+            for server in servers:
+                server.cancel()
+        return ours
+
+    ours = asyncio.run(main())
+    assert ours.replicas["set"].value == {1}
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+import os
+import pickle
+
+import pytest
+
+from xotl.crdt.base import Process
+from xotl.crdt.counter import PNCounter
+from xotl.crdt.persistent import PersistentStore
+from xotl.crdt.register import LWWRegister
+from xotl.crdt.sets import ORSet
+
+R0 = Process("R0", 0)
+R1 = Process("R1", 1)
+
+
+def populate(store):
+    store["counter"] = PNCounter(process=R0)
+    store["set"] = ORSet(process=R0)
+    store["register"] = LWWRegister(process=R0)
+    store.apply("counter", "incr", 5)
+    store.apply("counter", "decr")
+    store.apply("set", "add_many", range(10))
+    store.apply("set", "remove", 3)
+    store.apply("register", "set", "value")
+    other = ORSet(process=R1)
+    other.add(42)
+    store.merge("set", other)
+    with store.mutate("counter") as counter:
+        counter.incr(10)
+
+
+def values(store):
+    return {key: replica.value for key, replica in store.items()}
+
+
+def test_reopen_replays_the_log(tmp_path):
+    with PersistentStore(tmp_path) as store:
+        populate(store)
+        expected = values(store)
+    with PersistentStore(tmp_path) as store:
+        assert values(store) == expected
+        assert store["counter"].value == 14
+        del store["register"]
+    with PersistentStore(tmp_path) as store:
+        assert "register" not in store
+
+
+def test_compaction(tmp_path):
+    with PersistentStore(tmp_path, snapshot_every=None) as store:
+        populate(store)
+        store.compact()
+        store.apply("set", "add", 100)
+        expected = values(store)
+    assert sorted(os.listdir(tmp_path)) == [
+        "0000000002.log",
+        "0000000002.snapshot",
+    ]
+    with PersistentStore(tmp_path) as store:
+        assert values(store) == expected
+
+
+def test_background_compaction(tmp_path):
+    with PersistentStore(tmp_path, snapshot_every=3) as store:
+        store["counter"] = PNCounter(process=R0)
+        for _ in range(100):
+            store.apply("counter", "incr")
+    assert len(os.listdir(tmp_path)) < 10
+    with PersistentStore(tmp_path) as store:
+        assert store["counter"].value == 100
+
+
+def test_truncated_records_are_ignored(tmp_path):
+    with PersistentStore(tmp_path) as store:
+        store["counter"] = PNCounter(process=R0)
+        store.apply("counter", "incr")
+        log = store.log.name
+    with open(log, "ab") as f:
+        f.write(b"\x00\x00\x01\x00garbage")
+    with PersistentStore(tmp_path) as store:
+        assert store["counter"].value == 1
+        store.apply("counter", "incr")
+    with PersistentStore(tmp_path) as store:
+        assert store["counter"].value == 2
+
+
+def test_iterators_are_logged_as_lists(tmp_path):
+    with PersistentStore(tmp_path) as store:
+        store["set"] = ORSet(process=R0)
+        store.apply("set", "add_many", iter([1, 2, 3]))
+        store.apply("set", "add_many", (x for x in [4, 5]))
+        assert store["set"].value == {1, 2, 3, 4, 5}
+    with PersistentStore(tmp_path) as store:
+        assert store["set"].value == {1, 2, 3, 4, 5}
+
+
+def test_unpicklable_arguments_leave_the_replica_unchanged(tmp_path):
+    with PersistentStore(tmp_path) as store:
+        store["set"] = ORSet(process=R0)
+        with pytest.raises((pickle.PicklingError, AttributeError)):
+            store.apply("set", "add", lambda: None)
+        assert store["set"].value == frozenset()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+import pstats
+
+from hypothesis import settings
+from hypothesis.stateful import RuleBasedStateMachine, run_state_machine_as_test
+
+from xotl.crdt.base import set_metrics_sink
+from xotl.crdt.testing.counters import PNCounterMachine
+from xotl.crdt.testing.profiling import ENV_VAR, get_profile
+
+
+def test_profiling(tmp_path, monkeypatch):
+    monkeypatch.setenv(ENV_VAR, str(tmp_path))
+
+    class ProfiledPNCounterMachine(PNCounterMachine):
+        pass
+
+    run_state_machine_as_test(
+        ProfiledPNCounterMachine,
+        settings=settings(max_examples=5, stateful_step_count=10, deadline=None),
+    )
+    profile = get_profile(ProfiledPNCounterMachine)
+    assert profile is not None and profile.runs >= 5
+    assert set_metrics_sink(None) is None  # restored after each run
+    assert sum(stats.calls for stats in profile.rules.values()) > 0
+    assert sum(stats.seconds for stats in profile.rules.values()) > 0
+    assert sum(stats.merges for stats in profile.rules.values()) == profile.merges
+
+    profile.write()
+    name = ProfiledPNCounterMachine.__qualname__
+    report = (tmp_path / f"{name}.txt").read_text()
+    assert all(name in report for name in profile.rules)
+    assert all(
+        f"{kind}.{metric}" in report for kind, metric in profile.metrics.counters
+    )
+    assert pstats.Stats(str(tmp_path / f"{name}.pstats")).total_calls > 0
+
+
+def test_profiling_is_disabled_by_default(monkeypatch):
+    monkeypatch.delenv(ENV_VAR, raising=False)
+    assert get_profile(PNCounterMachine) is None
+    rules = RuleBasedStateMachine.rules.__func__(PNCounterMachine)
+    assert PNCounterMachine.rules() is rules
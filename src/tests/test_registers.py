@@ -9,7 +9,11 @@
 from xotl.crdt.testing.registers import (
     LWWRegisterConcurrentMachine,
     LWWRegisterMachine,
+    StoredLWWRegisterConcurrentMachine,
+    StoredLWWRegisterMachine,
 )
 
 TestLWWRegister = LWWRegisterMachine.TestCase
 TestLWWRegisterConcurrent = LWWRegisterConcurrentMachine.TestCase
+TestStoredLWWRegister = StoredLWWRegisterMachine.TestCase
+TestStoredLWWRegisterConcurrent = StoredLWWRegisterConcurrentMachine.TestCase
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+import time
+
+import pytest
+
+from xotl.crdt.base import Process, from_state, get_state
+from xotl.crdt.sequence import RGA
+from xotl.crdt.testing.sequences import RGAMachine
+
+TestRGA = RGAMachine.TestCase
+
+R0 = Process("R0", 0)
+R1 = Process("R1", 1)
+
+
+def test_runs_are_kept_in_blocks():
+    r0, r1 = RGA(process=R0), RGA(process=R1)
+    r0.extend(range(10000))
+    for i in range(100):
+        r0.append(i)
+    assert len(r0.blocks) == 1
+
+    r1.merge(from_state(get_state(r0)))
+    r0.extend("abc")
+    r1.merge(r0)
+    assert len(r1.blocks) == 2
+    assert r1.value == r0.value
+    assert r1.value[-3:] == ("a", "b", "c")
+
+
+def test_insertions_in_the_middle_split_blocks():
+    r0, r1 = RGA(process=R0), RGA(process=R1)
+    r0.extend("ace")
+    r1.merge(r0)
+    r0.insert(1, "b")
+    r1.insert(2, "d")
+    r0.merge(r1)
+    r1.merge(r0)
+    assert "".join(r0.value) == "".join(r1.value) == "abcde"
+    assert len(r0.blocks) == 5
+
+
+def test_concurrent_insertions_at_the_same_place():
+    r0, r1 = RGA(process=R0), RGA(process=R1)
+    r0.extend("ad")
+    r1.merge(r0)
+    r0.insert(1, "b")
+    r1.insert(1, "c")
+    r0.merge(r1)
+    r1.merge(r0)
+    assert r0.value == r1.value
+    assert set(r0.value[1:3]) == {"b", "c"}
+    assert r0 <= r1 <= r0
+
+
+def test_deletions():
+    r0, r1 = RGA(process=R0), RGA(process=R1)
+    r0.extend(range(10))
+    r1.merge(r0)
+    r0.delete(0)
+    r1.delete_many(5, None)
+    r1.insert(5, "x")
+    r0.merge(r1)
+    assert r0.value == (1, 2, 3, 4, "x")
+    with pytest.raises(IndexError):
+        r0.delete(5)
+
+
+def test_positions_skip_the_removed_elements():
+    r0, r1 = RGA(process=R0), RGA(process=R1)
+    r0.extend(range(10))
+    r0.delete_many(2, 5)
+    r0.delete(-1)
+    assert r0.size == 6
+    r1.merge(r0)
+    assert r1.size == 6
+    r0.insert(3, "x")
+    r0.append("y")
+    assert r0.value == (0, 1, 5, "x", 6, 7, 8, "y")
+    r1.merge(r0)
+    r1.merge(r0)
+    assert r1.value == r0.value and r1.size == len(r1.value)
+
+
+def test_appends_take_constant_time():
+    def append(n):
+        best = float("inf")
+        for _ in range(3):
+            rga = RGA(process=R0)
+            rga.append(-1)
+            rga.delete(0)
+            start = time.perf_counter()
+            for i in range(n):
+                rga.append(i)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    # Linear is 4x, quadratic 16x.
+    assert append(4000) < 8 * append(1000)
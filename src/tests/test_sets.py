@@ -6,7 +6,10 @@
 #
 # This is free software; you can do what the LICENCE file allows you to.
 #
+from xotl.crdt.base import Process
+from xotl.crdt.sets import AWSet, GSet, ORSet, TwoPhaseSet, USet
 from xotl.crdt.testing.sets import (
+    AWSetMachine,
     GSetMachine,
     ORSetMachine,
     TPSetMachine,
@@ -17,3 +20,94 @@ TestGSet = GSetMachine.TestCase
 TestTPSet = TPSetMachine.TestCase
 TestUSet = USetMachine.TestCase
 TestORSet = ORSetMachine.TestCase
+TestAWSet = AWSetMachine.TestCase
+
+
+class FastGSetMachine(GSetMachine):
+    fast = True
+
+
+class FastORSetMachine(ORSetMachine):
+    fast = True
+
+
+TestFastGSet = FastGSetMachine.TestCase
+TestFastORSet = FastORSetMachine.TestCase
+
+
+def test_batches_bump_the_clock_once():
+    orset = ORSet(process=Process("R0", 0))
+    orset.add_many(range(1000))
+    assert orset.dot_counter == 1
+    orset.remove_many(range(500))
+    assert orset.dot_counter == 2
+    assert orset.value == frozenset(range(500, 1000))
+
+
+def test_gset_comparisons_and_merge_use_digests():
+    ours, theirs = GSet(process=Process("R0", 0)), GSet(process=Process("R1", 1))
+    ours.add_many(range(10))
+    theirs.add_many(range(1, 11))
+    assert not (ours <= theirs) and not (theirs <= ours)
+    items = theirs.items
+    theirs.merge(ours)
+    assert theirs.items is items
+    assert ours <= theirs and not (theirs <= ours)
+    ours.merge(theirs)
+    assert ours.value == theirs.value == frozenset(range(11))
+    assert ours.digest == theirs.digest
+
+
+def test_twophaseset_comparison_needs_both_parts():
+    ours = TwoPhaseSet(process=Process("R0", 0))
+    ours.add_many([1, 2])
+    theirs = ours.clone()
+    theirs.remove(1)
+    # Only the removals are new.
+    assert ours <= theirs and not (theirs <= ours)
+    theirs.add(3)
+    ours.remove(2)
+    assert not (ours <= theirs) and not (theirs <= ours)
+
+
+def test_snapshots_are_copied_on_write():
+    for cls in (GSet, USet, ORSet):
+        original = cls(process=Process("R0", 0))
+        original.add(1)
+        snapshot = original.snapshot()
+        assert snapshot == original
+        original.add(2)
+        snapshot.add(3)
+        assert original.value == frozenset({1, 2})
+        assert snapshot.value == frozenset({1, 3})
+        clone = original.clone()
+        clone.add(4)
+        assert 4 not in original.value
+
+
+def test_awset_deltas_are_merged_in_any_order():
+    r0, r1 = AWSet(process=Process("R0", 0)), AWSet(process=Process("R1", 1))
+    deltas = [r0.add_many(range(5)), r0.remove(2), r0.add(2), r0.remove(4)]
+    for delta in reversed(deltas):
+        r1.merge(delta)
+        r1.merge(delta)
+    assert r1.value == r0.value == {0, 1, 2, 3}
+    assert r1.context.to_vclock() == r0.context.vclock
+    assert r0 <= r1 <= r0
+
+    # A partial delivery leaves gaps in the context, but no removed items.
+    r2 = AWSet(process=Process("R2", 2))
+    r2.merge(deltas[1])
+    r2.merge(deltas[3])
+    assert not r2.value and r2.context.gaps(r0.process) == ((1, 3), (4, 5))
+
+
+def test_awset_add_wins():
+    r0, r1 = AWSet(process=Process("R0", 0)), AWSet(process=Process("R1", 1))
+    r0.add(1)
+    r1.merge(r0)
+    r1.remove(1)
+    r0.add(1)
+    r0.merge(r1)
+    r1.merge(r0)
+    assert 1 in r0 and 1 in r1
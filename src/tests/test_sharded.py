@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from xotl.crdt.base import Process
+from xotl.crdt.sets import stable_hash
+from xotl.crdt.sharded import ShardedGSet, ShardedORSet
+from xotl.crdt.testing.sets import ShardedGSetMachine, ShardedORSetMachine
+
+TestShardedGSet = ShardedGSetMachine.TestCase
+TestShardedORSet = ShardedORSetMachine.TestCase
+
+R0 = Process("R0", 0)
+R1 = Process("R1", 1)
+
+
+def test_stable_hash_of_equal_numbers():
+    assert stable_hash(1) == stable_hash(1.0) == stable_hash(True)
+    assert (
+        stable_hash((0, "a")) == stable_hash((0.0, "a")) == stable_hash((False, "a"))
+    )
+    assert stable_hash(1) != stable_hash(2)
+
+
+@pytest.mark.parametrize("cls", [ShardedGSet, ShardedORSet])
+def test_parallel_merge_encode_and_decode(cls):
+    ours, theirs = cls(process=R0, shards=4), cls(process=R1, shards=4)
+    ours.add_many(range(0, 1000, 2))
+    theirs.add_many(range(0, 1000, 3))
+    with ProcessPoolExecutor(2) as executor:
+        states = theirs.encode(executor=executor)
+        received = cls.decode(states, executor=executor)
+        assert received == theirs
+        ours.merge(received, executor=executor)
+    assert ours.process == R0
+    assert all(shard.process == R0 for shard in ours.shards)
+    expected = frozenset(range(0, 1000, 2)) | frozenset(range(0, 1000, 3))
+    assert ours.value == expected
+    assert theirs <= ours
+
+
+def test_shard_counts_must_match():
+    with pytest.raises(ValueError):
+        ShardedGSet(process=R0, shards=2).merge(ShardedGSet(process=R1, shards=4))
+
+
+@pytest.mark.parametrize("cls", [ShardedGSet, ShardedORSet])
+def test_membership(cls):
+    replica = cls(process=R0, shards=4)
+    replica.add_many(range(10))
+    assert all(item in replica for item in range(10))
+    assert 10 not in replica
+
+
+def test_decoding_needs_shards():
+    with pytest.raises(ValueError):
+        ShardedORSet.decode([])
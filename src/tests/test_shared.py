@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+from multiprocessing import get_context
+
+import pytest
+
+from xotl.crdt.base import Process, from_state, get_state
+from xotl.crdt.counter import GCounter, PNCounter
+from xotl.crdt.shared import SharedGCounter, SharedPNCounter, SharedSlots
+
+HOST = Process("host-0", 0)
+OTHER = Process("host-1", 1)
+WORKERS = 4
+
+
+@pytest.fixture
+def slots():
+    result = SharedSlots(WORKERS, 2)
+    yield result
+    result.close()
+    result.unlink()
+
+
+def work(slots, slot):
+    counter = SharedPNCounter(process=HOST, slots=slots, slot=slot)
+    for _ in range(100):
+        counter.incr()
+    for _ in range(30):
+        counter.decr()
+
+
+def test_workers_increment_without_ipc(slots):
+    ctx = get_context("fork")
+    workers = [ctx.Process(target=work, args=(slots, i)) for i in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    host = SharedPNCounter(process=HOST, slots=slots, slot=0)
+    assert host.value == WORKERS * 70
+
+    other = PNCounter(process=OTHER)
+    other.incr()
+    other.merge(from_state(get_state(host)))
+    assert other.value == WORKERS * 70 + 1
+
+    host.merge(other)
+    assert host.value == WORKERS * 70 + 1
+    assert other <= host <= other
+
+
+def test_state_is_a_plain_counter(slots):
+    counter = SharedGCounter(process=HOST, slots=slots, slot=1)
+    counter.incr()
+    counter.incr()
+    state = from_state(get_state(counter))
+    assert type(state) is GCounter
+    assert state == counter
+    assert state.value == 2
+
+
+def test_attach_by_name(slots):
+    attached = SharedSlots(WORKERS, 2, name=slots.name, create=False)
+    try:
+        attached.incr(3, 5, column=1)
+        assert slots.total(1) == 5
+    finally:
+        attached.close()
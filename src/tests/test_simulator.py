@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+import dataclasses
+
+import pytest
+
+from xotl.crdt.counter import PNCounter
+from xotl.crdt.register import LWWRegister
+from xotl.crdt.sets import GSet, ORSet, TwoPhaseSet
+from xotl.crdt.testing.simulator import (
+    STRATEGIES,
+    Partition,
+    Simulator,
+    compare_strategies,
+)
+
+FAULTS = dict(loss=0.1, duplication=0.1, reordering=0.2, latency=(0.1, 0.9))
+
+
+def add(replica, random):
+    replica.add(random.randrange(1000))
+
+
+def add_or_remove(replica, random):
+    if random.random() < 0.7 or not replica.value:
+        replica.add(random.randrange(1000))
+    else:
+        replica.remove(random.choice(sorted(replica.value)))
+
+
+def count(replica, random):
+    if random.random() < 0.6:
+        replica.incr(random.randint(1, 10))
+    else:
+        replica.decr()
+
+
+def write(replica, random):
+    replica.set(random.randrange(1000))
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+@pytest.mark.parametrize(
+    "cls, workload",
+    [
+        (GSet, add),
+        (TwoPhaseSet, add_or_remove),
+        (PNCounter, count),
+        (LWWRegister, write),
+    ],
+)
+def test_convergence_with_faults(cls, workload, strategy):
+    simulator = Simulator(cls, 100, strategy=strategy, seed=1, **FAULTS)
+    report = simulator.run(workload, updates=200, update_rounds=5, max_rounds=200)
+    assert report.converged, report
+    assert report.lost and report.duplicated
+    assert report.merges and report.bytes
+
+
+@pytest.mark.xfail(
+    raises=AssertionError,
+    strict=True,
+    reason=(
+        "ORSet doesn't converge with concurrent removals: the USet merges "
+        "concurrent states with the union of their items, so it can't tell a "
+        "removed item from one it hasn't seen; and replicas with the same "
+        "clock may keep different items."
+    ),
+)
+@pytest.mark.parametrize("strategy", ["full", "delta"])
+def test_orset_convergence_with_faults(strategy):
+    simulator = Simulator(ORSet, 100, strategy=strategy, seed=2, **FAULTS)
+    report = simulator.run(
+        add_or_remove, updates=200, update_rounds=5, max_rounds=200
+    )
+    assert report.converged, report
+
+
+def test_simulations_are_deterministic():
+    def run():
+        simulator = Simulator(GSet, 50, strategy="digest", seed=7, **FAULTS)
+        report = simulator.run(add, updates=100, update_rounds=3)
+        return dataclasses.replace(report, merge_seconds=0.0), simulator
+
+    (first, a), (second, b) = run(), run()
+    assert first == second
+    assert a.replicas[0].value == b.replicas[0].value
+
+
+def test_partitions_delay_convergence():
+    halves = [range(50), range(50, 100)]
+    reports = [
+        Simulator(GSet, 100, seed=3, partitions=partitions).run(add, updates=50)
+        for partitions in ([], [Partition(halves, 0, 30)])
+    ]
+    assert all(report.converged for report in reports)
+    assert reports[0].rounds < 30 <= reports[1].rounds
+
+
+def test_strategies_transfer_less_than_full_state():
+    reports = compare_strategies(GSet, add, 100, updates=300, seed=5)
+    assert all(report.converged for report in reports.values())
+    assert reports["delta"].bytes < reports["full"].bytes
+    assert reports["digest"].bytes < reports["full"].bytes
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError):
+        Simulator(GSet, 10, strategy="telepathy")
+    with pytest.raises(ValueError):
+        Simulator(GSet, 1)
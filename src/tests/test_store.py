@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+from xotl.crdt.base import Process
+from xotl.crdt.counter import GCounter
+from xotl.crdt.sets import TwoPhaseSet
+from xotl.crdt.store import ReplicaStore
+
+R0 = Process("R0", 0)
+R1 = Process("R1", 1)
+
+
+def test_dirty_set_and_watermarks():
+    store = ReplicaStore({key: GCounter(process=R0) for key in "abc"})
+    assert store.take_dirty() == {"a", "b", "c"}
+    assert store.outdated("peer") == ["a", "b", "c"]
+    store.ack("peer", {key: store.version(key) for key in "abc"})
+    assert store.outdated("peer") == []
+
+    with store.mutate("b") as counter:
+        counter.incr()
+    assert store.take_dirty() == {"b"}
+    assert store.outdated("peer") == ["b"]
+    assert store.outdated("other") == ["a", "b", "c"]
+
+    store.forget("peer")
+    assert store.outdated("peer") == ["a", "b", "c"]
+
+
+def test_merges_update_versions_and_watermarks():
+    store = ReplicaStore({"a": GCounter(process=R0)})
+    store.take_dirty()
+    version = store.version("a")
+    theirs = GCounter(process=R1)
+    # Nothing new: the version is kept, and the peer has seen everything.
+    assert not store.merge("a", theirs, peer="R1")
+    assert store.version("a") == version
+    assert store.outdated("R1") == []
+
+    theirs.incr()
+    assert store.merge("a", theirs, peer="R1")
+    assert store.take_dirty() == {"a"}
+    assert store.outdated("R1") == []
+
+    store["a"].incr()
+    store.touch("a")
+    assert store.outdated("R1") == ["a"]
+    # The peer is behind us after the merge; so it's still outdated.
+    assert not store.merge("a", theirs, peer="R1")
+    assert store.outdated("R1") == ["a"]
+
+
+def test_merges_with_only_removals_are_not_skipped():
+    ours = TwoPhaseSet(process=R0)
+    ours.add_many([1, 2])
+    store = ReplicaStore({"a": ours})
+    store.take_dirty()
+    theirs = TwoPhaseSet(process=R1)
+    theirs.merge(ours)
+    theirs.remove(1)
+    assert store.merge("a", theirs, peer="R1")
+    assert store["a"].value == {2}
+    assert store.take_dirty() == {"a"}
+
+
+def test_merges_with_only_additions_are_not_skipped():
+    # TwoPhaseSet.__le__ used to combine its parts with `or`: a replica with
+    # the same removals but more additions compared as not newer.
+    ours = TwoPhaseSet(process=R0)
+    ours.add_many([1, 2])
+    ours.remove(1)
+    store = ReplicaStore({"a": ours})
+    store.take_dirty()
+    theirs = TwoPhaseSet(process=R1)
+    theirs.merge(ours)
+    theirs.add(3)
+    assert store.merge("a", theirs, peer="R1")
+    assert store["a"].value == {2, 3}
+    assert store.take_dirty() == {"a"}
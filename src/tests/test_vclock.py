@@ -6,10 +6,14 @@
 #
 # This is free software; you can do what the LICENCE file allows you to.
 #
+import pickle
+
+import pytest
 from hypothesis import given, strategies
 
-from xotl.crdt.base import Process
-from xotl.crdt.clocks import Dot, VClock
+from xotl.crdt.base import Process, from_state, get_state
+from xotl.crdt.clocks import Dot, DotContext, VClock
+from xotl.crdt.register import LWWRegister
 
 R0 = Process("R0", 0)
 R1 = Process("R1", 1)
@@ -83,3 +87,69 @@ def test_concurrence():
 
     v1 = VClock()
     assert not (v1 // v2)
+
+
+def counters(clock):
+    return {d.process: d.counter for d in clock.dots}
+
+
+@given(clocks(), clocks(), processes)
+def test_clocks_are_normalized(c1, c2, process):
+    for clock in (c1, c2, c1 + c2, c1.bump(process)):
+        assert all(d.counter > 0 for d in clock.dots), f"{clock} has zero dots"
+
+
+@given(clocks(), clocks())
+def test_descends_matches_the_definition(c1, c2):
+    ours, theirs = counters(c1), counters(c2)
+    expected = all(ours.get(p, 0) >= counter for p, counter in theirs.items())
+    assert (c1 >= c2) == expected
+    assert (c1 == c2) == (ours == theirs)
+
+
+def test_merged_and_decoded_clocks_are_shared():
+    r0, r1 = LWWRegister(process=R0), LWWRegister(process=R1)
+    r0.set(1)
+    r1.set(2)
+    r0.merge(r1)
+    r1.merge(r0)
+    assert r0.vclock is r1.vclock
+    decoded = from_state(get_state(r0))
+    assert decoded.vclock is r0.vclock
+    assert decoded.process is from_state(get_state(r0)).process
+
+
+dot_sets = strategies.sets(
+    strategies.builds(
+        Dot, strategies.sampled_from(_PROCESSES[:3]), strategies.integers(1, 20)
+    ),
+    max_size=30,
+)
+
+
+@given(dot_sets, dot_sets)
+def test_dot_contexts_are_sets_of_dots(dots1, dots2):
+    c1, c2 = DotContext.from_dots(dots1), DotContext.from_dots(dots2)
+    for process in _PROCESSES[:3]:
+        for counter in range(22):
+            dot = Dot(process, counter)
+            assert (dot in c1) == (dot in dots1)
+    assert c1 + c2 == DotContext.from_dots(dots1 | dots2)
+    assert (c1 <= c2) == (dots1 <= dots2)
+    assert (c1 == c2) == (dots1 == dots2)
+    assert pickle.loads(pickle.dumps(c1 + c2)) == c1 + c2
+
+
+def test_dot_contexts_are_compacted():
+    context = DotContext.from_dots([Dot(R0, 1), Dot(R0, 3), Dot(R0, 6), Dot(R1, 2)])
+    assert context.vclock == VClock([Dot(R0, 1)])
+    assert context.ranges == {R0: ((3, 4), (6, 7)), R1: ((2, 3),)}
+    assert context.gaps(R0) == ((2, 3), (4, 6))
+    assert context.next_dot(R0) == Dot(R0, 7)
+
+    context = context + DotContext.from_dots([Dot(R0, 2), Dot(R1, 1)])
+    assert context.ranges == {R0: ((6, 7),)}
+    with pytest.raises(ValueError):
+        context.to_vclock()
+    context = context.add(Dot(R0, 4)).add(Dot(R0, 5))
+    assert context.to_vclock() == VClock([Dot(R0, 6), Dot(R1, 2)])
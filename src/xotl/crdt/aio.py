@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Merge, encode and decode large replicas without stalling the event loop.
+
+`amerge`:func:, `aget_state`:func: and `afrom_state`:func: are the
+asyncio companions of `~xotl.crdt.base.CvRDT.merge`:meth:,
+`~xotl.crdt.base.get_state`:func: and `~xotl.crdt.base.from_state`:func:.
+Small replicas (below a `threshold` of `weight`:func:, or of bytes for
+states) are processed right away; larger ones in an
+`~concurrent.futures.Executor`:class: (by default, the thread pool of the
+loop), or in chunks.
+
+The live replica is never touched from another thread: `amerge`:func: merges
+a `snapshot <xotl.crdt.base.CvRDT.snapshot>`:meth: in the executor, and
+back in the loop it takes the merged state; if the replica changed in the
+meantime, the merged state is merged into it (with `amerge_chunked`:func:)
+instead.  Whether the replica changed is found out without comparing the
+items: a snapshot shares the attributes of the replica until either of them
+changes, so comparing the identity of the attributes suffices.
+
+Threads only help if the work releases the GIL or is interleaved with the
+loop; pickling and the set operations of CPython don't release the GIL.  So
+the sets are merged in chunks in the loop instead of threads (see
+`merge_steps`:func:), `aget_state`:func: encodes the large sets of a snapshot
+in chunks (in the loop), and `afrom_state`:func: decodes such states chunk by
+chunk: the loop can take the GIL between chunks.  With a
+`~concurrent.futures.ProcessPoolExecutor`:class: the work is done in
+parallel; the replicas are sent to the workers (and back) as states encoded
+in chunks.  But the replica then takes the decoded state and drops its own:
+freeing a large set at once still stalls the loop, so process pools trade
+latency for throughput.
+
+Chunks bound the time the loop waits for each piece of work, except for the
+resizes of the sets while they grow, and the collections of the garbage
+collector.
+
+`amerge_chunked`:func: merges in the loop, but in chunks of items, yielding
+to the other coroutines between chunks.  See `merge_steps`:func: for the
+types that support it.
+
+"""
+
+from __future__ import annotations
+
+import asyncio
+import pickle
+import typing as t
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import chain, islice
+
+from xotl.crdt.base import CvRDT, from_state, get_state
+from xotl.crdt.clocks import VClock
+from xotl.crdt.concurrent import ConcurrentGSet, ConcurrentTwoPhaseSet
+from xotl.crdt.feed import emit_items, watched
+from xotl.crdt.register import LWWRegister
+from xotl.crdt.sets import GSet, ORSet, TwoPhaseSet, USet
+from xotl.crdt.sharded import ShardedSet
+
+#: The `weight`:func: from which merges and encodes are offloaded.
+DEFAULT_THRESHOLD = 10000
+
+#: The size of the states (in bytes) from which decoding is offloaded.
+DEFAULT_STATE_THRESHOLD = 1 << 20
+
+#: The number of items merged (or encoded) between yields.
+DEFAULT_CHUNK_SIZE = 1000
+
+# The attempts of a chunked merge of a USet before merging it at once.
+_ATTEMPTS = 3
+
+C = t.TypeVar("C", bound=CvRDT)
+
+
+def weight(replica: CvRDT) -> int:
+    """Return an estimation of the work to merge or encode `replica`.
+
+    This is the number of items of sets (adding those of the parts of
+    composite CRDTs, like shards), and the number of dots of clocks.
+
+    """
+    result = 0
+    for cls in type(replica).__mro__:
+        for slot in cls.__dict__.get("__slots__", ()):
+            attr = getattr(replica, slot, None)
+            if isinstance(attr, CvRDT):
+                result += weight(attr)
+            elif isinstance(attr, VClock):
+                result += len(attr.dots)
+            elif isinstance(attr, list) and attr and isinstance(attr[0], CvRDT):
+                result += sum(weight(part) for part in attr)
+            elif isinstance(attr, (set, frozenset, dict, list)):
+                result += len(attr)
+            elif slot == "items" and isinstance(attr, t.Sized):
+                result += len(attr)
+    return result
+
+
+async def amerge(
+    replica: CvRDT,
+    other: CvRDT,
+    *,
+    executor: t.Optional[Executor] = None,
+    threshold: int = DEFAULT_THRESHOLD,
+) -> None:
+    """Merge `other` into `replica`, in `executor` if they are large.
+
+    `other` must not be changed until the merge is done; the `replica` can.
+
+    Replicas with `subscribers <xotl.crdt.feed>`:mod: are merged in the loop,
+    so that the changes are emitted.  Unless `executor` is a process pool,
+    the CRDTs that `merge_steps`:func: merges in chunks are merged with
+    `amerge_chunked`:func: (a thread would hold the GIL as long).
+
+    """
+    if watched(replica) or weight(replica) + weight(other) < threshold:
+        replica.merge(other)
+        return
+    process = isinstance(executor, ProcessPoolExecutor)
+    if not process and _steps(replica) is not None:
+        await amerge_chunked(replica, other)
+        return
+    loop = asyncio.get_running_loop()
+    before = replica.snapshot()
+    if process:
+        ours = await _aencode(before, DEFAULT_CHUNK_SIZE)
+        theirs = await _aencode(other, DEFAULT_CHUNK_SIZE)
+        state = await loop.run_in_executor(
+            executor, _merge_states, ours, theirs, DEFAULT_CHUNK_SIZE
+        )
+        merged = await afrom_state(state, threshold=0)
+    else:
+        merged = await loop.run_in_executor(
+            executor, _merge, before.snapshot(), other
+        )
+    # Registers (which are cheap to merge) go through merge, which keeps the
+    # references to the values of stored registers.  Other threads may be
+    # holding the locks of concurrent sets, so they are never adopted.
+    if _unchanged(replica, before) and not isinstance(replica, _NOT_ADOPTED):
+        _adopt(replica, merged)
+    else:
+        await amerge_chunked(replica, merged)
+
+
+async def aget_state(
+    replica: CvRDT,
+    *,
+    threshold: int = DEFAULT_THRESHOLD,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> bytes:
+    """Return the `~xotl.crdt.base.get_state`:func: of `replica`.
+
+    Large replicas are encoded in the loop, yielding between chunks of
+    `chunk_size` items.  The state is not the same as the one returned by
+    `~xotl.crdt.base.get_state`:func: (the large sets are encoded in chunks),
+    but `~xotl.crdt.base.from_state`:func: decodes it all the same.
+
+    """
+    if weight(replica) < threshold:
+        return get_state(replica)
+    return await _aencode(replica, chunk_size)
+
+
+async def afrom_state(
+    state: bytes,
+    *,
+    executor: t.Optional[Executor] = None,
+    threshold: int = DEFAULT_STATE_THRESHOLD,
+) -> CvRDT:
+    """Return the `~xotl.crdt.base.from_state`:func: of `state`.
+
+    The sets of states returned by `aget_state`:func: are decoded chunk by
+    chunk; so the loop can take the GIL while a thread decodes them.
+
+    """
+    if len(state) < threshold:
+        return from_state(state)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, from_state, state)
+
+
+async def amerge_chunked(
+    replica: CvRDT, other: CvRDT, *, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> None:
+    """Merge `other` into `replica` in the loop, yielding between chunks.
+
+    The `replica` can be changed by other coroutines meanwhile.
+
+    """
+    for _ in merge_steps(replica, other, chunk_size=chunk_size):
+        await asyncio.sleep(0)
+
+
+def merge_steps(
+    replica: C, other: C, *, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> t.Iterator[None]:
+    """Merge `other` into `replica` in steps.
+
+    Return an iterator; the merge is done when it's exhausted, and each step
+    handles about `chunk_size` items.  Between steps the replica can be
+    mutated or merged.
+
+    The sets `~xotl.crdt.sets.GSet`:class:, `~xotl.crdt.sets.USet`:class:,
+    `~xotl.crdt.sets.ORSet`:class:, `~xotl.crdt.sets.TwoPhaseSet`:class: and
+    the `sharded sets <xotl.crdt.sharded>`:mod: of them are merged in chunks
+    of items; their sub-classes too, unless they redefine ``merge``.  Other
+    CRDTs are merged in a single step.
+
+    A USet (and so an ORSet) builds the merged items aside, in chunks, and
+    takes them in the last step if the replica hasn't changed; otherwise, it
+    starts again.  After a few attempts, it's merged in a single step.
+
+    An ORSet or TwoPhaseSet with `subscribers <xotl.crdt.feed>`:mod: is
+    merged in a single step; a USet emits the changes found while reading the
+    chunks.
+
+    """
+    steps = _steps(replica)
+    if steps is None:
+        return _single_step(replica, other)
+    return steps(replica, other, chunk_size)
+
+
+def _steps(
+    replica: CvRDT,
+) -> t.Optional[t.Callable[[t.Any, t.Any, int], t.Iterator[None]]]:
+    # The function that merges `replica` in steps; None if it's merged in a
+    # single step.
+    for cls in type(replica).__mro__:
+        steps = _STEPS.get(cls)
+        if steps is not None:
+            if type(replica).merge is cls.merge:  # type: ignore
+                return steps
+            break
+    return None
+
+
+def _single_step(replica: CvRDT, other: CvRDT) -> t.Iterator[None]:
+    replica.merge(other)
+    yield
+
+
+def _gset_steps(replica: GSet, other: GSet, size: int) -> t.Iterator[None]:
+    if len(other.items) == len(replica.items) and other.digest == replica.digest:
+        return
+    # Others may change their replica while we wait; it's safe to iterate a
+    # snapshot.
+    theirs = iter(other.snapshot().items)
+    while chunk := list(islice(theirs, size)):
+        ours = replica.items
+        replica._extend({item for item in chunk if item not in ours})
+        yield
+
+
+def _uset_steps(replica: USet, other: USet, size: int) -> t.Iterator[None]:
+    other = other.snapshot()
+    for _ in range(_ATTEMPTS):
+        clock = replica.vclock
+        if clock >= other.vclock:
+            return
+        merged = yield from _uset_merged(replica, other, size)
+        if merged is not None:
+            items, added, removed = merged
+            replica.items = items
+            replica.shared = False
+            replica.vclock += other.vclock
+            if added or removed:
+                emit_items(replica, added, removed)
+            return
+    # The replica changed during every attempt.
+    replica.merge(other)
+    yield
+
+
+def _uset_merged(
+    replica: USet, other: USet, size: int
+) -> t.Generator[
+    None, None, t.Optional[t.Tuple[t.Set[t.Any], t.List[t.Any], t.List[t.Any]]]
+]:
+    # Build, in steps, the items of `replica` merged with `other`; return
+    # them with the items added and removed (only if the replica is watched).
+    # Return None if the replica changed meanwhile.  Every change of a USet
+    # renews its clock, and its items are not changed in place while shared;
+    # so it's safe to iterate them while the clock is the same.
+    clock, ours = replica.vclock, replica.items
+    behind = clock < other.vclock
+    watch = watched(replica)
+    items: t.Set[t.Any] = set()
+    added: t.List[t.Any] = []
+    removed: t.List[t.Any] = []
+    theirs = iter(other.items)
+    while chunk := list(islice(theirs, size)):
+        items.update(chunk)
+        if watch:
+            added.extend(item for item in chunk if item not in ours)
+        yield
+        if replica.vclock is not clock:
+            return None
+    if behind and not watch:
+        return items, added, removed
+    mine = iter(ours)
+    while chunk := list(islice(mine, size)):
+        if behind:
+            removed.extend(item for item in chunk if item not in items)
+        else:
+            items.update(chunk)
+        yield
+        if replica.vclock is not clock:
+            return None
+    return items, added, removed
+
+
+def _orset_steps(replica: ORSet, other: ORSet, size: int) -> t.Iterator[None]:
+    if watched(replica):
+        return _single_step(replica, other)
+    return merge_steps(replica.items, other.items, chunk_size=size)
+
+
+def _tpset_steps(
+    replica: TwoPhaseSet, other: TwoPhaseSet, size: int
+) -> t.Iterator[None]:
+    if watched(replica):
+        return _single_step(replica, other)
+    return chain(
+        merge_steps(replica.living, other.living, chunk_size=size),
+        merge_steps(replica.dead, other.dead, chunk_size=size),
+    )
+
+
+def _sharded_steps(
+    replica: ShardedSet, other: ShardedSet, size: int
+) -> t.Iterator[None]:
+    replica._check(other)
+    for ours, theirs in zip(replica.shards, other.shards):
+        yield from merge_steps(ours, theirs, chunk_size=size)
+
+
+_STEPS: t.Dict[type, t.Callable[[t.Any, t.Any, int], t.Iterator[None]]] = {
+    GSet: _gset_steps,
+    USet: _uset_steps,
+    ORSet: _orset_steps,
+    TwoPhaseSet: _tpset_steps,
+    ShardedSet: _sharded_steps,
+}
+
+
+def _merge(ours: CvRDT, theirs: CvRDT) -> CvRDT:
+    # Merge two replicas (in a worker) and return the result.
+    ours.merge(theirs)
+    return ours
+
+
+def _merge_states(ours: bytes, theirs: bytes, size: int) -> bytes:
+    # Merge two states (in a worker process) and return the merged state.
+    replica = from_state(ours)
+    replica.merge(from_state(theirs))
+    for _ in _encode_steps(replica, size):
+        pass
+    return get_state(replica)
+
+
+async def _aencode(replica: CvRDT, size: int) -> bytes:
+    # Encode a snapshot of `replica`, yielding between chunks.
+    snapshot = replica.snapshot()
+    for _ in _encode_steps(snapshot, size):
+        await asyncio.sleep(0)
+    return get_state(snapshot)
+
+
+def _encode_steps(replica: CvRDT, size: int) -> t.Iterator[None]:
+    # Replace, in steps, the sets (larger than `size`) of `replica` and its
+    # parts by their pickles in chunks.  `replica` must be a snapshot, a copy
+    # or a replica nobody else uses; its parts are copies too.  The sets are
+    # not changed in place while shared with the snapshot.
+    for slot in _slots(replica):
+        attr = getattr(replica, slot, None)
+        if isinstance(attr, CvRDT):
+            yield from _encode_steps(attr, size)
+        elif isinstance(attr, list) and attr and isinstance(attr[0], CvRDT):
+            for part in attr:
+                yield from _encode_steps(part, size)
+        elif type(attr) is set and len(attr) > size:
+            chunks = []
+            items = iter(attr)
+            while chunk := list(islice(items, size)):
+                chunks.append(pickle.dumps(chunk, protocol=pickle.HIGHEST_PROTOCOL))
+                yield
+            setattr(replica, slot, _ChunkedSet(chunks))
+
+
+class _ChunkedSet:
+    # A set encoded in chunks; it's decoded as a set.
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks: t.List[bytes]) -> None:
+        self.chunks = chunks
+
+    def __reduce__(self):
+        return _join_chunks, (self.chunks,)
+
+
+def _join_chunks(chunks: t.List[bytes]) -> t.Set[t.Any]:
+    # Decode the chunks of a `_ChunkedSet`.  A loop of Python code, so that a
+    # thread decoding them can release the GIL between chunks.
+    result: t.Set[t.Any] = set()
+    for chunk in chunks:
+        result.update(pickle.loads(chunk))
+    return result
+
+
+_NOT_ADOPTED = (LWWRegister, ConcurrentGSet, ConcurrentTwoPhaseSet)
+
+
+def _adopt(replica: CvRDT, merged: CvRDT) -> None:
+    # Take the state of `merged`, which is a copy of `replica` after a merge.
+    for slot in _slots(replica):
+        if hasattr(merged, slot):
+            setattr(replica, slot, getattr(merged, slot))
+
+
+def _unchanged(replica: CvRDT, before: CvRDT) -> bool:
+    # True if `replica` hasn't changed since `before` was snapshot from it.
+    # The snapshot shares the attributes until either is changed (the parts
+    # of composite CRDTs are snapshots too).
+    for slot in _slots(replica):
+        if slot == "shared":
+            continue
+        ours, theirs = getattr(replica, slot, None), getattr(before, slot, None)
+        if isinstance(ours, CvRDT) and isinstance(theirs, CvRDT):
+            if not _unchanged(ours, theirs):
+                return False
+        elif (
+            isinstance(ours, list)
+            and isinstance(theirs, list)
+            and len(ours) == len(theirs)
+            and all(isinstance(part, CvRDT) for part in ours)
+        ):
+            if not all(map(_unchanged, ours, theirs)):
+                return False
+        elif ours is not theirs:
+            return False
+    return True
+
+
+def _slots(replica: CvRDT) -> t.Iterator[str]:
+    # The slots of the state of `replica`.
+    for cls in type(replica).__mro__:
+        slots = cls.__dict__.get("__slots__", ())
+        for slot in (slots,) if isinstance(slots, str) else slots:
+            if slot not in ("process", "__dict__", "__weakref__"):
+                yield slot
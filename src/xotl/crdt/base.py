@@ -11,9 +11,17 @@
 from __future__ import annotations
 
 import abc
+import math
 import pickle
+import sys
+import threading
 import typing as t
 from dataclasses import dataclass
+from functools import wraps
+from time import perf_counter
+from weakref import WeakValueDictionary
+
+C = t.TypeVar("C", bound="CvRDT")
 
 
 @dataclass(frozen=True, order=True)
@@ -24,8 +32,12 @@ class Process:
     ordered across the cluster.  So when adding/removing a process you should
     take measures for not reusing old names.
 
+    Decoded processes are `interned <intern_process>`:func:.
+
     """
 
+    __slots__ = ("order", "name", "__weakref__")
+
     order: int
     name: str
 
@@ -36,12 +48,77 @@ class Process:
     def __repr__(self):
         return f"Process({self.name!r}, {self.order!r})"
 
+    def __reduce__(self):
+        return intern_process, (self.name, self.order)
+
+    def __setstate__(self, state):
+        # Support processes pickled before we used __slots__.
+        for attr, value in state.items():
+            object.__setattr__(self, attr, value)
+
     def __eq__(self, other) -> bool:
         if isinstance(other, Process):
-            return self.name == other.name
+            return self is other or self.name == other.name
         else:
             return NotImplemented
 
+    def __hash__(self):
+        # Consistent with __eq__, which only looks at the name.
+        return hash(self.name)
+
+
+_PROCESSES: WeakValueDictionary[t.Tuple[str, int], Process] = WeakValueDictionary()
+
+
+def intern_process(name: str, order: int) -> Process:
+    """Return the shared `Process`:class: with the given `name` and `order`.
+
+    The shared instance is kept while someone holds a reference to it.
+
+    """
+    key = (name, order)
+    result = _PROCESSES.get(key)
+    if result is None:
+        result = _PROCESSES.setdefault(key, Process(name, order))
+    return result
+
+
+@dataclass(frozen=True)
+class Footprint:
+    """The bytes used by a replica, as reported by `CvRDT.sizeof`:meth:.
+
+    `payload` is the memory of the data itself (items, atoms) and the
+    replica objects; `clock` is the causal metadata (vector clocks,
+    timestamps and the dots tagging items); and `tombstones` is the memory of
+    the data kept only to remember removals.
+
+    """
+
+    __slots__ = ("payload", "clock", "tombstones")
+
+    payload: int
+    clock: int
+    tombstones: int
+
+    def __add__(self, other: Footprint) -> Footprint:
+        if isinstance(other, Footprint):
+            return Footprint(
+                self.payload + other.payload,
+                self.clock + other.clock,
+                self.tombstones + other.tombstones,
+            )
+        else:
+            return NotImplemented
+
+    @property
+    def metadata(self) -> int:
+        "The bytes of the clock and the tombstones."
+        return self.clock + self.tombstones
+
+    @property
+    def total(self) -> int:
+        return self.payload + self.clock + self.tombstones
+
 
 class CvRDT:
     """Base class for Convergent Replicated Data Types.
@@ -51,10 +128,28 @@ class CvRDT:
 
     """
 
+    __slots__ = ("process", "__weakref__")
+
     def __init__(self, *, process: Process) -> None:
         self.process = process
         self.init()
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if _sink is not None:
+            _instrument(cls)
+
+    def __setstate__(self, state):
+        # The default state of objects with __slots__ is the pair
+        # ``(None, slots)``.  Objects pickled before we used __slots__ have
+        # a dict; we support both.
+        if isinstance(state, tuple):
+            state, slots = state
+            if slots:
+                state = dict(state or {}, **slots)
+        for attr, value in (state or {}).items():
+            setattr(self, attr, value)
+
     def init(self) -> None:
         """Set the initial state of a newly create CRDT."""
 
@@ -81,6 +176,58 @@ class CvRDT:
         "Reset the internal state of value, usually to the initial state."
         raise NotImplementedError
 
+    def clone(self: C) -> C:
+        """Return an independent copy of this replica.
+
+        The immutable parts of the state (clocks, processes, items) are
+        shared with the copy; only the mutable containers are copied.  This is
+        much cheaper than `~copy.deepcopy`:func: or a round-trip through
+        `get_state`:func: and `from_state`:func:.
+
+        """
+        return self._copy(snapshot=False)
+
+    def snapshot(self: C) -> C:
+        """Return a copy-on-write copy of this replica.
+
+        The copy shares even the mutable containers with this replica; they
+        are copied by whichever of the two is mutated first.  CRDTs without
+        mutable containers simply return a `clone`:meth:.
+
+        """
+        return self._copy(snapshot=True)
+
+    def _copy(self: C, snapshot: bool) -> C:
+        # Subclasses extend this method to copy their own attributes into the
+        # result.  When `snapshot` is True, they may share their mutable
+        # containers in a copy-on-write fashion.
+        cls = type(self)
+        result = cls.__new__(cls)
+        result.process = self.process
+        return result
+
+    def sizeof(self) -> Footprint:
+        """Return the bytes used by this replica, split by kind.
+
+        The sizes are estimated with `sys.getsizeof`:func: following the
+        references of the state; objects referenced twice are counted once.
+        The process of the replica is shared by all the replicas of a node,
+        so it's not counted.  Caches that are not part of the state (like the
+        digest of a `~xotl.crdt.sets.GSet`:class:) are not counted either.
+
+        """
+        return self._sizeof({id(self.process)})
+
+    @property
+    def metadata_bytes(self) -> int:
+        "The bytes of causal metadata and tombstones; see `sizeof`:meth:."
+        return self.sizeof().metadata
+
+    def _sizeof(self, seen: t.Set[int]) -> Footprint:
+        # Subclasses override this method to split their state by kind.
+        # `seen` holds the ids of the objects already counted.
+        return Footprint(deep_sizeof(self, seen), 0, 0)
+
     def __le__(self, other):
         """Compares two replicas for '<=' in the semilattice.
 
@@ -98,9 +245,57 @@ class CvRDT:
         return NotImplemented
 
 
+_ATOMIC_TYPES = (str, bytes, bytearray, int, float, complex, type(None), type)
+
+
+def deep_sizeof(obj: t.Any, seen: t.Optional[t.Set[int]] = None) -> int:
+    """Return the bytes used by `obj` and the objects it references.
+
+    We follow the items of tuples, lists, sets and dicts, and the attributes
+    of objects (both in ``__slots__`` and ``__dict__``).  Objects whose id is
+    in `seen` are skipped; the ids of the objects counted are added to it.
+
+    """
+    if seen is None:
+        seen = set()
+    result = 0
+    pending = [obj]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        result += sys.getsizeof(obj)
+        if isinstance(obj, _ATOMIC_TYPES):
+            pass
+        elif isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (tuple, list, set, frozenset)):
+            pending.extend(obj)
+        else:
+            for cls in type(obj).__mro__:
+                slots = cls.__dict__.get("__slots__", ())
+                for slot in (slots,) if isinstance(slots, str) else slots:
+                    if slot not in ("__dict__", "__weakref__") and hasattr(
+                        obj, slot
+                    ):
+                        pending.append(getattr(obj, slot))
+            if hasattr(obj, "__dict__"):
+                pending.append(obj.__dict__)
+    return result
+
+
 def get_state(crdt: CvRDT) -> bytes:
     """Dumps the crdt in a way that is amenable for transmission/storage."""
-    return pickle.dumps(crdt)
+    sink = _sink
+    if sink is None:
+        return pickle.dumps(crdt)
+    start = perf_counter()
+    result = pickle.dumps(crdt)
+    _record(sink, type(crdt).__name__, "encode", perf_counter() - start)
+    sink.observe(type(crdt).__name__, "encode.bytes", len(result))
+    return result
 
 
 def from_state(state: bytes) -> CvRDT:
@@ -112,8 +307,199 @@ def from_state(state: bytes) -> CvRDT:
         assert crdt == from_state(get_state(crdt))
 
     """
-    res = pickle.loads(state)
+    sink = _sink
+    if sink is None:
+        res = pickle.loads(state)
+    else:
+        start = perf_counter()
+        res = pickle.loads(state)
+        _record(sink, type(res).__name__, "decode", perf_counter() - start)
+        sink.observe(type(res).__name__, "decode.bytes", len(state))
     if not isinstance(res, CvRDT):
         raise ValueError("Invalid state")  # pragma: no cover
     else:
         return res
+
+
+class MetricsSink(abc.ABC):
+    """The receiver of the metrics of the CRDTs.
+
+    Metrics are named by the type of the CRDT (e.g. ``"GSet"``) and the
+    metric:
+
+    - ``merge``, ``compare`` (``<=`` and ``==``), ``encode`` and ``decode``
+      are counted, and their durations observed as ``<operation>.seconds``.
+
+    - ``merge.noop`` counts the merges with a replica which was already
+      included in ours.
+
+    - ``encode.bytes`` and ``decode.bytes`` observe the size of the states.
+
+    Only the outermost operation is measured: the merge of a
+    `~xotl.crdt.counter.PNCounter`:class: is not counted as two merges of
+    GCounter.
+
+    """
+
+    @abc.abstractmethod
+    def count(self, kind: str, metric: str, n: int = 1) -> None:
+        "Increase the counter `metric` of the CRDTs of type `kind`."
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def observe(self, kind: str, metric: str, value: float) -> None:
+        "Record an observation of `metric` of the CRDTs of type `kind`."
+        raise NotImplementedError
+
+
+class Histogram:
+    """A summary of observed values.
+
+    Besides the count, total, minimum and maximum, values are counted in
+    buckets by their binary exponent: the bucket `e` counts the values in
+    ``[2**(e-1), 2**e)``; zero and negative values go to the bucket
+    ``None``.
+
+    """
+
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.buckets: t.Dict[t.Optional[int], int] = {}
+
+    def __repr__(self):
+        return f"<Histogram: {self.count} values; mean {self.mean}>"
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, value: float) -> None:
+        "Record an observed `value`."
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        bucket = math.frexp(value)[1] if value > 0 else None
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+
+class Metrics(MetricsSink):
+    """A sink that keeps the metrics in memory.
+
+    `counters` maps the pairs ``(kind, metric)`` to their counts;
+    `histograms` maps them to a `Histogram`:class: of the observations.
+
+    """
+
+    def __init__(self) -> None:
+        self.counters: t.Dict[t.Tuple[str, str], int] = {}
+        self.histograms: t.Dict[t.Tuple[str, str], Histogram] = {}
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<Metrics: {len(self.counters)} counters>"
+
+    def count(self, kind: str, metric: str, n: int = 1) -> None:
+        key = (kind, metric)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, kind: str, metric: str, value: float) -> None:
+        key = (kind, metric)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.add(value)
+
+    def clear(self) -> None:
+        "Forget all the metrics."
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+_sink: t.Optional[MetricsSink] = None
+_local = threading.local()
+
+# The methods measured in each CvRDT class, and the operation they perform.
+_MEASURED = {"merge": "merge", "__le__": "compare", "__eq__": "compare"}
+
+
+def set_metrics_sink(sink: t.Optional[MetricsSink]) -> t.Optional[MetricsSink]:
+    """Send the metrics of all CRDTs to `sink`; or disable them if None.
+
+    Return the previous sink.
+
+    Metrics are disabled by default.  When enabled, the methods ``merge``,
+    ``__le__`` and ``__eq__`` of every `CvRDT`:class: sub-class are replaced
+    by measured ones; when disabled, the original methods are restored.  So
+    they cost nothing when disabled.  `get_state`:func: and `from_state`:func:
+    only check whether there's a sink.
+
+    Detecting no-op merges requires a comparison of the replicas before each
+    merge.
+
+    """
+    global _sink
+    previous, _sink = _sink, sink
+    if (previous is None) != (sink is None):
+        update = _instrument if sink is not None else _uninstrument
+        for cls in _subclasses(CvRDT):
+            update(cls)
+    return previous
+
+
+def _subclasses(cls: type) -> t.Iterator[type]:
+    sub: type
+    for sub in cls.__subclasses__():
+        yield sub
+        yield from _subclasses(sub)
+
+
+def _instrument(cls: type) -> None:
+    for name, operation in _MEASURED.items():
+        method = cls.__dict__.get(name)
+        if method is not None and not hasattr(method, "_measured"):
+            setattr(cls, name, _measured(method, operation))
+
+
+def _uninstrument(cls: type) -> None:
+    for name in _MEASURED:
+        method = cls.__dict__.get(name)
+        if method is not None and hasattr(method, "_measured"):
+            setattr(cls, name, method.__wrapped__)
+
+
+def _measured(method, operation: str):
+    @wraps(method)
+    def wrapper(self, other, *args, **kwargs):
+        sink = _sink
+        if sink is None or getattr(_local, "busy", False):
+            return method(self, other, *args, **kwargs)
+        _local.busy = True
+        try:
+            noop = operation == "merge" and other <= self
+            start = perf_counter()
+            result = method(self, other, *args, **kwargs)
+            elapsed = perf_counter() - start
+        finally:
+            _local.busy = False
+        kind = type(self).__name__
+        _record(sink, kind, operation, elapsed)
+        if noop:
+            sink.count(kind, "merge.noop")
+        return result
+
+    wrapper._measured = True  # type: ignore
+    return wrapper
+
+
+def _record(sink: MetricsSink, kind: str, operation: str, seconds: float) -> None:
+    sink.count(kind, operation)
+    sink.observe(kind, f"{operation}.seconds", seconds)
@@ -11,11 +11,12 @@
 from __future__ import annotations
 
 import typing as t
-from collections import deque
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
 from heapq import merge
 from itertools import groupby
 from operator import attrgetter
+from weakref import WeakValueDictionary
 
 from xotl.crdt.base import Process
 
@@ -24,13 +25,47 @@ from xotl.crdt.base import Process
 class Dot:
     """A component on the vector clock."""
 
+    __slots__ = ("process", "counter")
+
     # process names should be unique across all processes
     process: Process
     counter: int
 
+    def __eq__(self, other) -> bool:
+        # Compare field by field to avoid building tuples.
+        if isinstance(other, Dot):
+            return self.counter == other.counter and self.process == other.process
+        else:
+            return NotImplemented
+
+    def __hash__(self):
+        return hash((self.process, self.counter))
+
+    def __reduce__(self):
+        return Dot, (self.process, self.counter)
+
+    def __setstate__(self, state):
+        # Support dots pickled before we used __slots__.
+        for attr, value in state.items():
+            object.__setattr__(self, attr, value)
+
 
 @dataclass(frozen=True, init=False)
 class VClock:
+    """A vector clock.
+
+    The `dots` are sorted by process and *normalized*: there's no dot with
+    counter 0 (a missing process is the same as one with counter 0).  The
+    invariant is established when the clock is created, bumped or merged; so
+    comparisons and hashing can work directly on `dots`.
+
+    Merged and decoded clocks are `interned <intern_clock>`:func:, so that
+    replicas that have converged share the same clock.
+
+    """
+
+    __slots__ = ("dots", "__weakref__")
+
     dots: t.Tuple[Dot, ...]
 
     def __init__(self, dots: t.Optional[t.Sequence[Dot]] = None) -> None:
@@ -38,56 +73,55 @@ class VClock:
             assert len([d.process for d in dots]) == len({
                 d.process for d in dots
             }), f"Repeated processes in {dots!r}"
-        # Avoid silly counters.
-        dots = [d for d in (dots or []) if d.counter >= 0]
+        # Avoid silly counters, and normalize the clock.
+        dots = [d for d in (dots or []) if d.counter > 0]
         dots.sort(key=attrgetter("process"))
         object.__setattr__(self, "dots", tuple(dots))
 
+    def __reduce__(self):
+        return _decode_clock, (self.dots,)
+
+    def __setstate__(self, state):
+        # Support clocks pickled before we used __slots__ (and normalize
+        # them).
+        dots = tuple(d for d in state["dots"] if d.counter > 0)
+        object.__setattr__(self, "dots", dots)
+
     def __ge__(self, other) -> bool:
         """True if this vclock descends (happens after) from other."""
         if isinstance(other, VClock):
-            # Remember, that '.dots' are ordered by 'process'; with this in
-            # mind the algorithm is easy to follow.
-            #
-            # This algorithm consider missing processes as if they were there
-            # with counter 0.  But, then if any process is present with
-            # counter 0, we should remove it from the dots.
-            theirs = deque(d for d in other.dots if d.counter)
-            ours = deque(d for d in self.dots if d.counter)
-            if not theirs:
-                return True  # Every VC decends from the empty one.
-            elif not ours:
-                return False  # Empty VC doesnt descent from non-empty ones.
-            result = True
-            while theirs and ours and result:
-                their_dot = theirs.popleft()
-                our_dot = ours.popleft()
-                while ours and their_dot.process != our_dot.process:
-                    our_dot = ours.popleft()
-                if our_dot.process == their_dot.process:
-                    result = our_dot.counter >= their_dot.counter
-                else:
-                    assert not ours
-                    result = False
-            return result and not theirs
+            # Remember, that '.dots' are ordered by 'process' and have no
+            # zero counters; with this in mind the algorithm is easy to
+            # follow: every process in `other` must be present in `self` with
+            # a counter at least as big.
+            ours, theirs = self.dots, other.dots
+            if ours is theirs:
+                return True
+            size = len(ours)
+            if len(theirs) > size:
+                return False
+            i = 0
+            for their_dot in theirs:
+                process = their_dot.process
+                while i < size and ours[i].process != process:
+                    i += 1
+                if i == size or ours[i].counter < their_dot.counter:
+                    return False
+                i += 1
+            return True
         else:
             return NotImplemented
 
     def __eq__(self, other) -> bool:  # type: ignore
         """True if this vclock is the same as other."""
         if isinstance(other, VClock):
-            # Equality requires that every process present in `self` must be
-            # present in `other` with the same counter.  This is faster than
-            # ``self >= other >= self``.
-            theirs = [d for d in other.dots if d.counter]
-            ours = [d for d in self.dots if d.counter]
-            return ours == theirs
+            return self is other or self.dots == other.dots
         else:
             return NotImplemented
 
     def __hash__(self):
         # NB: self.dots is ordered by process, so we get a consistent hash.
-        return hash(tuple(d for d in self.dots if d.counter))
+        return hash(self.dots)
 
     def __floordiv__(self, other) -> bool:
         """True if neither self descends from other nor other from self.
@@ -124,30 +158,35 @@ class VClock:
     def merge(self, *others: VClock) -> VClock:
         """Return the least possible common descendant."""
         get_process = attrgetter("process")
+        get_counter = attrgetter("counter")
         groups = groupby(
             merge(self.dots, *(o.dots for o in others), key=get_process),
             key=get_process,
         )
-        dots = [
-            Dot(process, max(d.counter for d in group)) for process, group in groups
-        ]
+        # Reuse the winning dots instead of creating new ones.
+        dots = tuple(max(group, key=get_counter) for _, group in groups)
+        if dots == self.dots:
+            return intern_clock(self)
         # Silly little trick to avoid sorting what is sorted already
         result = VClock()
-        object.__setattr__(result, "dots", tuple(dots))
-        return result
+        object.__setattr__(result, "dots", dots)
+        return intern_clock(result)
 
     def __add__(self, other):
         "Return the merge with other."
         return self.merge(other)
 
-    def bump(self, process):
-        """Return a new VC with the process's counter increased."""
+    def bump(self, process, n: int = 1):
+        """Return a new VC with the process's counter increased by `n`."""
+        if n < 1:
+            raise ValueError(f"Cannot bump a clock by {n!r}")
+        dots: t.Iterable[Dot]
         try:
             i = index(self.dots, process, key=attrgetter("process"))
             dots = list(self.dots)
-            dots[i] = Dot(process, dots[i].counter + 1)
+            dots[i] = Dot(process, dots[i].counter + n)
         except ValueError:
-            new = Dot(process, 1)
+            new = Dot(process, n)
             dots = merge(self.dots, [new], key=attrgetter("process"))
         result = VClock()
         object.__setattr__(result, "dots", tuple(dots))
@@ -162,20 +201,275 @@ class VClock:
 
         Basically forget about all the clock state.
 
+        .. warning:: This changes the clock in place, and clocks are shared
+           after merges.  CRDTs should replace their clock with an empty one
+           instead.
+
         """
+        if _CLOCKS.get(self.dots) is self:
+            del _CLOCKS[self.dots]
         object.__setattr__(self, "dots", ())
 
 
+Range = t.Tuple[int, int]
+
+
+class DotContext:
+    """A causal context: the set of dots a replica has seen.
+
+    Dots are kept as a version vector (the `vclock`) with the dots seen
+    without gaps from each process, plus the `ranges` seen after a gap.  The
+    `ranges` map processes to sorted tuples of half-open ranges ``(start,
+    stop)`` of counters; e.g. a context with the dots 1, 2, 3, 5, 6 and 9 of
+    process ``p`` has the dot ``(p, 3)`` in its clock and the ranges ``((5,
+    7), (9, 10))``.
+
+    Contexts are immutable and *compacted*: ranges never overlap nor touch
+    each other or the clock, so once a gap is filled its ranges are folded
+    into the clock.  A context without ranges is just a `VClock`:class:
+    (see `to_vclock`:meth:).
+
+    Unlike a `VClock`:class:, a context can represent the dots delivered out
+    of order, or those of a delta.  Comparisons are the inclusion of sets of
+    dots.
+
+    """
+
+    __slots__ = ("vclock", "ranges")
+
+    vclock: VClock
+    ranges: t.Mapping[Process, t.Tuple[Range, ...]]
+
+    def __init__(
+        self,
+        vclock: t.Optional[VClock] = None,
+        ranges: t.Optional[t.Mapping[Process, t.Iterable[Range]]] = None,
+    ) -> None:
+        if vclock is None:
+            vclock = VClock()
+        compacted: t.Dict[Process, t.Tuple[Range, ...]] = {}
+        if ranges:
+            counters = {dot.process: dot.counter for dot in vclock.dots}
+            folded = False
+            for process, extra in ranges.items():
+                current = counters.get(process, 0)
+                counter, rest = _compact(current, extra)
+                if counter != current:
+                    counters[process] = counter
+                    folded = True
+                if rest:
+                    compacted[process] = rest
+            if folded:
+                vclock = VClock([Dot(p, c) for p, c in counters.items()])
+        self.vclock = vclock
+        self.ranges = compacted
+
+    @classmethod
+    def from_dots(cls, dots: t.Iterable[Dot]) -> DotContext:
+        "Return the context with the given `dots`."
+        counters: t.Dict[Process, t.List[int]] = {}
+        for dot in dots:
+            if dot.counter > 0:
+                counters.setdefault(dot.process, []).append(dot.counter)
+        return cls(
+            ranges={
+                process: [(counter, counter + 1) for counter in values]
+                for process, values in counters.items()
+            }
+        )
+
+    def __reduce__(self):
+        return DotContext, (self.vclock, self.ranges)
+
+    def __repr__(self):
+        if self.ranges:
+            return f"DotContext({self.vclock!r}, {self.ranges!r})"
+        else:
+            return f"DotContext({self.vclock!r})"
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, DotContext):
+            return self.vclock == other.vclock and self.ranges == other.ranges
+        else:
+            return NotImplemented
+
+    def __hash__(self):
+        return hash((self.vclock, tuple(sorted(self.ranges.items()))))
+
+    def __bool__(self):
+        return bool(self.vclock.dots or self.ranges)
+
+    def __contains__(self, dot) -> bool:
+        if not isinstance(dot, Dot):
+            return False
+        counter = self.counter(dot.process)
+        if dot.counter <= counter:
+            return dot.counter > 0
+        extra = self.ranges.get(dot.process)
+        if extra:
+            i = bisect_right(extra, (dot.counter, _INFINITY)) - 1
+            return i >= 0 and dot.counter < extra[i][1]
+        return False
+
+    def __ge__(self, other) -> bool:
+        "True if this context includes all the dots of `other`."
+        if isinstance(other, DotContext):
+            if self is other:
+                return True
+            if not self.vclock >= other.vclock:
+                if not self.ranges:
+                    return False
+                for dot in other.vclock.dots:
+                    if not self._covers(dot.process, 1, dot.counter + 1):
+                        return False
+            for process, extra in other.ranges.items():
+                for start, stop in extra:
+                    if not self._covers(process, start, stop):
+                        return False
+            return True
+        else:
+            return NotImplemented
+
+    def __le__(self, other) -> bool:
+        return other >= self
+
+    def __gt__(self, other):
+        if isinstance(other, DotContext):
+            return self >= other and not (other >= self)
+        else:
+            return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, DotContext):
+            return other >= self and not (self >= other)
+        else:
+            return NotImplemented
+
+    def __floordiv__(self, other) -> bool:
+        "True if neither context includes the other."
+        return not (self <= other) and not (other <= self)
+
+    def counter(self, process: Process) -> int:
+        "Return the counter of `process` in the clock; 0 if it's not there."
+        try:
+            return self.vclock.find(process).counter
+        except ValueError:
+            return 0
+
+    def last(self, process: Process) -> int:
+        "Return the highest counter seen of `process`; 0 if none."
+        extra = self.ranges.get(process)
+        if extra:
+            return extra[-1][1] - 1
+        else:
+            return self.counter(process)
+
+    def next_dot(self, process: Process) -> Dot:
+        "Return the dot after the highest one seen of `process`."
+        return Dot(process, self.last(process) + 1)
+
+    def gaps(self, process: Process) -> t.Tuple[Range, ...]:
+        "Return the ranges of counters of `process` missing below the last."
+        result = []
+        start = self.counter(process) + 1
+        for begin, end in self.ranges.get(process, ()):
+            result.append((start, begin))
+            start = end
+        return tuple(result)
+
+    def add(self, dot: Dot) -> DotContext:
+        "Return a context with our dots and `dot`."
+        if dot in self:
+            return self
+        return self.merge(DotContext.from_dots([dot]))
+
+    def merge(self, *others: DotContext) -> DotContext:
+        "Return the union of this context and the `others`."
+        vclock = self.vclock.merge(*(other.vclock for other in others))
+        if not self.ranges and not any(other.ranges for other in others):
+            if vclock == self.vclock:
+                return self
+            return DotContext(vclock)
+        ranges: t.Dict[Process, t.List[Range]] = {}
+        for context in (self, *others):
+            for process, extra in context.ranges.items():
+                ranges.setdefault(process, []).extend(extra)
+        return DotContext(vclock, ranges)
+
+    def __add__(self, other):
+        "Return the merge with other."
+        return self.merge(other)
+
+    def to_vclock(self) -> VClock:
+        """Return the `VClock`:class: with our dots.
+
+        Raise ValueError if there are gaps.
+
+        """
+        if self.ranges:
+            raise ValueError(f"The context has gaps: {self!r}")
+        return self.vclock
+
+    def _covers(self, process: Process, start: int, stop: int) -> bool:
+        # True if all the counters in [start, stop) of process are in the
+        # context.
+        counter = self.counter(process)
+        if stop - 1 <= counter:
+            return True
+        start = max(start, counter + 1)
+        extra = self.ranges.get(process, ())
+        i = bisect_right(extra, (start, _INFINITY)) - 1
+        return i >= 0 and stop <= extra[i][1]
+
+
+_INFINITY = float("inf")
+
+
+def _compact(
+    counter: int, ranges: t.Iterable[Range]
+) -> t.Tuple[int, t.Tuple[Range, ...]]:
+    # Fold the `ranges` into the `counter` (which means the range [1,
+    # counter]) where possible, and merge the remaining overlapping or
+    # touching ranges.  Return the new counter and ranges.
+    result: t.List[Range] = []
+    for start, stop in sorted(ranges):
+        if start >= stop:
+            continue
+        if start <= counter + 1:
+            counter = max(counter, stop - 1)
+        elif result and start <= result[-1][1]:
+            result[-1] = (result[-1][0], max(result[-1][1], stop))
+        else:
+            result.append((start, stop))
+    return counter, tuple(result)
+
+
+_CLOCKS: WeakValueDictionary[t.Tuple[Dot, ...], VClock] = WeakValueDictionary()
+
+
+def intern_clock(clock: VClock) -> VClock:
+    """Return the shared clock equal to `clock`.
+
+    If there's none, `clock` becomes the shared one.  The shared instance is
+    kept while someone holds a reference to it.
+
+    """
+    result = _CLOCKS.get(clock.dots)
+    if result is None:
+        result = _CLOCKS.setdefault(clock.dots, clock)
+    return result
+
+
+def _decode_clock(dots: t.Tuple[Dot, ...]) -> VClock:
+    result = _CLOCKS.get(dots)
+    if result is None:
+        result = intern_clock(VClock(dots))
+    return result
+
+
 def index(a, x, key=None):
     "Locate the leftmost value exactly equal to x."
-    from bisect import bisect_left
-
-    if not key:
-        i = bisect_left(a, x)
-        if i != len(a) and a[i] == x:
-            return i
-    else:
-        i = bisect_left([key(y) for y in a], x)
-        if i != len(a) and key(a[i]) == x:
-            return i
+    i = bisect_left(a, x, key=key)
+    if i != len(a) and (key(a[i]) if key else a[i]) == x:
+        return i
     raise ValueError
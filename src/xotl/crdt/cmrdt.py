@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Operation-based (commutative) replicated data types.
+
+The CRDTs in the rest of the package are state-based: each update is
+propagated by transmitting the whole state of the replica.  The CmRDTs in this
+module propagate *operations* instead.  Each local mutator applies the update
+and returns an `Operation`:class: which must be delivered to every other
+replica (with `CmRDT.deliver`:meth:).
+
+Operations carry the vector clock of the replica that emitted them.  Each
+replica keeps a `CausalBuffer`:class: that holds the operations until all the
+operations they depend on have been delivered; then they are applied in
+causal order and exactly once.  So the transport may delay, reorder and
+duplicate operations, but it must not lose them.
+
+"""
+
+from __future__ import annotations
+
+import abc
+import pickle
+import typing as t
+from dataclasses import dataclass
+from time import monotonic
+
+from xotl.crdt.base import Process
+from xotl.crdt.clocks import Dot, VClock
+
+
+@dataclass(frozen=True)
+class Operation:
+    """An operation emitted by a replica.
+
+    `clock` is the vector clock of the emitting replica right after the
+    operation; so the counter of `process` in it identifies the operation.
+    `name` and `args` describe the update to the data type.
+
+    """
+
+    __slots__ = ("process", "clock", "name", "args")
+
+    process: Process
+    clock: VClock
+    name: str
+    args: t.Tuple[t.Any, ...]
+
+    def __reduce__(self):
+        return Operation, (self.process, self.clock, self.name, self.args)
+
+    @property
+    def dot(self) -> Dot:
+        "The dot which identifies this operation."
+        return self.clock.find(self.process)
+
+
+def encode_op(op: Operation) -> bytes:
+    """Dumps the operation in a way that is amenable for transmission."""
+    return pickle.dumps(op)
+
+
+def decode_op(data: bytes) -> Operation:
+    """Reconstruct an operation dumped with `encode_op`:func:."""
+    res = pickle.loads(data)
+    if not isinstance(res, Operation):
+        raise ValueError("Invalid operation")  # pragma: no cover
+    else:
+        return res
+
+
+def _counter(clock: VClock, process: Process) -> int:
+    try:
+        return clock.find(process).counter
+    except ValueError:
+        return 0
+
+
+class CausalBuffer:
+    """Holds operations until they can be delivered in causal order.
+
+    `vclock` is the clock of the operations delivered so far.  An operation
+    emitted by process `p` is deliverable when it's the next one from `p`,
+    and every operation it depends on (from other processes) has been
+    delivered.
+
+    """
+
+    __slots__ = ("vclock", "pending")
+
+    def __init__(self) -> None:
+        self.vclock = VClock()
+        # The operations waiting for their dependencies, indexed by process
+        # and counter.
+        self.pending: t.Dict[Process, t.Dict[int, Operation]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(ops) for ops in self.pending.values())
+
+    def __repr__(self):
+        return f"<CausalBuffer: {len(self)} pending; {self.vclock}>"
+
+    def stamp(self, process: Process) -> VClock:
+        """Return the clock of a new local operation of `process`.
+
+        The operation is considered delivered.
+
+        """
+        self.vclock = self.vclock.bump(process)
+        return self.vclock
+
+    def receive(self, op: Operation) -> t.List[Operation]:
+        """Buffer `op` and return the operations that became deliverable.
+
+        The operations are returned in causal order and are considered
+        delivered.  Operations already delivered (or buffered) are ignored.
+
+        """
+        counter = op.dot.counter
+        if counter <= _counter(self.vclock, op.process):
+            return []
+        self.pending.setdefault(op.process, {}).setdefault(counter, op)
+        result = []
+        progress = True
+        while progress:
+            progress = False
+            for process, ops in list(self.pending.items()):
+                following = ops.get(_counter(self.vclock, process) + 1)
+                if following is not None and self._deliverable(following):
+                    del ops[following.dot.counter]
+                    if not ops:
+                        del self.pending[process]
+                    self.vclock = self.vclock.bump(process)
+                    result.append(following)
+                    progress = True
+        return result
+
+    def _deliverable(self, op: Operation) -> bool:
+        # The counter of `op.process` is known to be the next one, the
+        # operation can be delivered if we have seen everything else the
+        # emitter had.
+        return op.clock <= self.vclock.bump(op.process)
+
+
+class CmRDT:
+    """Base class for Commutative (operation-based) Replicated Data Types.
+
+    Subclasses implement their mutators by calling `emit`:meth: and must
+    implement `apply`:meth:.
+
+    """
+
+    __slots__ = ("process", "buffer")
+
+    def __init__(self, *, process: Process) -> None:
+        self.process = process
+        self.buffer = CausalBuffer()
+        self.init()
+
+    def init(self) -> None:
+        """Set the initial state of a newly create CRDT."""
+
+    @property
+    def vclock(self) -> VClock:
+        "The clock of the operations applied to this replica."
+        return self.buffer.vclock
+
+    @property
+    def value(self):
+        """The current value that is managed by this CRDT.
+
+        This is a read-only property.
+
+        """
+        raise NotImplementedError
+
+    def emit(self, name: str, *args) -> Operation:
+        """Apply a local operation and return it.
+
+        The result must be delivered to all the other replicas.
+
+        """
+        op = Operation(self.process, self.buffer.stamp(self.process), name, args)
+        self.apply(op)
+        return op
+
+    def deliver(self, op: Operation) -> t.List[Operation]:
+        """Receive an operation from another replica.
+
+        Return the operations that were applied as a result; which can be
+        none (if `op` depends on operations not yet delivered) or more than
+        one (if `op` was the missing dependency of others).
+
+        """
+        result = self.buffer.receive(op)
+        for ready in result:
+            self.apply(ready)
+        return result
+
+    @abc.abstractmethod
+    def apply(self, op: Operation) -> None:
+        """Update the state of the replica with a causally ready `op`."""
+        raise NotImplementedError
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CmRDT):
+            return (
+                type(self) is type(other)
+                and self.process == other.process
+                and self.vclock == other.vclock
+            )
+        else:
+            return NotImplemented
+
+    __hash__ = None  # type: ignore
+
+
+class OpGCounter(CmRDT):
+    """An operation-based increment-only counter."""
+
+    __slots__ = ("total",)
+
+    def init(self):
+        self.total = 0
+
+    def __repr__(self):
+        return f"<OpGCounter of {self.value}; {self.process}, {self.vclock}>"
+
+    @property
+    def value(self) -> int:
+        "The current value of the counter"
+        return self.total
+
+    def incr(self, n: int = 1) -> Operation:
+        "Increases the counter by `n` (one by default)."
+        if n < 1:
+            raise ValueError(f"Cannot increase a counter by {n!r}")
+        return self.emit("incr", n)
+
+    def apply(self, op: Operation) -> None:
+        (n,) = op.args
+        self.total += n
+
+
+class OpPNCounter(OpGCounter):
+    """An operation-based counter that allows increments and decrements."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return f"<OpPNCounter of {self.value}; {self.process}, {self.vclock}>"
+
+    def decr(self, n: int = 1) -> Operation:
+        "Decreases the counter by `n` (one by default)."
+        if n < 1:
+            raise ValueError(f"Cannot decrease a counter by {n!r}")
+        return self.emit("incr", -n)
+
+
+class OpLWWRegister(CmRDT):
+    """An operation-based Last-Write-Wins Register.
+
+    Writes are applied in causal order, so a write always wins over the ones
+    it has seen.  Among concurrent writes, the one with the highest timestamp
+    wins; and if timestamps are equal, the process with highest `priority
+    <xotl.crdt.base.Process>`:class: wins.  These are the same rules of
+    `~xotl.crdt.register.LWWRegister`:class:.
+
+    """
+
+    __slots__ = ("atom", "timestamp", "writer", "written")
+
+    def init(self):
+        self.atom = None
+        self.timestamp = 0
+        # The process and clock of the winning write.
+        self.writer: t.Optional[Process] = None
+        self.written = VClock()
+
+    def __repr__(self):
+        return f"<OpLWWRegister: {self.value}; {self.process}, {self.vclock}>"
+
+    @property
+    def value(self):
+        return self.atom
+
+    def set(self, value, *, _timestamp=None) -> Operation:
+        """Set the `value` of the register.
+
+        `value` should be an immutable object.
+
+        """
+        hash(value)  # Check is immutable; mutable objs should raise an error
+        if _timestamp is None:
+            ts = max(self.timestamp, monotonic())
+        else:
+            ts = _timestamp
+        return self.emit("set", value, ts)
+
+    def apply(self, op: Operation) -> None:
+        value, ts = op.args
+        # Causal delivery ensures op.clock is never before self.written.
+        if self.writer is None or self.written <= op.clock:
+            wins = True
+        elif ts != self.timestamp:
+            wins = ts > self.timestamp
+        else:
+            wins = self.writer < op.process
+        if wins:
+            self.atom = value
+            self.writer = op.process
+            self.written = op.clock
+        self.timestamp = max(self.timestamp, ts)
+
+
+class OpORSet(CmRDT):
+    """An operation-based Observed-Remove Set.
+
+    Each addition tags the item with the `~xotl.crdt.clocks.Dot`:class: of
+    the operation; a removal removes the tags the replica has observed.  So
+    an addition concurrent with a removal of the same item wins.
+
+    """
+
+    __slots__ = ("tags",)
+
+    def init(self):
+        self.tags: t.Dict[t.Any, t.Set[Dot]] = {}
+
+    def __repr__(self):
+        return f"<OpORSet: {self.value}; {self.process}, {self.vclock}>"
+
+    @property
+    def value(self) -> frozenset:
+        return frozenset(self.tags)
+
+    def __contains__(self, item) -> bool:
+        return item in self.tags
+
+    def add(self, item) -> Operation:
+        """Add `item` to the set."""
+        return self.emit("add", item)
+
+    def remove(self, item) -> t.Optional[Operation]:
+        """Remove `item` from the set.
+
+        If `item` is not in (this replica's view of) the set, do nothing and
+        return None.
+
+        """
+        tags = self.tags.get(item)
+        if tags:
+            return self.emit("remove", item, frozenset(tags))
+        else:
+            return None
+
+    def apply(self, op: Operation) -> None:
+        if op.name == "add":
+            (item,) = op.args
+            self.tags.setdefault(item, set()).add(op.dot)
+        else:
+            item, removed = op.args
+            # Causal delivery ensures the removed tags were already added;
+            # but a concurrent removal may have removed them already.
+            tags = self.tags.get(item)
+            if tags is not None:
+                tags -= removed
+                if not tags:
+                    del self.tags[item]
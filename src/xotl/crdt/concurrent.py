@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Thread-safe variants of the set CRDTs.
+
+The CRDTs in `xotl.crdt.sets`:mod: are not safe to mutate from one thread
+while another merges or encodes them.  The classes in this module are an
+opt-in alternative: items are partitioned in *stripes* by their hash, and each
+stripe is guarded by its own lock.  A merge coming from a network thread only
+holds the lock of the stripe it's updating, so it can proceed in parallel with
+local writes to other stripes.
+
+Readers (`value`, encoders) never hold a lock while iterating: each stripe
+keeps a copy-on-write snapshot (a frozenset) that is taken once and reused
+until the next mutation of that stripe.
+
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import typing as t
+from collections.abc import Set
+from contextlib import contextmanager
+
+from xotl.crdt.base import CvRDT, Footprint, Process, deep_sizeof
+from xotl.crdt.feed import emit_items, watched
+from xotl.crdt.sets import GSet, TwoPhaseSet, items_digest
+
+DEFAULT_STRIPES = 16
+_DIGEST_MASK = (1 << 64) - 1
+
+
+class StripedLock:
+    """A fixed number of locks; each hashable item is guarded by one of them.
+
+    Since the stripe of an item is computed with `hash`:func:, the assignment
+    is only stable within a single Python process.
+
+    """
+
+    def __init__(self, stripes: int = DEFAULT_STRIPES) -> None:
+        if stripes < 1:
+            raise ValueError(f"Invalid number of stripes: {stripes!r}")
+        self.locks = tuple(threading.RLock() for _ in range(stripes))
+
+    def __len__(self) -> int:
+        return len(self.locks)
+
+    def index(self, item) -> int:
+        "Return the index of the stripe that guards `item`."
+        return hash(item) % len(self.locks)
+
+    def __getitem__(self, item) -> threading.RLock:
+        return self.locks[self.index(item)]
+
+    @contextmanager
+    def all(self):
+        """Acquire all the stripes.
+
+        Stripes are always acquired in the same order to avoid deadlocks.
+
+        """
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            yield self
+        finally:
+            for lock in reversed(self.locks):
+                lock.release()
+
+
+class StripedItems(Set):
+    """A read-only view of the items of a `ConcurrentGSet`:class:.
+
+    Iterating the view iterates a snapshot of the set.
+
+    """
+
+    __slots__ = ("owner",)
+
+    def __init__(self, owner: ConcurrentGSet) -> None:
+        self.owner = owner
+
+    def __repr__(self):
+        return f"<StripedItems: {set(self)}>"
+
+    @classmethod
+    def _from_iterable(cls, it):
+        return set(it)
+
+    def __contains__(self, item) -> bool:
+        owner = self.owner
+        return item in owner.shards[owner.locks.index(item)]
+
+    def __iter__(self):
+        return iter(self.owner.value)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.owner.shards)
+
+    def difference(self, *others: t.Iterable[t.Any]) -> t.Set[t.Any]:
+        return set(self.owner.value).difference(*others)
+
+    def copy(self) -> t.Set[t.Any]:
+        return set(self.owner.value)
+
+
+class ConcurrentGSet(GSet):
+    """A thread-safe `~xotl.crdt.sets.GSet`:class:.
+
+    The items live in `shards`; the attribute `items` is a read-only
+    `StripedItems`:class: view of them.  The `digest` is kept up to date by
+    the mutators.
+
+    """
+
+    # 'digests' are the digests of the shards, updated under the lock of
+    # each stripe; 'digest_lock' guards the update of the total.
+    __slots__ = ("locks", "shards", "frozen", "digests", "digest_lock")
+
+    def __init__(self, *, process: Process, stripes: int = DEFAULT_STRIPES) -> None:
+        self.locks = StripedLock(stripes)
+        self.digest_lock = threading.Lock()
+        super().__init__(process=process)
+
+    def init(self):
+        stripes = len(self.locks)
+        self.shards: t.List[t.Set[t.Any]] = [set() for _ in range(stripes)]
+        # The cached snapshot of each shard; None if the shard changed since
+        # the last snapshot was taken.
+        self.frozen: t.List[t.Optional[frozenset]] = [frozenset()] * stripes
+        self.digests = [0] * stripes
+        self.items = StripedItems(self)
+        self.digest = 0
+        self.shared = False
+
+    def __repr__(self):
+        return f"<ConcurrentGSet: {self.value}; {self.process}>"
+
+    def __getstate__(self):
+        return {
+            "process": self.process,
+            "stripes": len(self.locks),
+            "items": self.value,
+        }
+
+    def __setstate__(self, state):
+        self.process = state["process"]
+        self.locks = StripedLock(state["stripes"])
+        self.digest_lock = threading.Lock()
+        self.init()
+        self._extend(state["items"])
+
+    def _copy(self, snapshot):
+        result = CvRDT._copy(self, snapshot)
+        stripes = len(self.locks)
+        result.locks = StripedLock(stripes)
+        result.digest_lock = threading.Lock()
+        result.shards = [set() for _ in range(stripes)]
+        result.digests = [0] * stripes
+        for i, lock in enumerate(self.locks.locks):
+            with lock:
+                result.shards[i] = set(self.shards[i])
+                result.digests[i] = self.digests[i]
+        result.frozen = [None] * stripes
+        result.items = StripedItems(result)
+        result.digest = sum(result.digests) & _DIGEST_MASK
+        result.shared = False
+        return result
+
+    def _sizeof(self, seen):
+        # The cached snapshots and the locks are not counted.
+        return Footprint(sys.getsizeof(self) + deep_sizeof(self.shards, seen), 0, 0)
+
+    def shard_snapshot(self, index: int) -> frozenset:
+        "Return the (possibly cached) snapshot of the shard at `index`."
+        result = self.frozen[index]
+        if result is None:
+            with self.locks.locks[index]:
+                result = self.frozen[index]
+                if result is None:
+                    result = self.frozen[index] = frozenset(self.shards[index])
+        return result
+
+    @property
+    def value(self) -> frozenset:
+        return frozenset().union(
+            *(self.shard_snapshot(i) for i in range(len(self.locks)))
+        )
+
+    def __contains__(self, item) -> bool:
+        return item in self.shards[self.locks.index(item)]
+
+    def merge(self, other: GSet) -> None:
+        if len(other.items) == len(self.items) and other.digest == self.digest:
+            return
+        self._extend(other.items)
+
+    def add(self, item):
+        "Add `item` to the set."
+        self._extend([item])
+
+    def add_many(self, items: t.Iterable[t.Any]) -> None:
+        "Add all the `items` to the set."
+        self._extend(items)
+
+    def reset(self, items: t.Optional[t.Iterable[t.Any]] = None):
+        "Reset the set with `items`."
+        with self.locks.all():
+            old = self.value if watched(self) else None
+            self.init()
+            self._insert(items or [])
+            if old is not None:
+                new = self.value
+                emit_items(self, new - old, old - new)
+
+    def _own(self) -> None:
+        # The shards are never shared.
+        pass
+
+    def _extend(self, items: t.Iterable[t.Any]) -> None:
+        # Unlike GSet._extend, `items` may include items already in the set.
+        added = self._insert(items)
+        if added and watched(self):
+            emit_items(self, added, ())
+
+    def _insert(self, items: t.Iterable[t.Any]) -> t.List[t.Any]:
+        # Add the `items` stripe by stripe, and return those which were new.
+        index = self.locks.index
+        groups: t.List[t.List[t.Any]] = [[] for _ in self.shards]
+        for item in items:
+            groups[index(item)].append(item)
+        added: t.List[t.Any] = []
+        for i, group in enumerate(groups):
+            if group:
+                with self.locks.locks[i]:
+                    shard = self.shards[i]
+                    new = set(group).difference(shard)
+                    if new:
+                        shard |= new
+                        digest = items_digest(new)
+                        self.digests[i] += digest
+                        self.frozen[i] = None
+                        with self.digest_lock:
+                            self.digest = (self.digest + digest) & _DIGEST_MASK
+                        added.extend(new)
+        return added
+
+
+class ConcurrentTwoPhaseSet(TwoPhaseSet):
+    "A thread-safe `~xotl.crdt.sets.TwoPhaseSet`:class:."
+
+    __slots__ = ("stripes",)
+
+    def __init__(self, *, process: Process, stripes: int = DEFAULT_STRIPES) -> None:
+        self.stripes = stripes
+        super().__init__(process=process)
+
+    def init(self):
+        self.living = ConcurrentGSet(process=self.process, stripes=self.stripes)
+        self.dead = ConcurrentGSet(process=self.process, stripes=self.stripes)
+
+    def __repr__(self):
+        return f"<ConcurrentTwoPhaseSet: {self.value}; {self.process}>"
+
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.stripes = self.stripes
+        return result
+
+    def remove(self, item) -> bool:
+        """Remove `item` to the set.
+
+        If `item` is not in (this replica's view of) the set, do nothing.  If
+        it was, remove it and the item will never in the set again.
+
+        Only one of several threads removing the same item concurrently gets
+        True.
+
+        """
+        if self._kill(item):
+            if watched(self):
+                emit_items(self, (), [item])
+            return True
+        else:
+            return False
+
+    def remove_many(self, items: t.Iterable[t.Any]) -> frozenset:
+        """Remove all the `items` from the set.
+
+        Return the items that were actually removed; see `remove`:meth:.
+
+        """
+        result = frozenset(item for item in set(items) if self._kill(item))
+        if watched(self):
+            emit_items(self, (), result)
+        return result
+
+    def _kill(self, item) -> bool:
+        # Add `item` to the dead if it's alive.  The stripe of `item` in the
+        # dead is held during the whole operation.
+        with self.dead.locks[item]:
+            if item in self.living and item not in self.dead:
+                self.dead.add(item)
+                return True
+            else:
+                return False
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Registers whose values live in a content-addressed store.
+
+The state of a `~xotl.crdt.register.LWWRegister`:class: includes its value;
+so `~xotl.crdt.base.get_state`:func: pickles the value on every exchange,
+even when the peer already has it.  That's a waste for large immutable values
+(e.g. documents).
+
+A `StoredLWWRegister`:class: keeps its value in a `ValueStore`:class: keyed by
+the digest of the value (the SHA-256 of its pickle), and its state carries
+only the digest.  After merging a replica from a peer, the receiver asks for
+the values it lacks::
+
+    >>> from xotl.crdt.base import Process, from_state, get_state
+    >>> ours, theirs = ValueStore(), ValueStore()
+    >>> sender = StoredLWWRegister(process=Process("R0", 0), store=theirs)
+    >>> sender.set("a large document")
+    >>> receiver = StoredLWWRegister(process=Process("R1", 1), store=ours)
+    >>> receiver.merge(from_state(get_state(sender)))
+    >>> ours.fetch(theirs, receiver.missing())
+    1
+    >>> receiver.value
+    'a large document'
+
+Decoded registers are attached to the `default store <DEFAULT_STORE>`:data:;
+use `StoredLWWRegister.attach`:meth: to move them (and their values, if
+present) to another one.  Reading the `~StoredLWWRegister.value`:attr: of a
+register whose value is not in its store raises `MissingValue`:class:.
+
+The default store is *weak*: it counts the registers attached to it that
+refer to each value, and forgets a value when none does (e.g. when they are
+set to another value or garbage collected).  Other stores keep every value
+put or loaded into them; their owner is responsible for calling
+`ValueStore.collect`:meth: with the keys of the registers attached.
+
+.. warning:: Values are addressed by their pickle, so equal values which are
+   pickled differently (like sets and frozensets, whose pickle depends on the
+   order of iteration) are stored twice.  This is harmless, but it means that
+   replicas that set equal values concurrently may still need to fetch the
+   value.
+
+"""
+
+from __future__ import annotations
+
+import hashlib
+import pickle
+import typing as t
+
+from xotl.crdt.base import Process
+from xotl.crdt.register import LWWRegister
+
+PROTOCOL = 4
+
+Key = bytes
+
+
+class MissingValue(KeyError):
+    "The value with a given digest is not in the store."
+
+
+def value_key(data: bytes) -> Key:
+    "Return the key of the value pickled as `data`."
+    return hashlib.sha256(data).digest()
+
+
+class ValueStore:
+    """A local store of immutable values addressed by their digest.
+
+    We keep the pickle of each value (to send it to other stores) and the
+    value itself, which is decoded the first time it's needed.
+
+    If `weak` is True, the store counts the references of the registers
+    attached to it (see `acquire`:meth:), and forgets each value when it's
+    no longer referenced.
+
+    """
+
+    def __init__(self, *, weak: bool = False) -> None:
+        self.blobs: t.Dict[Key, bytes] = {}
+        self.values: t.Dict[Key, t.Any] = {}
+        self.weak = weak
+        self.refs: t.Dict[Key, int] = {}
+
+    def __repr__(self):
+        return f"<ValueStore: {len(self.blobs)} values; {self.nbytes} bytes>"
+
+    def __len__(self) -> int:
+        return len(self.blobs)
+
+    def __contains__(self, key) -> bool:
+        return key in self.blobs
+
+    @property
+    def nbytes(self) -> int:
+        "The bytes of the pickled values."
+        return sum(len(data) for data in self.blobs.values())
+
+    def put(self, value) -> Key:
+        "Store `value` and return its key."
+        data = pickle.dumps(value, protocol=PROTOCOL)
+        key = value_key(data)
+        if key not in self.blobs:
+            self.blobs[key] = data
+            self.values[key] = value
+        return key
+
+    def get(self, key: Key):
+        "Return the value with the given `key`; raise `MissingValue`:class:."
+        try:
+            return self.values[key]
+        except KeyError:
+            pass
+        try:
+            data = self.blobs[key]
+        except KeyError:
+            raise MissingValue(key) from None
+        result = self.values[key] = pickle.loads(data)
+        return result
+
+    def acquire(self, key: t.Optional[Key]) -> None:
+        "Count a reference to the value with `key`; only for weak stores."
+        if self.weak and key is not None:
+            self.refs[key] = self.refs.get(key, 0) + 1
+
+    def release(self, key: t.Optional[Key]) -> None:
+        """Drop a reference to the value with `key`; only for weak stores.
+
+        The value is forgotten when it's no longer referenced.
+
+        """
+        if self.weak and key is not None:
+            n = self.refs.pop(key, 0) - 1
+            if n > 0:
+                self.refs[key] = n
+            else:
+                self.blobs.pop(key, None)
+                self.values.pop(key, None)
+
+    def missing(self, keys: t.Iterable[t.Optional[Key]]) -> t.Set[Key]:
+        "Return the `keys` whose values are not in the store."
+        return {key for key in keys if key is not None and key not in self.blobs}
+
+    def export(self, keys: t.Iterable[Key]) -> t.Dict[Key, bytes]:
+        """Return the pickles of the values with the given `keys`.
+
+        Keys not in the store are ignored.
+
+        """
+        blobs = self.blobs
+        return {key: blobs[key] for key in keys if key in blobs}
+
+    def load(self, blobs: t.Mapping[Key, bytes]) -> None:
+        """Add the pickled values in `blobs` (the result of `export`:meth:).
+
+        Raise ValueError if a pickle doesn't match its key.  The values are
+        decoded only when needed.
+
+        """
+        for key, data in blobs.items():
+            if value_key(data) != key:
+                raise ValueError(f"The value doesn't match its key {key.hex()}")
+        for key, data in blobs.items():
+            self.blobs.setdefault(key, data)
+
+    def fetch(self, source: ValueStore, keys: t.Iterable[t.Optional[Key]]) -> int:
+        """Copy from `source` the values we lack among `keys`.
+
+        Return the number of values copied.  In a distributed setting, send
+        the result of `missing`:meth: to the peer, and `load`:meth: what it
+        `exports <export>`:meth:.
+
+        """
+        blobs = source.export(self.missing(keys))
+        self.load(blobs)
+        return len(blobs)
+
+    def collect(self, keys: t.Iterable[t.Optional[Key]]) -> int:
+        """Forget all the values except those with the given `keys`.
+
+        Pass the `~StoredLWWRegister.key`:attr: of all the registers attached
+        to the store.  Return the number of values forgotten.  Stores that are
+        not weak never forget values by themselves; call this from time to
+        time.
+
+        """
+        keep = set(keys)
+        garbage = [key for key in self.blobs if key not in keep]
+        for key in garbage:
+            del self.blobs[key]
+            self.values.pop(key, None)
+        return len(garbage)
+
+
+#: The store of the registers created without one, and of decoded registers.
+#: It's weak: values are forgotten when no register refers to them.
+DEFAULT_STORE = ValueStore(weak=True)
+
+
+class StoredLWWRegister(LWWRegister):
+    """A `~xotl.crdt.register.LWWRegister`:class: with its value in a store.
+
+    The `atom` of the register is the key of the value in `store`; merges
+    only compare and copy keys.  Pickling the register leaves the store out.
+
+    The register holds a reference to its value in the store (which only
+    weak stores count) until it's set to another value, attached to another
+    store or garbage collected.
+
+    """
+
+    __slots__ = ("store",)
+
+    def __init__(
+        self,
+        *,
+        process: Process,
+        store: t.Optional[ValueStore] = None,
+    ) -> None:
+        self.store = store if store is not None else DEFAULT_STORE
+        super().__init__(process=process)
+
+    def __del__(self):
+        store = getattr(self, "store", None)
+        if store is not None:
+            store.release(getattr(self, "atom", None))
+
+    def __repr__(self):
+        key = self.key.hex()[:12] if self.key is not None else None
+        return f"<StoredLWWRegister: {key}; {self.process}, {self.vclock}>"
+
+    def __reduce__(self):
+        return _restore, (
+            type(self),
+            {
+                "process": self.process,
+                "vclock": self.vclock,
+                "timestamp": self.timestamp,
+                "atom": self.atom,
+            },
+        )
+
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.store = self.store
+        self.store.acquire(result.atom)
+        return result
+
+    @property
+    def key(self) -> t.Optional[Key]:
+        "The key of the value in the store; None if the register is unset."
+        return self.atom
+
+    @property
+    def value(self):
+        if self.atom is None:
+            return None
+        return self.store.get(self.atom)
+
+    def missing(self) -> t.Set[Key]:
+        "Return the key of our value if it's not in the store."
+        return self.store.missing([self.atom])
+
+    def attach(self, store: ValueStore) -> None:
+        """Keep the value of the register in `store` from now on.
+
+        The current value is copied to `store` if the current store has it
+        (a weak store may forget it once released); otherwise, use
+        `ValueStore.fetch`:meth:.
+
+        """
+        if store is not self.store and self.atom is not None:
+            store.load(self.store.export([self.atom]))
+        store.acquire(self.atom)
+        self.store.release(self.atom)
+        self.store = store
+
+    def set(self, value, *, _timestamp=None):
+        """Set the `value` of the register.
+
+        `value` should be an immutable object; it's put in the store.
+
+        """
+        hash(value)
+        super().set(self.store.put(value), _timestamp=_timestamp)
+
+    def reset(self, value=None):
+        super().reset(self.store.put(value) if value is not None else None)
+
+    def _replace(self, atom) -> None:
+        # Move our reference to the new key before the store may forget it.
+        old = self.atom
+        self.store.acquire(atom)
+        super()._replace(atom)
+        self.store.release(old)
+
+
+def _restore(cls, attrs):
+    # Rebuild a register attached to the default store.
+    result = cls.__new__(cls)
+    result.store = DEFAULT_STORE
+    for attr, value in attrs.items():
+        setattr(result, attr, value)
+    DEFAULT_STORE.acquire(result.atom)
+    return result
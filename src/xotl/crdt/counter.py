@@ -6,22 +6,40 @@
 #
 # This is free software; you can do what the LICENCE file allows you to.
 #
-from xotl.crdt.base import CvRDT
+import sys
+
+from xotl.crdt.base import CvRDT, Footprint, deep_sizeof
 from xotl.crdt.clocks import VClock
+from xotl.crdt.feed import CounterChange, emit, watched
 
 
 class GCounter(CvRDT):
     """A increment-only counter."""
 
+    __slots__ = ("vclock",)
+
     def init(self):
         self.vclock = VClock()
 
     def __repr__(self):
         return f"<GCounter of {self.value}; {self.process}, {self.vclock}>"
 
-    def incr(self):
-        "Increases the counter by one."
-        self.vclock = self.vclock.bump(self.process)
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.vclock = self.vclock
+        return result
+
+    def _sizeof(self, seen):
+        # The counters are the dots of the clock.
+        return Footprint(sys.getsizeof(self), deep_sizeof(self.vclock, seen), 0)
+
+    def incr(self, n: int = 1):
+        "Increases the counter by `n` (one by default)."
+        if n < 1:
+            raise ValueError(f"Cannot increase a counter by {n!r}")
+        self.vclock = self.vclock.bump(self.process, n)
+        if watched(self):
+            emit(self, CounterChange(n))
 
     @property
     def value(self) -> int:
@@ -30,7 +48,10 @@ class GCounter(CvRDT):
 
     def merge(self, other: "GCounter") -> None:  # type: ignore
         "Merge this replica with another in-place"
+        before = self.value if watched(self) else None
         self.vclock += other.vclock
+        if before is not None:
+            _emit_delta(self, self.value - before)
 
     def __le__(self, other) -> bool:
         if isinstance(other, GCounter):
@@ -45,7 +66,10 @@ class GCounter(CvRDT):
            processes.
 
         """
-        self.vclock.reset()
+        before = self.value
+        self.vclock = VClock()
+        if watched(self):
+            _emit_delta(self, -before)
 
     def __eq__(self, other) -> bool:
         if isinstance(other, GCounter):
@@ -57,6 +81,8 @@ class GCounter(CvRDT):
 class PNCounter(CvRDT):
     """A counter that allows increments and decrements."""
 
+    __slots__ = ("pos", "neg")
+
     def init(self):
         self.pos = GCounter(process=self.process)
         self.neg = GCounter(process=self.process)
@@ -64,13 +90,27 @@ class PNCounter(CvRDT):
     def __repr__(self):
         return f"<PNCounter of {self.value}; with {self.pos} and {self.neg}>"
 
-    def incr(self):
-        "Increase the counter by one."
-        self.pos.incr()
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.pos = self.pos._copy(snapshot)
+        result.neg = self.neg._copy(snapshot)
+        return result
+
+    def _sizeof(self, seen):
+        own = Footprint(sys.getsizeof(self), 0, 0)
+        return own + self.pos._sizeof(seen) + self.neg._sizeof(seen)
+
+    def incr(self, n: int = 1):
+        "Increase the counter by `n` (one by default)."
+        self.pos.incr(n)
+        if watched(self):
+            emit(self, CounterChange(n))
 
-    def decr(self):
-        "Decreases the counter by one."
-        self.neg.incr()
+    def decr(self, n: int = 1):
+        "Decreases the counter by `n` (one by default)."
+        self.neg.incr(n)
+        if watched(self):
+            emit(self, CounterChange(-n))
 
     @property
     def value(self) -> int:
@@ -79,8 +119,11 @@ class PNCounter(CvRDT):
 
     def merge(self, other: "PNCounter") -> None:  # type: ignore
         "Merge this replica with another in-place"
+        before = self.value if watched(self) else None
         self.pos.merge(other.pos)
         self.neg.merge(other.neg)
+        if before is not None:
+            _emit_delta(self, self.value - before)
 
     def __le__(self, other) -> bool:
         if isinstance(other, PNCounter):
@@ -105,5 +148,13 @@ class PNCounter(CvRDT):
            processes.
 
         """
+        before = self.value
         self.pos.reset()
         self.neg.reset()
+        if watched(self):
+            _emit_delta(self, -before)
+
+
+def _emit_delta(counter: CvRDT, delta: int) -> None:
+    if delta:
+        emit(counter, CounterChange(delta))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Subscriptions to the changes of the value of replicas.
+
+Keeping a derived index in sync by diffing `~xotl.crdt.base.CvRDT.value`
+before and after every merge costs O(n) even when nothing changed.  Instead,
+`subscribe`:func: to a replica; the mutators and ``merge`` of the replica
+call back with the precise change of its value:
+
+- the sets (`~xotl.crdt.sets.GSet`:class:,
+  `~xotl.crdt.sets.TwoPhaseSet`:class:, `~xotl.crdt.sets.USet`:class:,
+  `~xotl.crdt.sets.ORSet`:class: and `~xotl.crdt.sets.AWSet`:class:)
+  emit a `SetChange`:class: with the items added and removed;
+
+- the counters (`~xotl.crdt.counter.GCounter`:class: and
+  `~xotl.crdt.counter.PNCounter`:class:) emit a `CounterChange`:class:;
+
+- the `~xotl.crdt.register.LWWRegister`:class: emits a
+  `RegisterChange`:class: when its atom changes.
+
+The `concurrent <xotl.crdt.concurrent>`:mod: sets emit changes as well.
+Sub-classes that redefine the mutators (like the `shared
+<xotl.crdt.shared>`:mod: CRDTs) and composite CRDTs other than those above
+(like the `sharded sets <xotl.crdt.sharded>`:mod:) don't emit changes.
+Changes are emitted only if the value changed.
+
+The cost of a change is in proportion to the items changed, except for
+`~xotl.crdt.sets.ORSet`:class:, whose items may have several tags: it scans
+the tags to find out if an item was already present (or is still present).
+Resets compare the whole values.
+
+Replicas nobody subscribed to pay only a look-up in a dictionary (usually
+empty).  The subscriptions of a replica are not transferred to its clones nor
+to its states, and they are dropped when the replica is garbage collected.
+
+The `asyncio companions <xotl.crdt.aio>`:mod: of merge emit the changes too;
+but subscribed replicas are merged in the loop (only the reading of the other
+replica is done in chunks).
+
+"""
+
+from __future__ import annotations
+
+import typing as t
+import weakref
+from dataclasses import dataclass
+
+from xotl.crdt.base import CvRDT
+
+
+@dataclass(frozen=True)
+class SetChange:
+    "The items `added` to and `removed` from a set."
+
+    __slots__ = ("added", "removed")
+
+    added: frozenset
+    removed: frozenset
+
+
+@dataclass(frozen=True)
+class CounterChange:
+    "The `delta` of the value of a counter."
+
+    __slots__ = ("delta",)
+
+    delta: int
+
+
+@dataclass(frozen=True)
+class RegisterChange:
+    """The `old` and `new` atoms of a register.
+
+    For a `~xotl.crdt.content.StoredLWWRegister`:class: the atoms are the
+    keys of the values.
+
+    """
+
+    __slots__ = ("old", "new")
+
+    old: t.Any
+    new: t.Any
+
+
+Change = t.Union[SetChange, CounterChange, RegisterChange]
+Callback = t.Callable[[CvRDT, Change], None]
+
+#: The callbacks by the id of the replica.
+subscribers: t.Dict[int, t.List[Callback]] = {}
+
+
+def subscribe(replica: CvRDT, callback: Callback) -> t.Callable[[], None]:
+    """Call ``callback(replica, change)`` after each change of `replica`.
+
+    Return a function that cancels the subscription.
+
+    """
+    key = id(replica)
+    callbacks = subscribers.get(key)
+    if callbacks is None:
+        callbacks = subscribers[key] = []
+        weakref.finalize(replica, subscribers.pop, key, None)
+    callbacks.append(callback)
+
+    def unsubscribe() -> None:
+        try:
+            callbacks.remove(callback)
+        except ValueError:
+            pass
+
+    return unsubscribe
+
+
+def watched(replica: CvRDT) -> bool:
+    """True if someone subscribed to `replica`.
+
+    The CRDTs check this before computing a change.
+
+    """
+    return bool(subscribers) and bool(subscribers.get(id(replica)))
+
+
+def emit(replica: CvRDT, change: Change) -> None:
+    "Call the subscribers of `replica` with the `change`."
+    for callback in tuple(subscribers.get(id(replica), ())):
+        callback(replica, change)
+
+
+def emit_items(replica: CvRDT, added: t.Iterable, removed: t.Iterable) -> None:
+    "Emit a `SetChange`:class: if there are items `added` or `removed`."
+    added, removed = frozenset(added), frozenset(removed)
+    if added or removed:
+        emit(replica, SetChange(added - removed, removed - added))
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""An asyncio anti-entropy gossip engine.
+
+Each node runs a `GossipEngine`:class: over the CRDTs it holds (a mapping
+from keys to replicas).  Periodically, the engine selects some peers at random
+and runs a *round* with each:
+
+- ``push``: send the states of our replicas; the peer merges them.
+
+- ``pull``: ask the peer for the states of our keys; we merge them.  If
+  the engine has a `factory`, it also sends the keys it holds, and the peer
+  sends back the states of the keys we lack.
+
+- ``push-pull``: send our states and ask for the peer's in the same message.
+
+The states of many CRDTs are batched in a single `Message`:class: (up to
+`batch_size`).  Messages are sent through a `Transport`:class:; the
+`LoopbackNetwork`:class: connects engines in the same event loop (for tests
+and benchmarks).
+
+Backpressure: `Transport.send`:meth: waits until the peer can take the
+message, so a slow peer slows down our rounds.  Replies to pulls are never
+awaited (that could deadlock two nodes replying to each other); if the peer
+can't take them now they are dropped and a later round repairs the
+difference.
+
+If the replicas are held in a `~xotl.crdt.store.ReplicaStore`:class:, the
+engine only pushes the replicas the peer hasn't seen.  Pushed states carry
+their versions; the peer acknowledges them after merging, and only then are
+the watermarks updated.  Acknowledgements are sent like the replies to pulls:
+if they are dropped, the states are pushed again in a later round.
+
+"""
+
+from __future__ import annotations
+
+import abc
+import asyncio
+import typing as t
+from dataclasses import dataclass, field
+from random import Random
+
+from xotl.crdt.base import CvRDT, from_state, get_state
+from xotl.crdt.store import ReplicaStore
+
+MODES = ("push", "pull", "push-pull")
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_INBOX_SIZE = 16
+
+
+@dataclass
+class Message:
+    """A gossip message.
+
+    `states` maps keys to the states (as returned by
+    `~xotl.crdt.base.get_state`:func:) the `sender` pushes, and `versions`
+    maps them to their versions in the store of the sender (if any); `wanted`
+    are the keys whose states the sender wants back.
+
+    `acks` are the versions of the states (pushed by the receiver) the sender
+    has merged.  If `known` is not None, the sender wants the states of the
+    keys not in `known`.
+
+    """
+
+    sender: str
+    states: t.Dict[t.Hashable, bytes] = field(default_factory=dict)
+    wanted: t.Tuple[t.Hashable, ...] = ()
+    versions: t.Dict[t.Hashable, int] = field(default_factory=dict)
+    acks: t.Dict[t.Hashable, int] = field(default_factory=dict)
+    known: t.Optional[t.Tuple[t.Hashable, ...]] = None
+
+    @property
+    def size(self) -> int:
+        "The number of bytes of the states in the message."
+        return sum(len(state) for state in self.states.values())
+
+
+class Transport(abc.ABC):
+    """The interface between a `GossipEngine`:class: and the network.
+
+    `name` identifies the node in the network.
+
+    """
+
+    name: str
+
+    @abc.abstractmethod
+    def peers(self) -> t.Sequence[str]:
+        "Return the names of the other nodes reachable from this one."
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def send(self, peer: str, message: Message) -> None:
+        "Send `message` to `peer`; wait until the peer can take it."
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def try_send(self, peer: str, message: Message) -> bool:
+        "Send `message` to `peer` if it can take it now; return True if sent."
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def receive(self) -> Message:
+        "Wait for the next message."
+        raise NotImplementedError
+
+    def task_done(self) -> None:
+        "Signal that the last received message was handled."
+
+
+class LoopbackNetwork:
+    """An in-memory network of `LoopbackTransport`:class: objects.
+
+    Each node has a bounded inbox of `inbox_size` messages.
+
+    """
+
+    def __init__(self, inbox_size: int = DEFAULT_INBOX_SIZE) -> None:
+        self.inbox_size = inbox_size
+        self.nodes: t.Dict[str, LoopbackTransport] = {}
+        # The number of messages sent but not yet handled.
+        self.unfinished = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    def connect(self, name: str) -> LoopbackTransport:
+        "Return the transport of a new node `name`."
+        if name in self.nodes:
+            raise ValueError(f"Node {name!r} already connected")
+        result = self.nodes[name] = LoopbackTransport(self, name)
+        return result
+
+    async def join(self) -> None:
+        "Wait until all the messages sent have been handled."
+        await self.idle.wait()
+
+    def _sent(self) -> None:
+        self.unfinished += 1
+        self.idle.clear()
+
+    def _done(self) -> None:
+        self.unfinished -= 1
+        if not self.unfinished:
+            self.idle.set()
+
+
+class LoopbackTransport(Transport):
+    "A node in a `LoopbackNetwork`:class:."
+
+    def __init__(self, network: LoopbackNetwork, name: str) -> None:
+        self.network = network
+        self.name = name
+        self.inbox: asyncio.Queue[Message] = asyncio.Queue(network.inbox_size)
+
+    def __repr__(self):
+        return f"<LoopbackTransport {self.name!r}>"
+
+    def peers(self) -> t.Sequence[str]:
+        return [name for name in self.network.nodes if name != self.name]
+
+    async def send(self, peer: str, message: Message) -> None:
+        await self.network.nodes[peer].inbox.put(message)
+        self.network._sent()
+
+    def try_send(self, peer: str, message: Message) -> bool:
+        try:
+            self.network.nodes[peer].inbox.put_nowait(message)
+        except asyncio.QueueFull:
+            return False
+        else:
+            self.network._sent()
+            return True
+
+    async def receive(self) -> Message:
+        return await self.inbox.get()
+
+    def task_done(self) -> None:
+        self.network._done()
+
+
+class GossipEngine:
+    """Keeps the `replicas` of a node in sync with its peers.
+
+    :param replicas: The CRDTs of this node by key.  Keys must be the same
+                     across nodes.
+
+    :param transport: The `Transport`:class: of this node.
+
+    :param mode: One of 'push', 'pull' or 'push-pull'.
+
+    :param fanout: The number of peers selected in each round.
+
+    :param batch_size: The maximum number of states per message.
+
+    :param seed: The seed for peer selection; so that runs can be
+                 reproduced.
+
+    :param factory: If given, a callable that takes a key and returns a new
+                    (local) replica.  It's used to create the replicas of
+                    keys pushed by peers we didn't have; otherwise those
+                    states are ignored.  Pulls ask for those keys too.
+
+    If `replicas` is a `~xotl.crdt.store.ReplicaStore`:class:, only the
+    replicas outdated for a peer are pushed to it.
+
+    """
+
+    def __init__(
+        self,
+        replicas: t.MutableMapping[t.Hashable, CvRDT],
+        transport: Transport,
+        *,
+        mode: str = "push-pull",
+        fanout: int = 1,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        seed: t.Optional[int] = None,
+        factory: t.Optional[t.Callable[[t.Hashable], CvRDT]] = None,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Invalid gossip mode: {mode!r}")
+        if fanout < 1 or batch_size < 1:
+            raise ValueError("Both fanout and batch_size must be positive")
+        self.replicas = replicas
+        self.store = replicas if isinstance(replicas, ReplicaStore) else None
+        self.transport = transport
+        self.mode = mode
+        self.fanout = fanout
+        self.batch_size = batch_size
+        self.random = Random(seed)
+        self.factory = factory
+        self.sent_messages = 0
+        self.sent_bytes = 0
+
+    def __repr__(self):
+        return f"<GossipEngine {self.transport.name!r}: {self.mode}>"
+
+    def select_peers(self) -> t.List[str]:
+        "Select (at random) the peers for the next round."
+        peers = list(self.transport.peers())
+        return self.random.sample(peers, min(self.fanout, len(peers)))
+
+    def batches(self) -> t.Iterator[t.List[t.Hashable]]:
+        "Split the keys of the replicas in batches."
+        keys = list(self.replicas)
+        for i in range(0, len(keys), self.batch_size):
+            yield keys[i : i + self.batch_size]
+
+    def build(
+        self,
+        keys: t.Sequence[t.Hashable],
+        *,
+        push: bool,
+        pull: bool,
+        peer: t.Optional[str] = None,
+    ) -> Message:
+        """Build a message for the replicas with the given `keys`.
+
+        If `peer` is given (and we have a store), push only the replicas
+        outdated for the peer.
+
+        """
+        result = Message(self.transport.name)
+        if push:
+            replicas = self.replicas
+            if self.store is not None and peer is not None:
+                keys_to_push = self.store.outdated(peer, keys)
+            else:
+                keys_to_push = [key for key in keys if key in replicas]
+            result.states = {key: get_state(replicas[key]) for key in keys_to_push}
+            if self.store is not None:
+                version = self.store.version
+                result.versions = {key: version(key) for key in result.states}
+        if pull:
+            result.wanted = tuple(keys)
+        return result
+
+    async def round(self) -> None:
+        "Run a gossip round with the selected peers."
+        push = self.mode != "pull"
+        pull = self.mode != "push"
+        for peer in self.select_peers():
+            if pull and self.factory is not None:
+                message = Message(self.transport.name, known=tuple(self.replicas))
+                await self.transport.send(peer, message)
+                self._sent(message)
+            for keys in self.batches():
+                message = self.build(keys, push=push, pull=pull, peer=peer)
+                if message.states or message.wanted:
+                    await self.transport.send(peer, message)
+                    self._sent(message)
+
+    async def handle(self, message: Message) -> None:
+        """Handle a message received from a peer.
+
+        Merge the states pushed by the peer; and reply with the states it
+        wants and the acknowledgement of the states merged.
+
+        """
+        replicas, store, sender = self.replicas, self.store, message.sender
+        if store is not None and message.acks:
+            store.ack(sender, message.acks)
+        acks = {}
+        for key, state in message.states.items():
+            replica = replicas.get(key)
+            if replica is None and self.factory is not None:
+                replica = replicas[key] = self.factory(key)
+            if replica is None:
+                continue
+            if store is not None:
+                store.merge(key, from_state(state), peer=sender)
+            else:
+                replica.merge(from_state(state))
+            if key in message.versions:
+                acks[key] = message.versions[key]
+        if message.wanted:
+            reply = self.build(message.wanted, push=True, pull=False, peer=sender)
+        else:
+            reply = Message(self.transport.name)
+        reply.acks = acks
+        if (reply.states or reply.acks) and self.transport.try_send(sender, reply):
+            self._sent(reply)
+        if message.known is not None:
+            known = set(message.known)
+            missing = [key for key in replicas if key not in known]
+            for i in range(0, len(missing), self.batch_size):
+                keys = missing[i : i + self.batch_size]
+                reply = self.build(keys, push=True, pull=False, peer=sender)
+                if reply.states and self.transport.try_send(sender, reply):
+                    self._sent(reply)
+
+    async def serve(self) -> None:
+        "Handle the messages received from peers; forever."
+        transport = self.transport
+        while True:
+            message = await transport.receive()
+            try:
+                await self.handle(message)
+            finally:
+                transport.task_done()
+
+    async def run(self, interval: float) -> None:
+        "Run a gossip round every `interval` seconds; forever."
+        while True:
+            await self.round()
+            await asyncio.sleep(interval)
+
+    def _sent(self, message: Message) -> None:
+        self.sent_messages += 1
+        self.sent_bytes += message.size
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Memory-mapped snapshots of large sets.
+
+Loading a large `~xotl.crdt.sets.GSet`:class: or
+`~xotl.crdt.sets.ORSet`:class: with `~xotl.crdt.base.from_state`:func:
+decodes every item before the first query.  `dump`:func: writes the set in a
+hashed format that `load`:func: opens with `mmap`:mod:; items are decoded only
+when a query needs them.
+
+The result of `load`:func: is a `MappedGSet`:class: or `MappedORSet`:class:
+whose items are a `LayeredSet`:class:: the read-only `MappedSnapshot`:class:
+plus an in-memory delta with the items added (and removed) afterwards.
+Merges and local mutations only touch the delta.
+
+.. warning:: Items are located by their `~xotl.crdt.sets.stable_hash`:func:,
+   which is computed from their pickle; so items which are equal in Python
+   but pickled differently are not found by each other.  Numbers and
+   frozensets are normalized, but don't use objects with unstable state.
+
+The file uses the byte order of the host that wrote it.
+
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import pickle
+import struct
+import typing as t
+from array import array
+from collections.abc import MutableSet, Set
+from operator import itemgetter
+
+from xotl.crdt.sets import GSet, ORSet, USet, items_digest, stable_hash
+
+MAGIC = b"XCRDTMS1"
+HEADER = struct.Struct("=8sQQQQ")  # magic, count, buckets, data, meta
+PROTOCOL = 4
+_DIGEST_MASK = (1 << 64) - 1
+
+_first = itemgetter(0)
+
+
+class MappedSnapshot(Set):
+    """A read-only set of items in a memory-mapped file written by `dump`:func:.
+
+    If `key` is given, items are located by ``key(item)`` instead of by the
+    item itself; `find`:meth: returns all the items with a given key.
+
+    """
+
+    def __init__(self, path: t.Union[str, os.PathLike], key=None) -> None:
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, buckets, data, meta = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"Not a set snapshot: {os.fspath(path)!r}")
+        self.key = key
+        self.count = count
+        self.mask = buckets - 1
+        self.data = data
+        view = memoryview(self.map)
+        start = HEADER.size
+        self.buckets = view[start : start + 8 * (buckets + 1)].cast("Q")
+        start += 8 * (buckets + 1)
+        self.hashes = view[start : start + 8 * count].cast("Q")
+        start += 8 * count
+        self.offsets = view[start : start + 8 * (count + 1)].cast("Q")
+        self.meta = pickle.loads(self.map[meta:])
+
+    def __repr__(self):
+        return f"<MappedSnapshot: {self.count} items>"
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> t.Iterator[t.Any]:
+        for i in range(self.count):
+            yield self._item(i)
+
+    def __contains__(self, item) -> bool:
+        key = item if self.key is None else self.key(item)
+        return any(found == item for found in self.find(key))
+
+    def find(self, key) -> t.Iterator[t.Any]:
+        "Return the items whose key is `key`."
+        h = stable_hash(key)
+        bucket = h & self.mask
+        getkey = self.key
+        for i in range(self.buckets[bucket], self.buckets[bucket + 1]):
+            if self.hashes[i] == h:
+                item = self._item(i)
+                if (item if getkey is None else getkey(item)) == key:
+                    yield item
+
+    def close(self) -> None:
+        "Unmap the file.  The snapshot (and its layered sets) become unusable."
+        for view in (self.buckets, self.hashes, self.offsets):
+            view.release()
+        self.map.close()
+
+    @classmethod
+    def _from_iterable(cls, it):
+        return set(it)
+
+    def _item(self, i: int):
+        start = self.data + self.offsets[i]
+        end = self.data + self.offsets[i + 1]
+        return pickle.loads(self.map[start:end])
+
+
+def write_snapshot(
+    path: t.Union[str, os.PathLike],
+    items: t.Collection[t.Any],
+    meta: t.Dict[str, t.Any],
+    key=None,
+) -> None:
+    """Write `items` to a file that can be opened with `MappedSnapshot`:class:.
+
+    `meta` is a picklable dictionary stored along with the items.  The file
+    is written to a temporary file which is then renamed.
+
+    """
+    buckets = 1
+    while buckets < len(items):
+        buckets <<= 1
+    mask = buckets - 1
+    entries = []
+    for item in items:
+        h = stable_hash(item if key is None else key(item))
+        entries.append((h & mask, h, pickle.dumps(item, protocol=PROTOCOL)))
+    entries.sort(key=_first)
+    starts = array("Q", [0] * (buckets + 1))
+    for bucket, _, _ in entries:
+        starts[bucket + 1] += 1
+    for i in range(buckets):
+        starts[i + 1] += starts[i]
+    hashes = array("Q", (h for _, h, _ in entries))
+    offsets = array("Q", [0])
+    for _, _, payload in entries:
+        offsets.append(offsets[-1] + len(payload))
+    data = HEADER.size + 8 * (len(starts) + len(hashes) + len(offsets))
+    header = HEADER.pack(MAGIC, len(entries), buckets, data, data + offsets[-1])
+    temp = os.fspath(path) + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(header)
+        f.write(starts.tobytes())
+        f.write(hashes.tobytes())
+        f.write(offsets.tobytes())
+        for _, _, payload in entries:
+            f.write(payload)
+        pickle.dump(meta, f, protocol=PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+class LayeredSet(MutableSet):
+    """A mutable set on top of a (possibly None) `MappedSnapshot`:class:.
+
+    Items added are kept in memory; items removed from the base are kept as
+    tombstones.  The `key` must be the same of the base.
+
+    """
+
+    def __init__(self, base: t.Optional[MappedSnapshot] = None, key=None) -> None:
+        self.base = base
+        self.key = key
+        # The added items, grouped by key; and their count.
+        self.added: t.Dict[t.Any, t.Set[t.Any]] = {}
+        self.size = 0
+        self.removed: t.Set[t.Any] = set()
+
+    def __repr__(self):
+        return f"<LayeredSet: {self.base}, +{self.size}, -{len(self.removed)}>"
+
+    def __len__(self) -> int:
+        base = len(self.base) if self.base is not None else 0
+        return base - len(self.removed) + self.size
+
+    def __iter__(self) -> t.Iterator[t.Any]:
+        for group in self.added.values():
+            yield from group
+        if self.base is not None:
+            removed = self.removed
+            for item in self.base:
+                if item not in removed:
+                    yield item
+
+    def __contains__(self, item) -> bool:
+        if item in self.added.get(self._key(item), ()):
+            return True
+        base = self.base
+        return base is not None and item not in self.removed and item in base
+
+    def find(self, key) -> t.List[t.Any]:
+        "Return the items whose key is `key`."
+        result = list(self.added.get(key, ()))
+        if self.base is not None:
+            removed = self.removed
+            result.extend(
+                item for item in self.base.find(key) if item not in removed
+            )
+        return result
+
+    def add(self, item) -> None:
+        if item in self.removed:
+            self.removed.remove(item)
+        elif item not in self:
+            self.added.setdefault(self._key(item), set()).add(item)
+            self.size += 1
+
+    def discard(self, item) -> None:
+        key = self._key(item)
+        group = self.added.get(key)
+        if group and item in group:
+            group.remove(item)
+            self.size -= 1
+            if not group:
+                del self.added[key]
+        elif (
+            self.base is not None and item not in self.removed and item in self.base
+        ):
+            self.removed.add(item)
+
+    def copy(self) -> LayeredSet:
+        "Return a copy sharing the base."
+        result = LayeredSet(self.base, self.key)
+        result.added = {key: set(group) for key, group in self.added.items()}
+        result.size = self.size
+        result.removed = set(self.removed)
+        return result
+
+    def __or__(self, other):
+        result = self.copy()
+        result |= other
+        return result
+
+    def intersection(self, other: t.Iterable[t.Any]) -> t.Set[t.Any]:
+        return {item for item in other if item in self}
+
+    def difference(self, *others: t.Iterable[t.Any]) -> t.Set[t.Any]:
+        return {item for item in self if not any(item in o for o in others)}
+
+    @classmethod
+    def _from_iterable(cls, it):
+        return set(it)
+
+    def _key(self, item):
+        return item if self.key is None else self.key(item)
+
+
+class MappedGSet(GSet):
+    """A `~xotl.crdt.sets.GSet`:class: whose items are a `LayeredSet`:class:.
+
+    The digest of the snapshot is computed (which decodes all the items) the
+    first time it's needed: when comparing with replicas of the same size.
+    Pickling the replica produces a plain `~xotl.crdt.sets.GSet`:class:.
+
+    """
+
+    __slots__ = ("base_digest", "delta_digest")
+
+    def init(self):
+        self.items = LayeredSet()
+        # The digest of the base; `load` sets it to None (there's a base),
+        # and it's computed when needed.
+        self.base_digest: t.Optional[int] = 0
+        self.delta_digest = 0
+        self.shared = False
+
+    def __repr__(self):
+        return f"<MappedGSet: {self.items}; {self.process}>"
+
+    def __reduce__(self):
+        return _restore, (GSet, self.process, set(self.items))
+
+    @property
+    def digest(self) -> int:  # type: ignore
+        if self.base_digest is None:
+            self.base_digest = items_digest(self.items.base or ())
+        return (self.base_digest + self.delta_digest) & _DIGEST_MASK
+
+    def _copy(self, snapshot):
+        result = super(GSet, self)._copy(snapshot)
+        if snapshot:
+            result.items = self.items
+            result.shared = self.shared = True
+        else:
+            result.items = self.items.copy()
+            result.shared = False
+        result.base_digest = self.base_digest
+        result.delta_digest = self.delta_digest
+        return result
+
+    def __contains__(self, item) -> bool:
+        return item in self.items
+
+    def merge(self, other: GSet) -> None:
+        ours, theirs = self.items, other.items
+        if len(theirs) == len(ours) and other.digest == self.digest:
+            return
+        self._extend({item for item in theirs if item not in ours})
+
+    def add(self, item):
+        "Add `item` to the set."
+        if item not in self.items:
+            self._extend({item})
+
+    def _extend(self, new: t.Set[t.Any]) -> None:
+        if new:
+            self._own()
+            self.items |= new
+            self.delta_digest = (
+                self.delta_digest + items_digest(new)
+            ) & _DIGEST_MASK
+
+    def reset(self, items: t.Optional[t.Iterable[t.Any]] = None):
+        "Reset the set with `items`."
+        self.init()
+        self._extend(set(items or []))
+
+
+class MappedUSet(USet):
+    "A `~xotl.crdt.sets.USet`:class: whose items are a `LayeredSet`:class:."
+
+    __slots__ = ()
+
+    def init(self):
+        super().init()
+        self.items = LayeredSet(key=_first)
+
+    def merge(self, other: USet) -> None:
+        super().merge(other)
+        if not isinstance(self.items, LayeredSet):
+            # We took the items of `other`.
+            items, self.items = self.items, LayeredSet(key=_first)
+            self.items |= items
+
+    def reset(self, items: t.Optional[t.Iterable[t.Any]] = None):
+        super().reset()
+        self.items = LayeredSet(key=_first)
+        self.items |= set(items or [])
+
+
+class MappedORSet(ORSet):
+    """An `~xotl.crdt.sets.ORSet`:class: whose items are a `LayeredSet`:class:.
+
+    Pickling the replica produces a plain `~xotl.crdt.sets.ORSet`:class:.
+
+    """
+
+    __slots__ = ()
+
+    def init(self):
+        self.items = MappedUSet(process=self.process)
+        self.ticks = 0
+
+    def __repr__(self):
+        return f"<MappedORSet: {self.items.items}; {self.process}>"
+
+    def __reduce__(self):
+        uset = USet(process=self.process)
+        uset.vclock = self.items.vclock
+        uset.items = set(self.items.items)
+        return _restore, (ORSet, self.process, uset, self.ticks)
+
+    def __contains__(self, item) -> bool:
+        return bool(self.items.items.find(item))
+
+    def remove_many(self, items: t.Iterable[t.Any]) -> None:
+        """Remove all the `items` from the set.
+
+        See `~xotl.crdt.sets.ORSet.remove`:meth:.
+
+        """
+        find = self.items.items.find
+        self.items.remove_many([x for item in set(items) for x in find(item)])
+
+
+def dump(crdt: t.Union[GSet, ORSet], path: t.Union[str, os.PathLike]) -> None:
+    """Write the set `crdt` to `path`, in the format read by `load`:func:.
+
+    `crdt` may be a `~xotl.crdt.sets.GSet`:class: or an
+    `~xotl.crdt.sets.ORSet`:class: (or their mapped variants).
+
+    """
+    meta: t.Dict[str, t.Any] = {"process": crdt.process}
+    if isinstance(crdt, GSet):
+        meta["kind"] = "gset"
+        write_snapshot(path, crdt.items, meta)
+    elif isinstance(crdt, ORSet):
+        meta.update(kind="orset", vclock=crdt.items.vclock, ticks=crdt.ticks)
+        write_snapshot(path, crdt.items.items, meta, key=_first)
+    else:
+        raise TypeError(f"Cannot dump {crdt!r}")
+
+
+def load(path: t.Union[str, os.PathLike]) -> t.Union[MappedGSet, MappedORSet]:
+    """Open a set written by `dump`:func:.
+
+    The replica belongs to the same process of the replica that was dumped.
+
+    """
+    snapshot = MappedSnapshot(path)
+    meta = snapshot.meta
+    process = meta["process"]
+    result: t.Union[MappedGSet, MappedORSet]
+    if meta["kind"] == "gset":
+        result = MappedGSet(process=process)
+        result.items = LayeredSet(snapshot)
+        result.base_digest = None
+    else:
+        snapshot.key = _first
+        result = MappedORSet(process=process)
+        result.items.items = LayeredSet(snapshot, key=_first)
+        result.items.vclock = meta["vclock"]
+        result.ticks = meta["ticks"]
+    return result
+
+
+def _restore(cls, process, *args):
+    # Rebuild a plain set from the state of a mapped one.
+    result = cls(process=process)
+    if cls is GSet:
+        (items,) = args
+        result.reset(items)
+    else:
+        result.items, result.ticks = args
+    return result
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""A durable `~xotl.crdt.store.ReplicaStore`:class:.
+
+`PersistentStore`:class: keeps its replicas in a directory with two kinds of
+files:
+
+- Log *segments* (``<n>.log``): append-only files of records, each one a
+  4-bytes length followed by a pickle.  A record describes a single change:
+  the method called on a replica (`~PersistentStore.apply`:meth:), the state
+  merged into it (`~PersistentStore.merge`:meth:), or the whole state of the
+  replica if the change can't be replayed (e.g. a register's value depends on
+  the time it was set).  So the cost of writing is proportional to the change,
+  not to the replica.
+
+- *Snapshots* (``<n>.snapshot``): the state of all the replicas before the
+  segment `n`.  Snapshots are written to a temporary file and then renamed;
+  so there's always a complete one.
+
+Compaction takes a snapshot and removes the files it makes obsolete.  Only a
+(copy-on-write) `~xotl.crdt.base.CvRDT.snapshot`:meth: of each replica is
+taken while holding the lock of the store; encoding and writing happens in a
+background thread.
+
+When opened, the store loads the last snapshot (memory-mapped) and replays
+the segments that follow it.  A truncated record at the end of a segment
+(e.g. after a crash) is ignored.
+
+Watermarks of peers are not persisted: after a restart every replica is
+outdated for every peer.
+
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import pickle
+import struct
+import threading
+import typing as t
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from xotl.crdt.base import CvRDT, from_state, get_state
+from xotl.crdt.register import LWWRegister
+from xotl.crdt.store import Key, ReplicaStore
+
+HEADER = struct.Struct(">I")
+DEFAULT_SNAPSHOT_EVERY = 10000
+
+#: The types whose mutators can't be replayed; changes to them are logged as
+#: the whole state of the replica.
+STATE_LOGGED_TYPES: t.Tuple[type, ...] = (LWWRegister,)
+
+
+class PersistentStore(ReplicaStore):
+    """A `~xotl.crdt.store.ReplicaStore`:class: persisted in `path`.
+
+    :param snapshot_every: Start a background compaction after these many
+                           records have been logged.  If None, only compact
+                           when `compact`:meth: is called.
+
+    :param sync: If True, call `os.fsync`:func: after each record.  Otherwise
+                 records are only flushed to the OS.
+
+    """
+
+    def __init__(
+        self,
+        path: t.Union[str, os.PathLike],
+        *,
+        snapshot_every: t.Optional[int] = DEFAULT_SNAPSHOT_EVERY,
+        sync: bool = False,
+    ) -> None:
+        super().__init__()
+        self.path = os.fspath(path)
+        self.snapshot_every = snapshot_every
+        self.sync = sync
+        self.lock = threading.RLock()
+        self.compaction: t.Optional[threading.Thread] = None
+        os.makedirs(self.path, exist_ok=True)
+        self.segment = self._load() + 1
+        self.records = 0
+        self.log = open(self._file(self.segment, "log"), "ab")
+
+    def __repr__(self):
+        return f"<PersistentStore {self.path!r}: {len(self)} replicas>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        "Wait for the running compaction (if any) and close the log."
+        compaction = self.compaction
+        if compaction is not None:
+            compaction.join()
+        with self.lock:
+            self.log.close()
+
+    def __setitem__(self, key: Key, replica: CvRDT) -> None:
+        with self.lock:
+            super().__setitem__(key, replica)
+            self._write(("set", key, get_state(replica)))
+
+    def __delitem__(self, key: Key) -> None:
+        with self.lock:
+            super().__delitem__(key)
+            self._write(("delete", key))
+
+    @contextmanager
+    def mutate(self, key: Key):
+        """Return a context manager to change the replica at `key`.
+
+        The mutation is unknown to the store, so the whole state of the
+        replica is logged.  Prefer `apply`:meth:.
+
+        """
+        with self.lock, super().mutate(key) as replica:
+            try:
+                yield replica
+            finally:
+                self._write(("set", key, get_state(replica)))
+
+    def apply(self, key: Key, method: str, *args, **kwargs):
+        """Call `method` of the replica at `key` and log the call.
+
+        Return the result of the call.  Arguments must be picklable;
+        iterators (e.g. generators) are consumed into lists before the call.
+        The record is encoded before the call, so if an argument can't be
+        pickled the replica is not changed.
+
+        """
+        args = tuple(list(arg) if isinstance(arg, Iterator) else arg for arg in args)
+        kwargs = {
+            name: list(arg) if isinstance(arg, Iterator) else arg
+            for name, arg in kwargs.items()
+        }
+        with self.lock:
+            replica = self.replicas[key]
+            replayed = not isinstance(replica, STATE_LOGGED_TYPES)
+            if replayed:
+                data = pickle.dumps(("call", key, method, args, kwargs))
+            result = getattr(replica, method)(*args, **kwargs)
+            self.touch(key)
+            if not replayed:
+                data = pickle.dumps(("set", key, get_state(replica)))
+            self._append(data)
+            return result
+
+    def merge(self, key: Key, other: CvRDT, *, peer: t.Optional[str] = None) -> bool:
+        with self.lock:
+            changed = super().merge(key, other, peer=peer)
+            if changed:
+                self._write(("merge", key, get_state(other)))
+            return changed
+
+    def compact(self, *, background: bool = False) -> None:
+        """Take a snapshot and remove the files it makes obsolete.
+
+        If `background` is True, return as soon as the replicas are copied;
+        the snapshot is written by another thread.  If a compaction is
+        already running, do nothing.
+
+        """
+        with self.lock:
+            running = self.compaction
+            if running is not None and running.is_alive():
+                return
+            replicas = {key: replica.snapshot() for key, replica in self.items()}
+            segment = self._rotate()
+            thread = threading.Thread(
+                target=self._write_snapshot,
+                args=(segment, replicas),
+                name=f"compaction of {self.path}",
+                daemon=True,
+            )
+            self.compaction = thread
+            thread.start()
+        if not background:
+            thread.join()
+
+    def _write(self, record) -> None:
+        self._append(pickle.dumps(record))
+
+    def _append(self, data: bytes) -> None:
+        # Write an encoded record to the log.
+        log = self.log
+        log.write(HEADER.pack(len(data)))
+        log.write(data)
+        log.flush()
+        if self.sync:
+            os.fsync(log.fileno())
+        self.records += 1
+        if self.snapshot_every is not None and self.records >= self.snapshot_every:
+            self.compact(background=True)
+
+    def _rotate(self) -> int:
+        # Start a new segment, return its number.
+        self.log.close()
+        self.segment += 1
+        self.records = 0
+        self.log = open(self._file(self.segment, "log"), "ab")
+        return self.segment
+
+    def _write_snapshot(self, segment: int, replicas: t.Dict[Key, CvRDT]) -> None:
+        filename = self._file(segment, "snapshot")
+        temp = filename + ".tmp"
+        with open(temp, "wb") as f:
+            pickle.dump(replicas, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, filename)
+        for n, kind in self._files():
+            if n < segment:
+                os.unlink(self._file(n, kind))
+
+    def _load(self) -> int:
+        # Load the last snapshot, and replay the segments after it.  Return
+        # the number of the last segment found.
+        files = self._files()
+        snapshots = [n for n, kind in files if kind == "snapshot"]
+        start = max(snapshots, default=0)
+        if start:
+            with open(self._file(start, "snapshot"), "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    replicas = pickle.loads(data)
+            for key, replica in replicas.items():
+                ReplicaStore.__setitem__(self, key, replica)
+        segments = sorted(n for n, kind in files if kind == "log" and n >= start)
+        for n in segments:
+            for record in _read_segment(self._file(n, "log")):
+                self._replay(record)
+        return max(segments + [start])
+
+    def _replay(self, record) -> None:
+        kind, key, *args = record
+        if kind == "set":
+            ReplicaStore.__setitem__(self, key, from_state(args[0]))
+        elif kind == "delete":
+            ReplicaStore.__delitem__(self, key)
+        elif kind == "call":
+            method, args, kwargs = args
+            getattr(self.replicas[key], method)(*args, **kwargs)
+            self.touch(key)
+        elif kind == "merge":
+            ReplicaStore.merge(self, key, from_state(args[0]))
+        else:
+            raise ValueError(f"Invalid record: {record!r}")  # pragma: no cover
+
+    def _file(self, n: int, kind: str) -> str:
+        return os.path.join(self.path, f"{n:010d}.{kind}")
+
+    def _files(self) -> t.List[t.Tuple[int, str]]:
+        result = []
+        for filename in os.listdir(self.path):
+            n, _, kind = filename.partition(".")
+            if n.isdigit():
+                result.append((int(n), kind))
+        return result
+
+
+def _read_segment(filename: str) -> t.Iterator[t.Any]:
+    with open(filename, "rb") as f:
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            (size,) = HEADER.unpack(header)
+            data = f.read(size)
+            if len(data) < size:
+                return  # A truncated record at the end.
+            yield pickle.loads(data)
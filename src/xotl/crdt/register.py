@@ -6,10 +6,12 @@
 #
 # This is free software; you can do what the LICENCE file allows you to.
 #
+import sys
 from time import monotonic
 
-from xotl.crdt.base import CvRDT
+from xotl.crdt.base import CvRDT, Footprint, deep_sizeof
 from xotl.crdt.clocks import Dot, VClock
+from xotl.crdt.feed import RegisterChange, emit, watched
 
 
 class LWWRegister(CvRDT):
@@ -21,18 +23,38 @@ class LWWRegister(CvRDT):
 
     """
 
+    __slots__ = ("vclock", "timestamp", "atom")
+
     def init(self):
-        self.vclock = VClock([Dot(self.process, 0)])
+        self.vclock = VClock()
         self.timestamp = 0
         self.atom = None
 
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.vclock = self.vclock
+        result.timestamp = self.timestamp
+        result.atom = self.atom
+        return result
+
+    def _sizeof(self, seen):
+        return Footprint(
+            sys.getsizeof(self) + deep_sizeof(self.atom, seen),
+            deep_sizeof(self.vclock, seen) + deep_sizeof(self.timestamp, seen),
+            0,
+        )
+
     @property
     def value(self):
         return self.atom
 
     @property
     def dot(self) -> Dot:  # pragma: no cover
-        return self.vclock.find(self.process)
+        try:
+            return self.vclock.find(self.process)
+        except ValueError:
+            # The clock has no zero dots.
+            return Dot(self.process, 0)
 
     def set(self, value, *, _timestamp=None):
         """Set the `value` of the register.
@@ -49,7 +71,7 @@ class LWWRegister(CvRDT):
             ts = _timestamp
         self.vclock = self.vclock.bump(self.process)
         self.timestamp = ts
-        self.atom = value
+        self._replace(value)
 
     def __le__(self, other) -> bool:
         if isinstance(other, LWWRegister):
@@ -128,7 +150,7 @@ class LWWRegister(CvRDT):
     def merge(self, other: "LWWRegister") -> None:  # type: ignore
         if self << other:
             assert not (other << self)
-            self.atom = other.value
+            self._replace(other.atom)
         self.vclock += other.vclock
         self.timestamp = max(self.timestamp, other.timestamp)
 
@@ -146,4 +168,10 @@ class LWWRegister(CvRDT):
 
         """
         self.vclock = VClock()
-        self.atom = value
+        self._replace(value)
+
+    def _replace(self, atom) -> None:
+        # Set the atom, and emit the change if any.
+        old, self.atom = self.atom, atom
+        if watched(self) and old != atom:
+            emit(self, RegisterChange(old, atom))
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""A replicated sequence.
+
+`RGA`:class: implements the Replicated Growable Array: every element is
+inserted after another one (its *origin*), and concurrent insertions after
+the same origin are ordered by their timestamps.  Removed elements are kept as
+tombstones, since later insertions may refer to them.
+
+Each element is identified by a `~xotl.crdt.clocks.Dot`:class: of the process
+that inserted it.  The counters of the dots come from the `vector clock
+<xotl.crdt.clocks.VClock>`:class: of the replica (deletions are events too),
+so a replica knows which elements of another replica it lacks by comparing
+the clocks.  The timestamps are a Lamport clock.
+
+Elements are stored in `blocks <Block>`:class: of consecutive insertions of
+the same process (e.g. typing, or `~RGA.extend`:meth:).  A block is split
+only when another element is inserted in the middle of it; so merging long
+runs costs in proportion to the number of blocks, not of the elements.
+Appending doesn't walk the sequence: the end is looked for from the last block.
+
+"""
+
+from __future__ import annotations
+
+import sys
+import typing as t
+from bisect import bisect_right, insort
+from operator import attrgetter
+
+from xotl.crdt.base import CvRDT, Footprint, Process, deep_sizeof
+from xotl.crdt.clocks import Dot, VClock
+
+_get_seq = attrgetter("seq")
+
+
+class Block:
+    """A run of elements inserted one after the other by the same process.
+
+    The element at offset ``i`` has the dot ``Dot(process, seq + i)`` and
+    the timestamp ``stamp + i``; the first one was inserted after the element
+    `origin` (None for the start of the sequence), and the others after the
+    previous one.  `deleted` holds the counters of the elements removed.
+
+    """
+
+    __slots__ = ("process", "seq", "stamp", "origin", "items", "deleted")
+
+    def __init__(
+        self,
+        process: Process,
+        seq: int,
+        stamp: int,
+        origin: t.Optional[Dot],
+        items: t.List[t.Any],
+        deleted: t.Optional[t.Set[int]] = None,
+    ) -> None:
+        self.process = process
+        self.seq = seq
+        self.stamp = stamp
+        self.origin = origin
+        self.items = items
+        self.deleted = deleted if deleted is not None else set()
+
+    def __repr__(self):
+        return (
+            f"<Block {self.process.name}:{self.seq}+{len(self.items)} "
+            f"@{self.stamp}; {self.items!r}, -{sorted(self.deleted)}>"
+        )
+
+    def __getstate__(self):
+        return None, {
+            "process": self.process,
+            "seq": self.seq,
+            "stamp": self.stamp,
+            "origin": self.origin,
+            "items": self.items,
+            "deleted": self.deleted,
+        }
+
+    def __setstate__(self, state):
+        _, slots = state
+        for attr, value in slots.items():
+            setattr(self, attr, value)
+
+    @property
+    def key(self) -> t.Tuple[int, Process]:
+        "The key that orders concurrent insertions (the highest goes first)."
+        return self.stamp, self.process
+
+    @property
+    def last(self) -> int:
+        "The counter of the last element."
+        return self.seq + len(self.items) - 1
+
+    @property
+    def alive(self) -> int:
+        "The number of elements not removed."
+        return len(self.items) - len(self.deleted)
+
+    def offset(self, position: int) -> int:
+        "Return the offset of the element at `position` among those not removed."
+        result, seq = position, self.seq
+        for counter in sorted(self.deleted):
+            if counter - seq > result:
+                break
+            result += 1
+        return result
+
+    def last_alive(self) -> int:
+        "Return the offset of the last element not removed."
+        result, deleted = len(self.items) - 1, self.deleted
+        while self.seq + result in deleted:
+            result -= 1
+        return result
+
+    def visible(self) -> t.Iterator[t.Tuple[int, t.Any]]:
+        "Yield the offset and value of the elements not removed."
+        deleted, seq = self.deleted, self.seq
+        for offset, item in enumerate(self.items):
+            if seq + offset not in deleted:
+                yield offset, item
+
+    def copy(self) -> Block:
+        return Block(
+            self.process,
+            self.seq,
+            self.stamp,
+            self.origin,
+            list(self.items),
+            set(self.deleted),
+        )
+
+    def split(self, offset: int) -> Block:
+        "Keep the elements before `offset`, and return a block with the rest."
+        seq = self.seq + offset
+        tail = Block(
+            self.process,
+            seq,
+            self.stamp + offset,
+            Dot(self.process, seq - 1),
+            self.items[offset:],
+            {s for s in self.deleted if s >= seq},
+        )
+        del self.items[offset:]
+        self.deleted -= tail.deleted
+        return tail
+
+
+class RGA(CvRDT):
+    """The Replicated Growable Array.
+
+    The `value` is a tuple with the elements not removed.  Positions (in
+    `insert`:meth: and `delete`:meth:) are indexes of this tuple.
+
+    """
+
+    # 'index' maps each process to its blocks sorted by 'seq', to find the
+    # block of an element.  'size' is the number of elements not removed.
+    __slots__ = ("blocks", "vclock", "stamp", "index", "size")
+
+    def init(self):
+        self.blocks: t.List[Block] = []
+        self.vclock = VClock()
+        self.stamp = 0
+        self.index: t.Dict[Process, t.List[Block]] = {}
+        self.size = 0
+
+    def __getstate__(self):
+        # The index and size are not transmitted; see __setstate__.
+        return None, {
+            "process": self.process,
+            "blocks": self.blocks,
+            "vclock": self.vclock,
+            "stamp": self.stamp,
+        }
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._reindex()
+
+    def _reindex(self) -> None:
+        self.index = {}
+        for block in self.blocks:
+            self.index.setdefault(block.process, []).append(block)
+        for blocks in self.index.values():
+            blocks.sort(key=_get_seq)
+        self.size = sum(block.alive for block in self.blocks)
+
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.blocks = [block.copy() for block in self.blocks]
+        result.vclock = self.vclock
+        result.stamp = self.stamp
+        result._reindex()
+        return result
+
+    def _sizeof(self, seen):
+        # The index is counted as clock.
+        payload = sys.getsizeof(self) + sys.getsizeof(self.blocks)
+        clock = deep_sizeof(self.vclock, seen) + sys.getsizeof(self.index)
+        clock += sum(sys.getsizeof(blocks) for blocks in self.index.values())
+        tombstones = 0
+        for block in self.blocks:
+            seen.add(id(block))
+            seen.add(id(block.items))
+            payload += sys.getsizeof(block) + sys.getsizeof(block.items)
+            for attr in (block.process, block.seq, block.stamp, block.origin):
+                clock += deep_sizeof(attr, seen)
+            tombstones += deep_sizeof(block.deleted, seen)
+            for offset, item in enumerate(block.items):
+                if block.seq + offset in block.deleted:
+                    tombstones += deep_sizeof(item, seen)
+                else:
+                    payload += deep_sizeof(item, seen)
+        return Footprint(payload, clock, tombstones)
+
+    @property
+    def value(self) -> tuple:
+        return tuple(item for block in self.blocks for _, item in block.visible())
+
+    def __le__(self, other) -> bool:
+        if isinstance(other, RGA):
+            return self.vclock <= other.vclock
+        else:
+            return NotImplemented
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, RGA):
+            return self.process == other.process and self.vclock == other.vclock
+        else:
+            return NotImplemented
+
+    def merge(self, other: RGA) -> None:
+        if other.vclock <= self.vclock:
+            return
+        known = {dot.process: dot.counter for dot in self.vclock.dots}
+        for block in other.blocks:
+            seen = known.get(block.process, 0)
+            if seen < block.seq:
+                new = block.copy()
+                self._integrate(new)
+                self.size += new.alive
+            else:
+                if seen < block.last:
+                    block = block.copy()
+                    new = block.split(seen - block.seq + 1)
+                    self._integrate(new)
+                    self.size += new.alive
+                for seq in block.deleted:
+                    deleted = self._find(Dot(block.process, seq)).deleted
+                    if seq not in deleted:
+                        deleted.add(seq)
+                        self.size -= 1
+        self.vclock += other.vclock
+        self.stamp = max(self.stamp, other.stamp)
+
+    def insert(self, index: int, item) -> None:
+        "Insert `item` before the position `index`."
+        self.insert_many(index, [item])
+
+    def insert_many(self, index: int, items: t.Iterable[t.Any]) -> None:
+        """Insert all the `items` before the position `index`.
+
+        The whole batch is a single block, and a single event in the vector
+        clock.
+
+        """
+        items = list(items)
+        if not items:
+            return
+        size = self.size
+        if index < 0:
+            index = max(0, size + index)
+        if index == 0 or not size:
+            origin = None
+        else:
+            block, offset = self._locate(min(index, size) - 1)
+            origin = Dot(block.process, block.seq + offset)
+        process = self.process
+        try:
+            seq = self.vclock.find(process).counter + 1
+        except ValueError:
+            seq = 1
+        stamp = self.stamp + 1
+        if (
+            origin is not None
+            and block.process == process
+            and block.last == origin.counter == seq - 1
+            and block.stamp + len(block.items) == stamp
+        ):
+            # We are extending our last run.
+            block.items.extend(items)
+        else:
+            self._integrate(Block(process, seq, stamp, origin, items))
+        self.vclock = self.vclock.bump(process, len(items))
+        self.stamp += len(items)
+        self.size += len(items)
+
+    def append(self, item) -> None:
+        "Add `item` at the end of the sequence."
+        self.insert_many(sys.maxsize, [item])
+
+    def extend(self, items: t.Iterable[t.Any]) -> None:
+        "Add all the `items` at the end of the sequence."
+        self.insert_many(sys.maxsize, items)
+
+    def delete(self, index: int) -> None:
+        "Remove the element at the position `index`; raise IndexError if none."
+        size = self.size
+        if not -size <= index < size:
+            raise IndexError(f"Invalid position {index!r}")
+        index %= size
+        self.delete_many(index, index + 1)
+
+    def delete_many(self, start: int, stop: t.Optional[int] = None) -> None:
+        """Remove the elements in the positions from `start` to `stop`.
+
+        Like ``del value[start:stop]``.  The whole batch is a single event in
+        the vector clock.
+
+        """
+        first, last, _ = slice(start, stop).indices(self.size)
+        if first >= last:
+            return
+        position = 0
+        for block in self.blocks:
+            if position >= last:
+                break
+            alive = block.alive
+            if position + alive > first:
+                for offset, _ in list(block.visible()):
+                    if first <= position < last:
+                        block.deleted.add(block.seq + offset)
+                        self.size -= 1
+                    position += 1
+            else:
+                position += alive
+        self.vclock = self.vclock.bump(self.process)
+
+    def __repr__(self):
+        return f"<RGA: {self.value}; {self.process}, {self.vclock}>"
+
+    def reset(self, items: t.Optional[t.Iterable[t.Any]] = None):
+        """Reset the sequence with `items`."""
+        self.init()
+        self.extend(items or [])
+
+    def _locate(self, position: int) -> t.Tuple[Block, int]:
+        # Return the block and offset of the element at `position` (of the
+        # value); or of the last element if `position` is too large.  The
+        # last element is looked for from the end.
+        if position >= self.size - 1:
+            for block in reversed(self.blocks):
+                if block.alive:
+                    return block, block.last_alive()
+            raise IndexError("The sequence is empty")
+        for block in self.blocks:
+            alive = block.alive
+            if position < alive:
+                return block, block.offset(position)
+            position -= alive
+        assert False  # pragma: no cover
+
+    def _find(self, dot: Dot) -> Block:
+        # Return the block with the element `dot`.
+        blocks = self.index[dot.process]
+        return blocks[bisect_right(blocks, dot.counter, key=_get_seq) - 1]
+
+    def _integrate(self, new: Block) -> None:
+        # Place the block `new` after its origin, and after the concurrent
+        # insertions with higher keys (and their successors).
+        blocks = self.blocks
+        if new.origin is None:
+            position = 0
+        else:
+            block = self._find(new.origin)
+            position = blocks.index(block) + 1
+            offset = new.origin.counter - block.seq + 1
+            tail = (block.stamp + offset, block.process)
+            if offset < len(block.items) and tail < new.key:
+                # The rest of the block was inserted before us.
+                self._add(block.split(offset), position)
+        key = new.key
+        while position < len(blocks) and blocks[position].key > key:
+            position += 1
+        self._add(new, position)
+
+    def _add(self, block: Block, position: int) -> None:
+        self.blocks.insert(position, block)
+        insort(self.index.setdefault(block.process, []), block, key=_get_seq)
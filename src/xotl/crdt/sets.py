@@ -8,58 +8,226 @@
 #
 from __future__ import annotations
 
+import pickle
+import sys
 import typing as t
+from hashlib import blake2b
+from itertools import chain
+from random import getrandbits
 
-from xotl.crdt.base import CvRDT
-from xotl.crdt.clocks import Dot, VClock
+from xotl.crdt.base import CvRDT, Footprint, Process, deep_sizeof
+from xotl.crdt.clocks import Dot, DotContext, VClock
+from xotl.crdt.feed import emit_items, watched
+
+# The digests of sets are keyed with a random number (per Python process), so
+# they can't be forged.  Digests are never transmitted: the receiver of a
+# state computes it again.
+_DIGEST_KEY = getrandbits(64)
+_DIGEST_MASK = (1 << 64) - 1
+
+
+def items_digest(items: t.Iterable[t.Any]) -> int:
+    """Return the digest of a set of `items`.
+
+    This is the sum (modulo 2**64) of a keyed hash of each item; so it can be
+    updated incrementally when items are added.  Only digests computed in the
+    same Python process can be compared.
+
+    """
+    key = _DIGEST_KEY
+    return sum(hash((key, item)) for item in items) & _DIGEST_MASK
+
+
+def stable_hash(item: t.Any) -> int:
+    """Return a 64-bits hash of `item` which is the same in every process.
+
+    Unlike `hash`:func:, the result doesn't depend on the hash seed of the
+    Python process; so it can be used to place items in shards or files
+    shared by several hosts.  It's computed from the pickle of the item.
+
+    Numbers are normalized so that equal numbers (e.g. ``1``, ``1.0`` and
+    ``True``) have the same hash; also inside tuples.  Frozensets are
+    normalized too: their pickle depends on the order of iteration.  For
+    other types, equal items must have the same pickle: don't use objects
+    with unstable state.
+
+    """
+    data = pickle.dumps(_canonical(item), protocol=4)
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), "little")
+
+
+def _canonical(item):
+    if isinstance(item, float) and item.is_integer():
+        return int(item)
+    elif isinstance(item, bool):
+        return int(item)
+    elif type(item) is tuple:
+        return tuple(_canonical(x) for x in item)
+    elif type(item) is frozenset:
+        return _Unordered(sorted(stable_hash(x) for x in item))
+    else:
+        return item
+
+
+class _Unordered(tuple):
+    # The canonical form of a frozenset: the sorted hashes of its items.  A
+    # sub-class, so that it's not pickled like a tuple of numbers.
+    __slots__ = ()
 
 
 class GSet(CvRDT):
-    """The Grow-only set."""
+    """The Grow-only set.
+
+    Besides the `items`, each replica keeps a rolling `digest
+    <items_digest>`:func: of them.  Comparisons use the sizes and digests to
+    reject mismatches quickly, and `merge`:meth: skips the union if the other
+    replica has the same size and digest.  The chance of two different sets
+    of the same size having the same digest is negligible (about 2**-64).
+
+    """
+
+    # 'shared' is True if `items` is shared with a snapshot (or the replica
+    # which took it).
+    __slots__ = ("items", "digest", "shared")
 
     def init(self):
         self.items = set()
+        self.digest = 0
+        self.shared = False
+
+    def __getstate__(self):
+        # The digest is not transmitted; see __setstate__.
+        return None, {"process": self.process, "items": self.items}
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.digest = items_digest(self.items)
+        self.shared = False
+
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        if snapshot:
+            result.items = self.items
+            result.shared = self.shared = True
+        else:
+            result.items = self.items.copy()
+            result.shared = False
+        result.digest = self.digest
+        return result
+
+    def _sizeof(self, seen):
+        return Footprint(sys.getsizeof(self) + deep_sizeof(self.items, seen), 0, 0)
 
     @property
     def value(self) -> frozenset:
         return frozenset(self.items)
 
+    def __contains__(self, item) -> bool:
+        return item in self.items
+
     def __le__(self, other) -> bool:
         if not isinstance(other, GSet):
             return NotImplemented
-        return self.value <= other.value
+        ours, theirs = self.items, other.items
+        if len(ours) > len(theirs):
+            return False
+        elif len(ours) == len(theirs) and self.digest != other.digest:
+            return False
+        return ours <= theirs
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, GSet):
             return NotImplemented
-        return self.process == other.process and self.items == other.items
+        return (
+            self.process == other.process
+            and len(self.items) == len(other.items)
+            and self.digest == other.digest
+            and self.items == other.items
+        )
 
     def merge(self, other: GSet) -> None:
-        self.items |= other.value
+        theirs = other.items
+        if len(theirs) == len(self.items) and other.digest == self.digest:
+            return
+        self._extend(theirs.difference(self.items))
 
     def add(self, item):
         "Add `item` to the set."
-        self.items.add(item)
+        if item not in self.items:
+            self._own()
+            self.items.add(item)
+            self.digest = (self.digest + hash((_DIGEST_KEY, item))) & _DIGEST_MASK
+            if watched(self):
+                emit_items(self, [item], ())
+
+    def add_many(self, items: t.Iterable[t.Any]) -> None:
+        "Add all the `items` to the set."
+        self._extend(set(items).difference(self.items))
+
+    def _extend(self, new: t.Set[t.Any]) -> None:
+        # Add the `new` items, which are known not to be in the set.
+        if new:
+            if self.shared:
+                self.items = self.items | new
+                self.shared = False
+            else:
+                self.items |= new
+            self.digest = (self.digest + items_digest(new)) & _DIGEST_MASK
+            if watched(self):
+                emit_items(self, new, ())
+
+    def _own(self) -> None:
+        # Stop sharing the items with a snapshot before changing them.
+        if self.shared:
+            self.items = self.items.copy()
+            self.shared = False
+
+    def update(self, *others: t.Iterable[t.Any]) -> None:
+        "Add the items of all the `others` iterables to the set."
+        self.add_many(chain.from_iterable(others))
 
     def reset(self, items: t.Optional[t.Iterable[t.Any]] = None):
         "Reset the set with `items`."
+        old = self.items
         self.items = set(items or [])
+        self.digest = items_digest(self.items)
+        self.shared = False
+        if watched(self):
+            emit_items(self, self.items - old, old - self.items)
 
 
 class TwoPhaseSet(CvRDT):
+    __slots__ = ("living", "dead")
+
     def init(self):
         self.living = GSet(process=self.process)
         self.dead = GSet(process=self.process)
 
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.living = self.living._copy(snapshot)
+        result.dead = self.dead._copy(snapshot)
+        return result
+
+    def _sizeof(self, seen):
+        # The removed items are usually the same objects in both sets, so the
+        # tombstones are mostly the table of `dead`.
+        living = self.living._sizeof(seen)
+        dead = self.dead._sizeof(seen)
+        return Footprint(sys.getsizeof(self) + living.payload, 0, dead.total)
+
     @property
     def value(self) -> frozenset:
         """The current value."""
         return frozenset(self.living.value - self.dead.value)
 
+    def __contains__(self, item) -> bool:
+        return item in self.living.items and item not in self.dead.items
+
     def __le__(self, other) -> bool:
         if not isinstance(other, TwoPhaseSet):
             return NotImplemented
-        return self.living <= other.living or self.dead <= other.dead
+        return self.living <= other.living and self.dead <= other.dead
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, TwoPhaseSet):
@@ -71,12 +239,28 @@ class TwoPhaseSet(CvRDT):
         )
 
     def merge(self, other: TwoPhaseSet) -> None:
-        self.living.items |= other.living.items
-        self.dead.items |= other.dead.items
+        if watched(self):
+            living, dead = self.living.items, self.dead.items
+            their_dead = other.dead.items
+            born = other.living.items - living
+            added = [x for x in born if x not in dead and x not in their_dead]
+            removed = [x for x in their_dead - dead if x in living]
+            self.living.merge(other.living)
+            self.dead.merge(other.dead)
+            emit_items(self, added, removed)
+        else:
+            self.living.merge(other.living)
+            self.dead.merge(other.dead)
 
     def add(self, item) -> None:
         "Add `item` to the set."
-        self.living.add(item)
+        if watched(self):
+            new = item not in self.living.items and item not in self.dead.items
+            self.living.add(item)
+            if new:
+                emit_items(self, [item], ())
+        else:
+            self.living.add(item)
 
     def remove(self, item) -> bool:
         """Remove `item` to the set.
@@ -87,14 +271,48 @@ class TwoPhaseSet(CvRDT):
         """
         if item in self.value:
             self.dead.add(item)
+            if watched(self):
+                emit_items(self, (), [item])
             return True
         else:
             return False
 
+    def add_many(self, items: t.Iterable[t.Any]) -> None:
+        "Add all the `items` to the set."
+        if watched(self):
+            living, dead = self.living.items, self.dead.items
+            items = set(items)
+            new = [item for item in items if item not in living and item not in dead]
+            self.living.add_many(items)
+            emit_items(self, new, ())
+        else:
+            self.living.add_many(items)
+
+    def update(self, *others: t.Iterable[t.Any]) -> None:
+        "Add the items of all the `others` iterables to the set."
+        self.add_many(chain.from_iterable(others))
+
+    def remove_many(self, items: t.Iterable[t.Any]) -> frozenset:
+        """Remove all the `items` from the set.
+
+        Return the items that were actually removed; see `remove`:meth:.
+
+        """
+        current = self.value
+        result = frozenset(item for item in items if item in current)
+        self.dead.add_many(result)
+        if watched(self):
+            emit_items(self, (), result)
+        return result
+
     def reset(self, items: t.Optional[t.Iterable[t.Any]] = None):
         """Reset to an initial value of `items`."""
+        old = self.value if watched(self) else None
         self.living.reset(items)
         self.dead.reset()
+        if old is not None:
+            new = self.value
+            emit_items(self, new - old, old - new)
 
 
 class USet(CvRDT):
@@ -105,14 +323,57 @@ class USet(CvRDT):
 
     """
 
+    # 'shared' is True if `items` is shared with a snapshot (or the replica
+    # which took it).
+    __slots__ = ("vclock", "items", "shared")
+
     def init(self):
         self.vclock = VClock()
         self.items = set()
+        self.shared = False
+
+    def __getstate__(self):
+        return None, {
+            "process": self.process,
+            "vclock": self.vclock,
+            "items": self.items,
+        }
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.shared = False
+
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.vclock = self.vclock
+        if snapshot:
+            result.items = self.items
+            result.shared = self.shared = True
+        else:
+            result.items = self.items.copy()
+            result.shared = False
+        return result
+
+    def _own(self) -> None:
+        # Stop sharing the items with a snapshot before changing them.
+        if self.shared:
+            self.items = self.items.copy()
+            self.shared = False
+
+    def _sizeof(self, seen):
+        return Footprint(
+            sys.getsizeof(self) + deep_sizeof(self.items, seen),
+            deep_sizeof(self.vclock, seen),
+            0,
+        )
 
     @property
     def value(self):
         return frozenset(self.items)
 
+    def __contains__(self, item) -> bool:
+        return item in self.items
+
     def __le__(self, other) -> bool:
         if isinstance(other, USet):
             return self.vclock <= other.vclock
@@ -126,6 +387,24 @@ class USet(CvRDT):
             return NotImplemented
 
     def merge(self, other: USet) -> None:
+        if watched(self):
+            added, removed = self._changes(other)
+            self._merge(other)
+            emit_items(self, added, removed)
+        else:
+            self._merge(other)
+
+    def _changes(self, other: USet) -> t.Tuple[t.Set[t.Any], t.Set[t.Any]]:
+        # Return the items that merging `other` adds and removes.
+        ours, theirs = self.items, other.items
+        if self.vclock >= other.vclock:
+            return set(), set()
+        elif self.vclock < other.vclock:
+            return theirs - ours, ours - theirs
+        else:
+            return theirs - ours, set()
+
+    def _merge(self, other: USet) -> None:
         if self.vclock >= other.vclock:
             # Our history contains all of others so we can stay the same.
             pass
@@ -133,11 +412,13 @@ class USet(CvRDT):
             # other has seen events we haven't and all our events have been
             # witnessed by other; so we must simply take the state of other.
             self.items = set(other.items)
+            self.shared = False
             self.vclock += other.vclock
         elif self.vclock // other.vclock:
             # We have diverging items; our assumption about unique items and
             # the precondition on 'remove' ensures that a replica cannot
             # remove an item unless its addition was in the history.
+            self._own()
             self.items |= other.items
             self.vclock += other.vclock
         else:
@@ -146,7 +427,10 @@ class USet(CvRDT):
     def add(self, item) -> None:
         """Add `item` to the set."""
         self.vclock = self.vclock.bump(self.process)
+        self._own()
         self.items.add(item)
+        if watched(self):
+            emit_items(self, [item], ())
 
     def remove(self, item) -> None:
         """Remove `item` from the set.
@@ -156,24 +440,92 @@ class USet(CvRDT):
         """
         if item in self.items:
             self.vclock = self.vclock.bump(self.process)
+            self._own()
             self.items.remove(item)
+            if watched(self):
+                emit_items(self, (), [item])
+
+    def add_many(self, items: t.Iterable[t.Any]) -> None:
+        """Add all the `items` to the set.
+
+        The whole batch is a single event in the vector clock.
+
+        """
+        items = set(items)
+        if items:
+            new = items - self.items if watched(self) else ()
+            self.vclock = self.vclock.bump(self.process)
+            self._own()
+            self.items |= items
+            if new:
+                emit_items(self, new, ())
+
+    def update(self, *others: t.Iterable[t.Any]) -> None:
+        "Add the items of all the `others` iterables to the set."
+        self.add_many(chain.from_iterable(others))
+
+    def remove_many(self, items: t.Iterable[t.Any]) -> None:
+        """Remove all the `items` from the set.
+
+        Items not in (this replica's view of) the set are ignored.  The whole
+        batch is a single event in the vector clock.
+
+        """
+        present = self.items.intersection(items)
+        if present:
+            self.vclock = self.vclock.bump(self.process)
+            self._own()
+            self.items -= present
+            if watched(self):
+                emit_items(self, (), present)
 
     def __repr__(self):
         return f"<USet: {self.value}; {self.process}, {self.vclock}>"
 
     def reset(self, items: t.Optional[t.Iterable[t.Any]] = None):
         "Reset the value with `items`."
-        self.vlock = VClock()
+        old = self.items
+        self.vclock = VClock()
         self.items = set(items or [])
+        self.shared = False
+        if watched(self):
+            emit_items(self, self.items - old, old - self.items)
 
 
 class ORSet(CvRDT):
     """The Observed-Remove Set."""
 
+    __slots__ = ("items", "ticks")
+
     def init(self):
         self.items = USet(process=self.process)
         self.ticks = 0
 
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.items = self.items._copy(snapshot)
+        result.ticks = self.ticks
+        return result
+
+    def _sizeof(self, seen):
+        # Each item is kept in a tuple `(item, process, tick)`; only the item
+        # is payload, the rest is its tag.
+        uset = self.items
+        payload = (
+            sys.getsizeof(self) + sys.getsizeof(uset) + sys.getsizeof(uset.items)
+        )
+        clock = deep_sizeof(uset.vclock, seen) + deep_sizeof(self.ticks, seen)
+        for x in uset.items:
+            item, process, tick = x
+            seen.add(id(x))
+            payload += deep_sizeof(item, seen)
+            clock += (
+                sys.getsizeof(x)
+                + deep_sizeof(process, seen)
+                + deep_sizeof(tick, seen)
+            )
+        return Footprint(payload, clock, 0)
+
     def __le__(self, other) -> bool:
         if isinstance(other, ORSet):
             return self.items <= other.items
@@ -191,12 +543,20 @@ class ORSet(CvRDT):
             return NotImplemented
 
     def merge(self, other: ORSet) -> None:
-        self.items.merge(other.items)
+        if watched(self):
+            added, removed = self.items._changes(other.items)
+            self.items.merge(other.items)
+            self._emit_tags(added, removed)
+        else:
+            self.items.merge(other.items)
 
     @property
     def value(self):
         return frozenset(item for item, _, _ in self.items.value)
 
+    def __contains__(self, item) -> bool:
+        return any(x[0] == item for x in self.items.items)
+
     @property
     def dot(self) -> Dot:
         return self.items.vclock.find(self.process)
@@ -215,6 +575,30 @@ class ORSet(CvRDT):
         self.ticks += 1
         x = (item, self.process, self.ticks)
         self.items.add(x)
+        if watched(self):
+            self._emit_tags([x], ())
+
+    def add_many(self, items: t.Iterable[t.Any]) -> None:
+        """Add all the `items` to the set.
+
+        The whole batch is a single event in the vector clock.
+
+        """
+        xs = self._tag(items)
+        self.items.add_many(xs)
+        if watched(self):
+            self._emit_tags(xs, ())
+
+    def _tag(self, items: t.Iterable[t.Any]) -> t.List[t.Tuple[t.Any, Process, int]]:
+        # Return the tagged `items`, with new ticks.
+        start = self.ticks
+        xs = [(item, self.process, start + i) for i, item in enumerate(items, 1)]
+        self.ticks += len(xs)
+        return xs
+
+    def update(self, *others: t.Iterable[t.Any]) -> None:
+        "Add the items of all the `others` iterables to the set."
+        self.add_many(chain.from_iterable(others))
 
     def remove(self, item):
         """Remove `item` from the set.
@@ -225,20 +609,202 @@ class ORSet(CvRDT):
         will result in the item being kept.
 
         """
-        xs = [x for x in self.items.value if x[0] == item]
-        if xs:
-            # I have to hack the internal VClock of 'self.items' to ensure
-            # just a single bump.
-            counter = self.dot_counter
-            for x in xs:
-                self.items.remove(x)
-            object.__setattr__(self.dot, "counter", counter + 1)
+        self.remove_many([item])
+
+    def remove_many(self, items: t.Iterable[t.Any]) -> None:
+        """Remove all the `items` from the set.
+
+        See `remove`:meth:.  The whole batch is a single event in the vector
+        clock.
+
+        """
+        targets = set(items)
+        xs = [x for x in self.items.items if x[0] in targets]
+        self.items.remove_many(xs)
+        if watched(self):
+            self._emit_tags((), xs)
+
+    def _emit_tags(
+        self, added: t.Iterable[tuple], removed: t.Iterable[tuple]
+    ) -> None:
+        # Emit the change of the value after the tagged items `added` and
+        # `removed`.  An item may have other tags, so we must look for them.
+        added, removed = set(added), set(removed)
+        candidates = {x[0] for x in chain(added, removed)}
+        if not candidates:
+            return
+        before = {x[0] for x in removed}
+        after = set()
+        for x in self.items.items:
+            if x[0] in candidates:
+                after.add(x[0])
+                if x not in added:
+                    before.add(x[0])
+        emit_items(self, after - before, before - after)
 
     def __repr__(self):
         return f"<ORSet: {self.value}; {self.process}, {self.items}>"
 
     def reset(self, items: t.Optional[t.Iterable[t.Any]] = None):
         """Reset the value of the set with `items`."""
+        old = self.value if watched(self) else None
+        self.init()
+        self.items.add_many(self._tag(items or []))
+        if old is not None:
+            new = self.value
+            emit_items(self, new - old, old - new)
+
+
+class AWSet(CvRDT):
+    """The Add-Wins Set (an observed-remove set without tombstones).
+
+    Each item is tagged with the dots of the additions that are still
+    alive, and the replica keeps a `~xotl.crdt.clocks.DotContext`:class: of
+    all the dots it has seen.  Removing an item just forgets its dots; a
+    merge drops the dots which the other replica has seen but no longer has.
+    An addition concurrent with a removal wins.
+
+    The mutators return a *delta*: an AWSet with only the changes (the dots
+    added and the dots removed, which are generally not contiguous).  A delta
+    can be merged instead of the full state, in any order and any number of
+    times.
+
+    """
+
+    __slots__ = ("entries", "context")
+
+    def init(self):
+        self.entries: t.Dict[t.Any, t.FrozenSet[Dot]] = {}
+        self.context = DotContext()
+
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.entries = dict(self.entries)
+        result.context = self.context
+        return result
+
+    def _sizeof(self, seen):
+        payload = sys.getsizeof(self) + sys.getsizeof(self.entries)
+        clock = deep_sizeof(self.context, seen)
+        for item, dots in self.entries.items():
+            payload += deep_sizeof(item, seen)
+            clock += deep_sizeof(dots, seen)
+        return Footprint(payload, clock, 0)
+
+    @property
+    def value(self) -> frozenset:
+        return frozenset(self.entries)
+
+    def __contains__(self, item) -> bool:
+        return item in self.entries
+
+    def __le__(self, other) -> bool:
+        if isinstance(other, AWSet):
+            return self.context <= other.context
+        else:
+            return NotImplemented
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, AWSet):
+            return self.process == other.process and self.context == other.context
+        else:
+            return NotImplemented
+
+    def merge(self, other: AWSet) -> None:
+        ours, theirs = self.context, other.context
+        if ours == theirs and self.entries == other.entries:
+            return
+        entries: t.Dict[t.Any, t.FrozenSet[Dot]] = {}
+        for item, dots in self.entries.items():
+            their_dots = other.entries.get(item, frozenset())
+            kept = frozenset(
+                dot for dot in dots if dot in their_dots or dot not in theirs
+            )
+            if kept:
+                entries[item] = kept
+        for item, their_dots in other.entries.items():
+            new = frozenset(dot for dot in their_dots if dot not in ours)
+            if new:
+                entries[item] = entries.get(item, frozenset()) | new
+        old, self.entries = self.entries, entries
+        self.context = ours.merge(theirs)
+        if watched(self):
+            added, removed = entries.keys() - old.keys(), old.keys() - entries.keys()
+            emit_items(self, added, removed)
+
+    def add(self, item) -> AWSet:
+        "Add `item` to the set; return the delta."
+        return self.add_many([item])
+
+    def add_many(self, items: t.Iterable[t.Any]) -> AWSet:
+        """Add all the `items` to the set; return the delta.
+
+        Each item gets its own dot.
+
+        """
+        entries = self._tag(items)
+        return self._apply(entries, entries)
+
+    def _tag(self, items: t.Iterable[t.Any]) -> t.Dict[t.Any, t.FrozenSet[Dot]]:
+        # Return the entries of the `items`, each with a new dot.
+        entries = {}
+        counter = self.context.last(self.process)
+        for item in dict.fromkeys(items):
+            counter += 1
+            entries[item] = frozenset([Dot(self.process, counter)])
+        return entries
+
+    def update(self, *others: t.Iterable[t.Any]) -> AWSet:
+        "Add the items of all the `others` iterables to the set."
+        return self.add_many(chain.from_iterable(others))
+
+    def remove(self, item) -> AWSet:
+        """Remove `item` from the set; return the delta.
+
+        We remove the **observed** additions of `item`; if it's not in this
+        replica, nothing happens.
+
+        """
+        return self.remove_many([item])
+
+    def remove_many(self, items: t.Iterable[t.Any]) -> AWSet:
+        "Remove all the `items` from the set; return the delta."
+        return self._apply({}, items)
+
+    def _apply(self, entries, replaced) -> AWSet:
+        # Replace the dots of the `replaced` items by the new `entries`, and
+        # return the delta.  Its context has the dots removed and added.
+        dots: t.List[Dot] = []
+        present = set()
+        for item in replaced:
+            old = self.entries.pop(item, ())
+            if old:
+                dots.extend(old)
+                present.add(item)
+        for new in entries.values():
+            dots.extend(new)
+        self.entries.update(entries)
+        delta = AWSet(process=self.process)
+        delta.entries = entries
+        delta.context = DotContext.from_dots(dots)
+        self.context = self.context.merge(delta.context)
+        if watched(self):
+            emit_items(
+                self,
+                (item for item in entries if item not in present),
+                (item for item in present if item not in entries),
+            )
+        return delta
+
+    def __repr__(self):
+        return f"<AWSet: {self.value}; {self.process}, {self.context}>"
+
+    def reset(self, items: t.Optional[t.Iterable[t.Any]] = None):
+        """Reset the value of the set with `items`."""
+        old = self.value if watched(self) else None
         self.init()
-        for item in items or []:
-            self.add(item)
+        self.entries = self._tag(items or [])
+        dots = chain.from_iterable(self.entries.values())
+        self.context = DotContext.from_dots(dots)
+        if old is not None:
+            emit_items(self, self.value - old, old - self.value)
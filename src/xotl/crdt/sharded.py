@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Sets partitioned in shards, which can be merged and encoded in parallel.
+
+A `ShardedGSet`:class: (or `ShardedORSet`:class:) is a fixed number of
+independent `~xotl.crdt.sets.GSet`:class: (or `~xotl.crdt.sets.ORSet`:class:)
+replicas.  Each item lives in the shard given by its
+`~xotl.crdt.sets.stable_hash`:func:, so the same item is in the same shard at
+every replica, and the shards of two replicas can be merged pairwise.  The
+shards of an ORSet have their own clocks.
+
+`~ShardedGSet.merge`:meth:, `~ShardedGSet.encode`:meth: and
+`~ShardedGSet.decode`:meth: take an optional
+`~concurrent.futures.Executor`:class: to process the shards in parallel.
+With a `~concurrent.futures.ProcessPoolExecutor`:class: the shards are
+pickled to the workers and back; that only pays off when the shards are
+large.  Encoding and decoding in the workers avoids one of the two trips.
+
+"""
+
+from __future__ import annotations
+
+import sys
+import typing as t
+from concurrent.futures import Executor
+from itertools import chain
+
+from xotl.crdt.base import CvRDT, Footprint, Process, from_state, get_state
+from xotl.crdt.sets import GSet, ORSet, stable_hash
+
+DEFAULT_SHARDS = 16
+_DIGEST_MASK = (1 << 64) - 1
+
+
+class ShardedSet(CvRDT):
+    """Base class for the sharded sets.
+
+    Sub-classes set `shard_class`.  Replicas must have the same number of
+    shards to be merged.
+
+    """
+
+    shard_class: t.Type[CvRDT]
+
+    __slots__ = ("shards",)
+
+    def __init__(self, *, process: Process, shards: int = DEFAULT_SHARDS) -> None:
+        if shards < 1:
+            raise ValueError(f"Invalid number of shards: {shards!r}")
+        # init() replaces the placeholders by the shards.
+        placeholders: t.List[t.Any] = [None] * shards
+        self.shards: t.List[CvRDT] = placeholders
+        super().__init__(process=process)
+
+    def init(self):
+        cls, process = self.shard_class, self.process
+        self.shards = [cls(process=process) for _ in self.shards]
+
+    def __repr__(self):
+        return f"<{type(self).__name__}: {self.value}; {self.process}>"
+
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.shards = [shard._copy(snapshot) for shard in self.shards]
+        return result
+
+    def _sizeof(self, seen):
+        own = Footprint(sys.getsizeof(self) + sys.getsizeof(self.shards), 0, 0)
+        return sum((shard._sizeof(seen) for shard in self.shards), own)
+
+    def shard(self, item) -> t.Any:
+        "Return the shard where `item` lives."
+        return self.shards[stable_hash(item) % len(self.shards)]
+
+    def partition(self, items: t.Iterable[t.Any]) -> t.List[t.List[t.Any]]:
+        "Split `items` by shard."
+        result: t.List[t.List[t.Any]] = [[] for _ in self.shards]
+        n = len(result)
+        for item in items:
+            result[stable_hash(item) % n].append(item)
+        return result
+
+    @property
+    def value(self) -> frozenset:
+        return frozenset().union(*(shard.value for shard in self.shards))
+
+    def __contains__(self, item) -> bool:
+        return item in self.shard(item)
+
+    def __le__(self, other) -> bool:
+        if isinstance(other, type(self)):
+            self._check(other)
+            return all(a <= b for a, b in zip(self.shards, other.shards))
+        else:
+            return NotImplemented
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, type(self)):
+            return (
+                self.process == other.process
+                and len(self.shards) == len(other.shards)
+                and all(a == b for a, b in zip(self.shards, other.shards))
+            )
+        else:
+            return NotImplemented
+
+    def merge(
+        self, other: ShardedSet, *, executor: t.Optional[Executor] = None
+    ) -> None:
+        """Merge this replica with another in-place.
+
+        If `executor` is given, the shards are merged in parallel.
+
+        """
+        self._check(other)
+        if executor is None:
+            for ours, theirs in zip(self.shards, other.shards):
+                ours.merge(theirs)
+        else:
+            self.shards = list(executor.map(_merge, self.shards, other.shards))
+
+    def encode(self, *, executor: t.Optional[Executor] = None) -> t.List[bytes]:
+        """Return the states of the shards.
+
+        If `executor` is given, the shards are encoded in parallel.
+
+        """
+        if executor is None:
+            return [get_state(shard) for shard in self.shards]
+        else:
+            return list(executor.map(get_state, self.shards))
+
+    @classmethod
+    def decode(
+        cls, states: t.Sequence[bytes], *, executor: t.Optional[Executor] = None
+    ):
+        """Return the replica whose shards have the given `states`.
+
+        `states` should be the result of `encode`:meth:.  If `executor` is
+        given, the shards are decoded in parallel.
+
+        """
+        if not states:
+            raise ValueError("Cannot decode a sharded set without shards")
+        if executor is None:
+            shards = [from_state(state) for state in states]
+        else:
+            shards = list(executor.map(from_state, states))
+        result = cls.__new__(cls)
+        result.process = shards[0].process
+        result.shards = shards
+        return result
+
+    def add(self, item):
+        "Add `item` to the set."
+        self.shard(item).add(item)
+
+    def add_many(self, items: t.Iterable[t.Any]) -> None:
+        "Add all the `items` to the set."
+        shard: t.Any
+        for shard, group in zip(self.shards, self.partition(items)):
+            if group:
+                shard.add_many(group)
+
+    def update(self, *others: t.Iterable[t.Any]) -> None:
+        "Add the items of all the `others` iterables to the set."
+        self.add_many(chain.from_iterable(others))
+
+    def reset(self, items: t.Optional[t.Iterable[t.Any]] = None):
+        "Reset the set with `items`."
+        self.init()
+        self.add_many(items or [])
+
+    def _check(self, other: ShardedSet) -> None:
+        if len(self.shards) != len(other.shards):
+            raise ValueError(
+                f"Cannot merge sets with {len(self.shards)} and "
+                f"{len(other.shards)} shards"
+            )
+
+
+class ShardedGSet(ShardedSet):
+    "A `~xotl.crdt.sets.GSet`:class: partitioned in shards."
+
+    shard_class = GSet
+
+    __slots__ = ()
+
+    @property
+    def digest(self) -> int:
+        "The `digest <xotl.crdt.sets.items_digest>`:func: of the items."
+        shards: t.List[t.Any] = self.shards
+        return sum(shard.digest for shard in shards) & _DIGEST_MASK
+
+
+class ShardedORSet(ShardedSet):
+    """An `~xotl.crdt.sets.ORSet`:class: partitioned in shards.
+
+    Each shard has its own clock.
+
+    """
+
+    shard_class = ORSet
+
+    __slots__ = ()
+
+    def remove(self, item):
+        """Remove `item` from the set.
+
+        See `~xotl.crdt.sets.ORSet.remove`:meth:.
+
+        """
+        self.shard(item).remove(item)
+
+    def remove_many(self, items: t.Iterable[t.Any]) -> None:
+        "Remove all the `items` from the set."
+        shard: t.Any
+        for shard, group in zip(self.shards, self.partition(items)):
+            if group:
+                shard.remove_many(group)
+
+
+def _merge(ours: CvRDT, theirs: CvRDT) -> CvRDT:
+    # Merge two shards (in a worker) and return the result.
+    ours.merge(theirs)
+    return ours
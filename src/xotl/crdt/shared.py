@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Counters shared by the worker processes of a single host.
+
+In a pre-fork server each worker would otherwise hold its own replica of a
+counter, and the replicas of the same host would need to exchange their states
+just to agree on a value.  Here, the host allocates a `SharedSlots`:class:
+table in `shared memory <multiprocessing.shared_memory>`:mod: with one slot
+per worker.  Workers increment their own slot without any IPC (each slot has a
+single writer), and every replica of the host *folds* the sum of the slots into
+the host's dot when the value or the clock is needed (e.g. to gossip with other
+hosts).
+
+All workers must use the same `~xotl.crdt.base.Process`:class: (the host's),
+since they are a single replica as far as the rest of the cluster is
+concerned.
+
+"""
+
+from __future__ import annotations
+
+import typing as t
+from multiprocessing.shared_memory import SharedMemory
+
+from xotl.crdt.base import Process
+from xotl.crdt.clocks import Dot, VClock
+from xotl.crdt.counter import GCounter, PNCounter
+
+COUNTER_SIZE = 8  # signed 64-bits integers
+
+
+class SharedSlots:
+    """A table of 64-bits counters in shared memory.
+
+    The table has `slots` rows (one per worker) and `columns` columns (one per
+    counter; e.g. `SharedPNCounter`:class: needs two).
+
+    If `create` is False, attach to the existing block of memory named
+    `name`; use this in workers that were not forked from the process that
+    created the table.
+
+    """
+
+    def __init__(
+        self,
+        slots: int,
+        columns: int = 1,
+        *,
+        name: t.Optional[str] = None,
+        create: bool = True,
+    ) -> None:
+        if slots < 1 or columns < 1:
+            raise ValueError(f"Invalid shape for the table: {slots!r}x{columns!r}")
+        size = slots * columns * COUNTER_SIZE
+        if create:
+            self.memory = SharedMemory(name=name, create=True, size=size)
+        else:
+            self.memory = SharedMemory(name=name)
+        self.slots = slots
+        self.columns = columns
+        buf = self.memory.buf
+        if buf is None:  # pragma: no cover
+            raise ValueError(f"The shared memory {self.memory.name!r} is closed")
+        # A newly created block of shared memory is filled with zeros.
+        self.counters = buf[:size].cast("q")
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def __repr__(self):
+        return f"<SharedSlots {self.name!r}: {self.slots}x{self.columns}>"
+
+    def incr(self, slot: int, n: int = 1, *, column: int = 0) -> None:
+        """Increase the counter of `slot` by `n`.
+
+        Only the worker owning the slot should call this method.
+
+        """
+        self.counters[slot * self.columns + column] += n
+
+    def total(self, column: int = 0) -> int:
+        "Return the sum of all the slots in `column`."
+        return sum(self.counters[column :: self.columns])
+
+    def clear(self, column: int = 0) -> None:
+        "Set all the slots in `column` to 0."
+        for i in range(column, len(self.counters), self.columns):
+            self.counters[i] = 0
+
+    def close(self) -> None:
+        "Detach from the shared memory."
+        self.counters.release()
+        self.memory.close()
+
+    def unlink(self) -> None:
+        """Free the shared memory.
+
+        Only the process that created the table should call this method, once
+        all workers are done.
+
+        """
+        self.memory.unlink()
+
+
+class SharedGCounter(GCounter):
+    """A `~xotl.crdt.counter.GCounter`:class: backed by a `SharedSlots`:class:.
+
+    `slot` is the row owned by the current worker, and `column` selects the
+    counter in the table.
+
+    The state transmitted by `~xotl.crdt.base.get_state`:func: is that of a
+    plain `~xotl.crdt.counter.GCounter`:class: with the slots folded; so
+    other hosts don't need the shared memory.
+
+    """
+
+    __slots__ = ("slots", "slot", "column", "_vclock")
+
+    def __init__(
+        self,
+        *,
+        process: Process,
+        slots: SharedSlots,
+        slot: int,
+        column: int = 0,
+    ) -> None:
+        self.slots = slots
+        self.slot = slot
+        self.column = column
+        super().__init__(process=process)
+
+    def __repr__(self):
+        return f"<SharedGCounter of {self.value}; {self.process}, {self.vclock}>"
+
+    def __reduce__(self):
+        return _restore, (GCounter, {"process": self.process, "vclock": self.vclock})
+
+    @property
+    def vclock(self) -> VClock:  # type: ignore
+        self.fold()
+        return self._vclock
+
+    @vclock.setter
+    def vclock(self, value: VClock) -> None:
+        self._vclock = value
+
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.slots = self.slots
+        result.slot = self.slot
+        result.column = self.column
+        return result
+
+    def fold(self) -> None:
+        "Fold the sum of all the slots into the host's dot."
+        total = self.slots.total(self.column)
+        try:
+            current = self._vclock.find(self.process).counter
+        except ValueError:
+            current = 0
+        if total > current:
+            self._vclock = self._vclock.merge(VClock([Dot(self.process, total)]))
+
+    def incr(self, n: int = 1):
+        "Increases the counter by `n` (one by default)."
+        if n < 1:
+            raise ValueError(f"Cannot increase a counter by {n!r}")
+        self.slots.incr(self.slot, n, column=self.column)
+
+    def detach(self) -> GCounter:
+        "Return a plain `~xotl.crdt.counter.GCounter`:class: with our state."
+        result = GCounter(process=self.process)
+        result.vclock = self.vclock
+        return result
+
+    def reset(self):
+        """Reset the counter to 0.
+
+        .. warning:: This an operation that must be coordinated between
+           processes; including the workers sharing the slots.
+
+        """
+        self.slots.clear(self.column)
+        self._vclock = VClock()
+
+
+class SharedPNCounter(PNCounter):
+    """A `~xotl.crdt.counter.PNCounter`:class: backed by a `SharedSlots`:class:.
+
+    The table must have (at least) two columns: the first one holds the
+    increments and the second one the decrements.
+
+    """
+
+    __slots__ = ("slots", "slot")
+
+    def __init__(self, *, process: Process, slots: SharedSlots, slot: int) -> None:
+        if slots.columns < 2:
+            raise ValueError("A SharedPNCounter requires two columns")
+        self.slots = slots
+        self.slot = slot
+        super().__init__(process=process)
+
+    def init(self):
+        self.pos = SharedGCounter(
+            process=self.process, slots=self.slots, slot=self.slot, column=0
+        )
+        self.neg = SharedGCounter(
+            process=self.process, slots=self.slots, slot=self.slot, column=1
+        )
+
+    def _copy(self, snapshot):
+        result = super()._copy(snapshot)
+        result.slots = self.slots
+        result.slot = self.slot
+        return result
+
+    def __reduce__(self):
+        pos, neg = self.pos.detach(), self.neg.detach()
+        return _restore, (
+            PNCounter,
+            {"process": self.process, "pos": pos, "neg": neg},
+        )
+
+    def detach(self) -> PNCounter:
+        "Return a plain `~xotl.crdt.counter.PNCounter`:class: with our state."
+        result = PNCounter(process=self.process)
+        result.pos = self.pos.detach()
+        result.neg = self.neg.detach()
+        return result
+
+
+def _restore(cls, attrs):
+    # Rebuild a plain counter from the attributes of a shared one.
+    result = cls.__new__(cls)
+    for attr, value in attrs.items():
+        setattr(result, attr, value)
+    return result
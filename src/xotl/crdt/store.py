@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""A store of replicas that tracks what changed, and what each peer has seen.
+
+A node holding many CRDTs shouldn't encode all of them on each exchange with
+a peer.  `ReplicaStore`:class: gives each replica a *version*: a number taken
+from a counter local to the store, and renewed each time the replica changes.
+For each peer, the store keeps a *watermark* with the version of each replica
+the peer is known to have seen; so `~ReplicaStore.outdated`:meth: enumerates
+only the replicas that must be sent to the peer.
+
+The store can't see the mutations done directly on the replicas: use
+`~ReplicaStore.mutate`:meth: (or call `~ReplicaStore.touch`:meth:
+afterwards).  Merges should be done with `~ReplicaStore.merge`:meth:, which
+only changes the version if the merge changed the replica.
+
+"""
+
+from __future__ import annotations
+
+import typing as t
+from contextlib import contextmanager
+
+from xotl.crdt.base import CvRDT
+
+Key = t.Hashable
+
+
+class ReplicaStore(t.MutableMapping[Key, CvRDT]):
+    """A mapping of keys to replicas with change tracking.
+
+    Besides the versions and watermarks, the store keeps a *dirty set*: the
+    keys of the replicas that changed since the last call to
+    `take_dirty`:meth:.
+
+    """
+
+    def __init__(self, replicas: t.Optional[t.Mapping[Key, CvRDT]] = None) -> None:
+        self.replicas: t.Dict[Key, CvRDT] = {}
+        self.versions: t.Dict[Key, int] = {}
+        self.watermarks: t.Dict[str, t.Dict[Key, int]] = {}
+        self.dirty: t.Set[Key] = set()
+        self.clock = 0
+        if replicas:
+            self.update(replicas)
+
+    def __repr__(self):
+        return f"<ReplicaStore: {len(self)} replicas; {len(self.dirty)} dirty>"
+
+    def __getitem__(self, key: Key) -> CvRDT:
+        return self.replicas[key]
+
+    def __setitem__(self, key: Key, replica: CvRDT) -> None:
+        self.replicas[key] = replica
+        self.touch(key)
+
+    def __delitem__(self, key: Key) -> None:
+        del self.replicas[key]
+        del self.versions[key]
+        self.dirty.discard(key)
+        for marks in self.watermarks.values():
+            marks.pop(key, None)
+
+    def __iter__(self) -> t.Iterator[Key]:
+        return iter(self.replicas)
+
+    def __len__(self) -> int:
+        return len(self.replicas)
+
+    def version(self, key: Key) -> int:
+        "Return the current version of the replica at `key`."
+        return self.versions[key]
+
+    def touch(self, key: Key) -> None:
+        "Record that the replica at `key` has changed."
+        if key not in self.replicas:
+            raise KeyError(key)
+        self.clock += 1
+        self.versions[key] = self.clock
+        self.dirty.add(key)
+
+    @contextmanager
+    def mutate(self, key: Key):
+        """Return a context manager to change the replica at `key`.
+
+        The replica is marked as changed when the context exits::
+
+            with store.mutate("visitors") as counter:
+                counter.incr()
+
+        """
+        replica = self.replicas[key]
+        try:
+            yield replica
+        finally:
+            self.touch(key)
+
+    def merge(self, key: Key, other: CvRDT, *, peer: t.Optional[str] = None) -> bool:
+        """Merge `other` into the replica at `key`.
+
+        Return True if the replica changed.  If `other` comes from `peer`,
+        and the (merged) replica is not ahead of `other`, the peer has seen
+        the current version and we update its watermark.
+
+        """
+        replica = self.replicas[key]
+        changed = not (other <= replica)
+        if changed:
+            replica.merge(other)
+            self.touch(key)
+        if peer is not None and replica <= other:
+            self.ack(peer, {key: self.versions[key]})
+        return changed
+
+    def outdated(
+        self, peer: str, keys: t.Optional[t.Iterable[Key]] = None
+    ) -> t.List[Key]:
+        """Return the keys of the replicas changed since `peer` saw them.
+
+        If `keys` is given, look only those keys.
+
+        """
+        marks = self.watermarks.get(peer, {})
+        versions = self.versions
+        return [
+            key
+            for key in (self.replicas if keys is None else keys)
+            if key in versions and versions[key] > marks.get(key, 0)
+        ]
+
+    def ack(self, peer: str, versions: t.Mapping[Key, int]) -> None:
+        "Record that `peer` has seen the given `versions` of the replicas."
+        marks = self.watermarks.setdefault(peer, {})
+        for key, version in versions.items():
+            if marks.get(key, 0) < version:
+                marks[key] = version
+
+    def forget(self, peer: str) -> None:
+        "Forget the watermarks of `peer`; everything is outdated for it."
+        self.watermarks.pop(peer, None)
+
+    def take_dirty(self) -> t.Set[Key]:
+        "Return the dirty set, and start a new one."
+        result, self.dirty = self.dirty, set()
+        return result
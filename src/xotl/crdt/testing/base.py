@@ -6,30 +6,63 @@
 #
 # This is free software; you can do what the LICENCE file allows you to.
 #
-from copy import deepcopy
+import os
 from itertools import product
 from random import shuffle
 
 from hypothesis import strategies as st
-from hypothesis.stateful import Bundle, RuleBasedStateMachine, rule
+from hypothesis.stateful import Bundle, rule
 from xotl.tools.future.itertools import continuously_slides as slide
 
 from xotl.crdt.base import Process, from_state, get_state
+from xotl.crdt.testing.profiling import ProfiledMachine
+from xotl.crdt.testing.simulator import state_digest
 
-REPLICA_NODES = list(range(5))
+#: The indexes of the replicas of each machine; set the environment variable
+#: ``XOTL_CRDT_REPLICAS`` to change their number (5 by default).
+REPLICA_NODES = list(range(int(os.environ.get("XOTL_CRDT_REPLICAS", 5))))
 
+#: The default harness mode of the machines, taken from the environment
+#: variable ``XOTL_CRDT_HARNESS``: "full" or "fast".  See
+#: `BaseCRDTMachine`:class:.
+HARNESS = os.environ.get("XOTL_CRDT_HARNESS", "full")
 
-class BaseCRDTMachine(RuleBasedStateMachine):
+#: Whether the machines check the agreement of every pair of replicas, even in
+#: the fast mode.  Set the environment variable ``XOTL_CRDT_PAIRWISE``.
+PAIRWISE = bool(os.environ.get("XOTL_CRDT_PAIRWISE"))
+
+
+class BaseCRDTMachine(ProfiledMachine):
     """Base CRDT machine.
 
     It defines the `~hypothesis.stateful.Bundle`:class: 'replica' that chooses
     any of the replicas under test.  It doesn't perform any assertions.
 
+    The machines can be profiled; see `xotl.crdt.testing.profiling`:mod:.
+
     See subclasses `ModelBasedCRDTMachine`:class: and
     `SyncBasedCRDTMachine`:class:.
 
+    The harness has two modes (class attribute `fast`, which defaults to the
+    environment variable ``XOTL_CRDT_HARNESS`` being "fast"):
+
+    - In the full mode, states are transferred between replicas with
+      `~xotl.crdt.base.get_state`:func: and `~xotl.crdt.base.from_state`:func:,
+      and the agreement of every pair of replicas is checked.
+
+    - In the fast mode, states are transferred as `clones
+      <xotl.crdt.base.CvRDT.clone>`:meth:, and agreement is checked against
+      the first replica only: same value, same `digest
+      <xotl.crdt.testing.simulator.state_digest>`:func:, and ``r <= first <=
+      r``.  That's enough if ``<=`` is a partial order; set `pairwise` (or
+      ``XOTL_CRDT_PAIRWISE``) to check every pair anyway.  Encoding is still
+      tested by the rule ``from_state_get_state``.
+
     """
 
+    fast = HARNESS == "fast"
+    pairwise = PAIRWISE
+
     replicas = Bundle("replicas")  # type: ignore
     process_names = st.sampled_from(REPLICA_NODES)
 
@@ -41,6 +74,29 @@ class BaseCRDTMachine(RuleBasedStateMachine):
     def from_state_get_state(self, crdt):
         assert crdt == from_state(get_state(crdt))
 
+    @rule(crdt=replicas)
+    def clone_and_snapshot(self, crdt):
+        assert crdt == crdt.clone()
+        assert crdt == crdt.snapshot()
+
+    def transfer(self, sender):
+        "Return the state of `sender` as received by another replica."
+        if self.fast:
+            return sender.clone()
+        else:
+            return from_state(get_state(sender))
+
+    def check_convergence(self, replicas):
+        "Check that all the `replicas` have the same state."
+        first = replicas[0]
+        value, digest = first.value, state_digest(first)
+        for replica in replicas[1:]:
+            assert replica.value == value, f"{replica.value} != {value}"
+            assert state_digest(replica) == digest
+            assert replica <= first <= replica
+        if self.pairwise or not self.fast:
+            assert all(r <= s <= r for r, s in product(replicas, replicas))
+
     def create_subjects(self, cls):
         """Return a tuple of instances of `cls`.
 
@@ -87,11 +143,11 @@ class ModelBasedCRDTMachine(BaseCRDTMachine):
         """
         senders = [which for which in self.subjects if receiver is not which]  # type: ignore
         shuffle(senders)
-        before_merge = []
+        before_merge = []  # For debugging (pytest -l); not in the fast mode.
         for sender in senders:
-            state = get_state(sender)
-            before_merge.append(deepcopy(receiver))
-            receiver.merge(from_state(state))
+            if not self.fast:
+                before_merge.append(receiver.clone())
+            receiver.merge(self.transfer(sender))
             assert sender <= receiver
         model = self.model  # type: ignore
         assert receiver.value == model.value, f"{receiver.value} != {model.value}"
@@ -126,7 +182,7 @@ class SyncBasedCRDTMachine(BaseCRDTMachine):
 
         When the dust is settled we check all replicas have agreed in the
         final value, and that for any pair of replicas `a` and `b`, ``a <= b
-        <= a`` is True.
+        <= a`` is True (see `~BaseCRDTMachine.check_convergence`:meth:).
 
         Notice that there are replicas who never exchange messages; yet they
         must have reached the same conclusion.
@@ -134,19 +190,16 @@ class SyncBasedCRDTMachine(BaseCRDTMachine):
         """
         replicas = [which for which in self.subjects]  # type: ignore
         shuffle(replicas)
-        before = deepcopy(replicas)  # noqa
+        if not self.fast:
+            before = [replica.clone() for replica in replicas]  # noqa
         for sender, receiver in slide(replicas):
-            state = get_state(sender)  # type: ignore
-            receiver.merge(from_state(state))  # type: ignore
+            receiver.merge(self.transfer(sender))  # type: ignore
             assert sender <= receiver  # type: ignore
         for sender, receiver in slide(reversed(replicas)):
-            state = get_state(sender)  # type: ignore
-            receiver.merge(from_state(state))  # type: ignore
+            receiver.merge(self.transfer(sender))  # type: ignore
             assert sender <= receiver  # type: ignore
-        first = replicas[0]
-        assert all(r.value == s.value for r, s in product(replicas, replicas))
-        print(f"Agreement reached: {first.value}")
-        assert all(r <= s <= r for r, s in product(replicas, replicas))
+        self.check_convergence(replicas)
+        print(f"Agreement reached: {replicas[0].value}")
 
     def teardown(self):
         # Most likely, subclasses won't make checks; so let's perform a last
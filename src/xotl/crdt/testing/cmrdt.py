@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+from itertools import product
+from random import shuffle
+
+from hypothesis import strategies as st
+from hypothesis.stateful import precondition, rule
+
+from xotl.crdt.base import Process
+from xotl.crdt.cmrdt import (
+    OpGCounter,
+    OpLWWRegister,
+    OpORSet,
+    OpPNCounter,
+    decode_op,
+    encode_op,
+)
+from xotl.crdt.testing.base import REPLICA_NODES
+from xotl.crdt.testing.counters import ModelCounter
+from xotl.crdt.testing.profiling import ProfiledMachine
+from xotl.crdt.testing.registers import values
+
+replica_indexes = st.sampled_from(REPLICA_NODES)
+
+
+class CmRDTMachine(ProfiledMachine):
+    """Base machine for the operation-based CRDTs.
+
+    The operations emitted by the replicas are put in a simulated network,
+    from where they are delivered one at a time in any order (and possibly
+    duplicated).  `run_synchronize` delivers all pending operations and checks
+    that all replicas agree.
+
+    Subclasses must set the class attribute ``cls``; and implement rules that
+    mutate the replicas and `broadcast`:meth: the resulting operations.
+
+    """
+
+    cls: type
+
+    def __init__(self):
+        super().__init__()
+        self.subjects = tuple(
+            self.cls(process=Process(f"R{i}", i)) for i in REPLICA_NODES
+        )
+        # Each message is the index of the receiver and the encoded operation.
+        self.network = []
+
+    def broadcast(self, op):
+        "Put `op` in the network for all other replicas."
+        if op is not None:
+            state = encode_op(op)
+            for i, replica in enumerate(self.subjects):
+                if replica.process != op.process:
+                    self.network.append((i, state))
+
+    @precondition(lambda self: self.network)
+    @rule(data=st.data())
+    def deliver_one(self, data):
+        "Deliver any operation in the network."
+        i = data.draw(st.integers(min_value=0, max_value=len(self.network) - 1))
+        receiver, state = self.network.pop(i)
+        self.subjects[receiver].deliver(decode_op(state))
+
+    @precondition(lambda self: self.network)
+    @rule(data=st.data())
+    def duplicate_one(self, data):
+        "Duplicate any operation in the network."
+        i = data.draw(st.integers(min_value=0, max_value=len(self.network) - 1))
+        self.network.append(self.network[i])
+
+    @rule()
+    def run_synchronize(self):
+        """Deliver all operations in the network (in random order).
+
+        Afterwards all replicas must have applied the same operations and
+        reached the same value.
+
+        """
+        shuffle(self.network)
+        while self.network:
+            receiver, state = self.network.pop()
+            self.subjects[receiver].deliver(decode_op(state))
+        first = self.subjects[0]
+        assert all(len(replica.buffer) == 0 for replica in self.subjects)
+        assert all(r.vclock == s.vclock for r, s in product(self.subjects, repeat=2))
+        assert all(replica.value == first.value for replica in self.subjects)
+        self.check_agreement(first.value)
+
+    def check_agreement(self, value):
+        "Check the `value` all replicas agreed upon.  Does nothing by default."
+
+    def teardown(self):
+        self.run_synchronize()
+        super().teardown()
+
+
+class OpGCounterMachine(CmRDTMachine):
+    cls = OpGCounter
+
+    def __init__(self):
+        super().__init__()
+        self.model = ModelCounter()
+
+    @rule(index=replica_indexes, n=st.integers(min_value=1, max_value=1000))
+    def run_incr(self, index, n):
+        replica = self.subjects[index]
+        value = replica.value
+        self.broadcast(replica.incr(n))
+        assert value + n == replica.value
+        self.model.incr(n)
+
+    def check_agreement(self, value):
+        assert value == self.model.value
+
+
+class OpPNCounterMachine(OpGCounterMachine):
+    cls = OpPNCounter
+
+    @rule(index=replica_indexes, n=st.integers(min_value=1, max_value=1000))
+    def run_decr(self, index, n):
+        replica = self.subjects[index]
+        value = replica.value
+        self.broadcast(replica.decr(n))
+        assert value - n == replica.value
+        self.model.decr(n)
+
+
+class OpLWWRegisterMachine(CmRDTMachine):
+    cls = OpLWWRegister
+
+    @rule(index=replica_indexes, value=values)
+    def set_value(self, index, value):
+        replica = self.subjects[index]
+        self.broadcast(replica.set(value))
+        assert replica.value == value
+
+
+class OpORSetMachine(CmRDTMachine):
+    cls = OpORSet
+
+    @rule(index=replica_indexes, item=st.integers(min_value=0, max_value=10))
+    def add_item(self, index, item):
+        replica = self.subjects[index]
+        self.broadcast(replica.add(item))
+        assert item in replica
+
+    @rule(index=replica_indexes, item=st.integers(min_value=0, max_value=10))
+    def remove_item(self, index, item):
+        replica = self.subjects[index]
+        self.broadcast(replica.remove(item))
+        assert item not in replica
+
+    @rule(
+        index1=replica_indexes,
+        index2=replica_indexes,
+        item=st.integers(min_value=0, max_value=10),
+    )
+    def simulate_concurrent_add_remove(self, index1, index2, item):
+        """Simulates add of item in one replica concurrent with its removal
+        in another one; the addition wins.
+
+        """
+        if index1 != index2:
+            self.run_synchronize()
+            adder, remover = self.subjects[index1], self.subjects[index2]
+            added, removed = adder.add(item), remover.remove(item)
+            self.broadcast(added)
+            self.broadcast(removed)
+            self.run_synchronize()
+            assert all(item in replica for replica in self.subjects)
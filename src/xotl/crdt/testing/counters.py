@@ -6,6 +6,7 @@
 #
 # This is free software; you can do what the LICENCE file allows you to.
 #
+from hypothesis import strategies as st
 from hypothesis.stateful import rule
 
 from xotl.crdt.counter import GCounter, PNCounter
@@ -26,14 +27,14 @@ class ModelCounter:
     def reset(self):
         self.value = 0
 
-    def incr(self):
-        """Increment the model's value by 1."""
-        self.value += 1
+    def incr(self, n=1):
+        """Increment the model's value by `n`."""
+        self.value += n
         return self.value
 
-    def decr(self):
-        """Decrement the model's value by 1."""
-        self.value -= 1
+    def decr(self, n=1):
+        """Decrement the model's value by `n`."""
+        self.value -= n
         return self.value
 
     def __repr__(self):
@@ -57,6 +58,18 @@ class CounterMachine(ModelBasedCRDTMachine):
         assert value + 1 == replica.value
         self.model.incr()
 
+    @rule(replica=ModelBasedCRDTMachine.replicas, n=st.integers(min_value=1))
+    def run_incr_many(self, replica, n):
+        """Increment the value of a single random `replica` by `n`.
+
+        We also increment the model's.
+
+        """
+        value = replica.value
+        replica.incr(n)
+        assert value + n == replica.value
+        self.model.incr(n)
+
 
 class GCounterMachine(CounterMachine):
     def __init__(self):
@@ -80,3 +93,15 @@ class PNCounterMachine(CounterMachine):
         replica.decr()
         assert value - 1 == replica.value
         self.model.decr()
+
+    @rule(replica=ModelBasedCRDTMachine.replicas, n=st.integers(min_value=1))
+    def run_decr_many(self, replica, n):
+        """Decrement the value of a single random `replica` by `n`.
+
+        We also decrement the model's.
+
+        """
+        value = replica.value
+        replica.decr(n)
+        assert value - n == replica.value
+        self.model.decr(n)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Profile the CRDTs with the workloads of the state machines.
+
+Set the environment variable ``XOTL_CRDT_PROFILE`` to a directory and run the
+stateful tests::
+
+    XOTL_CRDT_PROFILE=profiles pytest src/tests
+
+For each machine class, the rules and the teardown of every run (each
+example hypothesis tries) are profiled with `cProfile`:mod:,
+`tracemalloc`:mod: and the `metrics <xotl.crdt.base.set_metrics_sink>`:func:
+of the CRDTs; the drawing of examples by hypothesis is not.  When the Python
+process exits, we write two files in the directory:
+
+``<Machine>.pstats``
+   The `cProfile`:mod: statistics of all the runs; load them with
+   `pstats.Stats`:class:.
+
+``<Machine>.txt``
+   A report with the calls, wall time, allocated bytes and merges of each
+   rule; the metrics of the CRDTs; and the functions with the highest
+   cumulative time.
+
+Profiling slows the tests down a lot (tracemalloc more than cProfile); the
+times are only meaningful relative to each other.
+
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+import typing as t
+from dataclasses import dataclass
+from functools import wraps
+from time import perf_counter
+
+from hypothesis.stateful import RuleBasedStateMachine
+
+from xotl.crdt.base import Metrics, MetricsSink, set_metrics_sink
+
+ENV_VAR = "XOTL_CRDT_PROFILE"
+
+
+@dataclass
+class RuleStats:
+    """The statistics of a rule.
+
+    `allocated` is the net number of bytes allocated by the rule (what
+    remains allocated after it returns); `peak` is the highest memory used
+    by a single call over the memory before the call.
+
+    """
+
+    calls: int = 0
+    seconds: float = 0.0
+    allocated: int = 0
+    peak: int = 0
+    merges: int = 0
+
+
+class Profile:
+    """The profile of all the runs of a state machine class."""
+
+    def __init__(self, name: str, directory: str) -> None:
+        self.name = name
+        self.directory = directory
+        self.rules: t.Dict[str, RuleStats] = {}
+        self.metrics = Metrics()
+        self.profiler = cProfile.Profile()
+        self.runs = 0
+        self.measured_rules: t.Optional[t.List[t.Any]] = None
+        self.previous: t.Optional[MetricsSink] = None
+        self.tracing = False
+
+    def __repr__(self):
+        return f"<Profile of {self.name}: {self.runs} runs>"
+
+    def start(self) -> None:
+        "Start profiling a run."
+        self.runs += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracing = True
+        self.previous = set_metrics_sink(self.metrics)
+
+    def stop(self) -> None:
+        "Stop profiling a run."
+        set_metrics_sink(self.previous)
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+    def measure(self, rules: t.Iterable[t.Any]) -> t.List[t.Any]:
+        "Return copies of the hypothesis `rules` whose calls are measured."
+        if self.measured_rules is None:
+            self.measured_rules = []
+            for rule in rules:
+                measured = copy.copy(rule)
+                measured.function = self._measured(rule.function)
+                self.measured_rules.append(measured)
+        return self.measured_rules
+
+    def _measured(self, function):
+        stats = self.rules.setdefault(function.__name__, RuleStats())
+
+        @wraps(function)
+        def wrapper(machine, **data):
+            merges = self.merges
+            tracing = tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+            start = perf_counter()
+            try:
+                return self.profiler.runcall(function, machine, **data)
+            finally:
+                stats.seconds += perf_counter() - start
+                stats.calls += 1
+                stats.merges += self.merges - merges
+                if tracing:
+                    after, peak = tracemalloc.get_traced_memory()
+                    stats.allocated += after - before
+                    stats.peak = max(stats.peak, peak - before)
+
+        return wrapper
+
+    @property
+    def merges(self) -> int:
+        "The number of merges done so far, of all the CRDTs."
+        counters = self.metrics.counters
+        return sum(n for (_, metric), n in counters.items() if metric == "merge")
+
+    def report(self) -> str:
+        "Return the report of the profile."
+        out = io.StringIO()
+        print(f"{self.name}: {self.runs} runs", file=out)
+        print(file=out)
+        print(
+            f"{'rule':<32} {'calls':>8} {'seconds':>10} "
+            f"{'allocated':>12} {'peak':>10} {'merges':>8}",
+            file=out,
+        )
+        ranking = sorted(self.rules.items(), key=lambda kv: -kv[1].seconds)
+        for name, stats in ranking:
+            print(
+                f"{name:<32} {stats.calls:>8} {stats.seconds:>10.4f} "
+                f"{stats.allocated:>12} {stats.peak:>10} {stats.merges:>8}",
+                file=out,
+            )
+        print(file=out)
+        for (kind, metric), n in sorted(self.metrics.counters.items()):
+            line = f"{kind + '.' + metric:<40} {n:>8}"
+            histogram = self.metrics.histograms.get((kind, f"{metric}.seconds"))
+            if histogram is not None:
+                line += f" {histogram.mean * 1e6:>12.1f} us/call"
+            print(line, file=out)
+        if self.runs:
+            print(file=out)
+            profile_stats = pstats.Stats(self.profiler, stream=out)
+            profile_stats.sort_stats("cumulative").print_stats(20)
+        return out.getvalue()
+
+    def write(self) -> None:
+        "Write the statistics and the report in the directory."
+        if not self.runs:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        filename = os.path.join(self.directory, self.name)
+        self.profiler.dump_stats(filename + ".pstats")
+        with open(filename + ".txt", "w") as f:
+            f.write(self.report())
+
+
+_PROFILES: t.Dict[type, Profile] = {}
+
+
+def get_profile(cls: type) -> t.Optional[Profile]:
+    """Return the profile of the machine class `cls`.
+
+    Return None if profiling is disabled (the environment variable
+    ``XOTL_CRDT_PROFILE`` is not set).  The profile is written when Python
+    exits.
+
+    """
+    directory = os.environ.get(ENV_VAR)
+    if not directory:
+        return None
+    result = _PROFILES.get(cls)
+    if result is None:
+        result = _PROFILES[cls] = Profile(cls.__qualname__, directory)
+        atexit.register(result.write)
+    return result
+
+
+class ProfiledMachine(RuleBasedStateMachine):
+    """A machine which is profiled if ``XOTL_CRDT_PROFILE`` is set.
+
+    Each run is profiled from the creation of the machine to the end of its
+    ``teardown``.
+
+    """
+
+    @classmethod
+    def rules(cls):
+        result = super().rules()
+        profile = get_profile(cls)
+        return result if profile is None else profile.measure(result)
+
+    def __init__(self):
+        super().__init__()
+        self.profile = get_profile(type(self))
+        if self.profile is not None:
+            self.profile.start()
+
+    def teardown(self):
+        profile = self.profile
+        if profile is None:
+            super().teardown()
+        else:
+            try:
+                profile.profiler.runcall(super().teardown)
+            finally:
+                profile.stop()
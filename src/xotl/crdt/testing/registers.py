@@ -14,6 +14,7 @@ from hypothesis import strategies as st
 from hypothesis.stateful import rule
 
 from xotl.crdt.base import Process
+from xotl.crdt.content import StoredLWWRegister
 from xotl.crdt.register import LWWRegister
 from xotl.crdt.testing.base import ModelBasedCRDTMachine, SyncBasedCRDTMachine
 
@@ -149,3 +150,23 @@ class LWWRegisterConcurrentMachine(SyncBasedCRDTMachine):
     def teardown(self):
         print("---------------- End case --------------------")
         super().teardown()
+
+
+class StoredLWWRegisterMachine(LWWRegisterMachine):
+    """The stateful machinery to test `~xotl.crdt.content.StoredLWWRegister`:class:.
+
+    All replicas (and the decoded ones) share the default store.
+
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.subjects = self.create_subjects(StoredLWWRegister)
+
+
+class StoredLWWRegisterConcurrentMachine(LWWRegisterConcurrentMachine):
+    "The concurrent machine with `~xotl.crdt.content.StoredLWWRegister`:class:."
+
+    def __init__(self):
+        super().__init__()
+        self.subjects = self.create_subjects(StoredLWWRegister)
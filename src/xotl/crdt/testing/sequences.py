@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+from hypothesis import strategies as st
+from hypothesis.stateful import invariant, rule
+
+from xotl.crdt.sequence import RGA
+from xotl.crdt.testing.base import SyncBasedCRDTMachine
+
+positions = st.integers(min_value=-10, max_value=10)
+
+
+class RGAMachine(SyncBasedCRDTMachine):
+    """The stateful machinery to test `~xotl.crdt.sequence.RGA`:class:.
+
+    Each rule changes a single replica and checks it against a list with the
+    same changes.
+
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.subjects = self.create_subjects(RGA)
+
+    @invariant()
+    def sizes(self):
+        "The cached size of each replica matches its value."
+        for replica in self.subjects:
+            assert replica.size == len(replica.value)
+
+    @rule(
+        replica=SyncBasedCRDTMachine.replicas,
+        index=positions,
+        item=st.integers(),
+    )
+    def insert(self, replica, index, item):
+        expected = list(replica.value)
+        expected.insert(index, item)
+        replica.insert(index, item)
+        assert list(replica.value) == expected
+
+    @rule(
+        replica=SyncBasedCRDTMachine.replicas,
+        index=positions,
+        items=st.lists(st.integers(), max_size=5),
+    )
+    def insert_many(self, replica, index, items):
+        expected = list(replica.value)
+        expected[index:index] = items
+        replica.insert_many(index, items)
+        assert list(replica.value) == expected
+
+    @rule(replica=SyncBasedCRDTMachine.replicas, index=positions)
+    def delete(self, replica, index):
+        expected = list(replica.value)
+        if -len(expected) <= index < len(expected):
+            del expected[index]
+            replica.delete(index)
+        assert list(replica.value) == expected
+
+    @rule(replica=SyncBasedCRDTMachine.replicas, start=positions, stop=positions)
+    def delete_many(self, replica, start, stop):
+        expected = list(replica.value)
+        del expected[start:stop]
+        replica.delete_many(start, stop)
+        assert list(replica.value) == expected
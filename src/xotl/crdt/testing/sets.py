@@ -7,14 +7,17 @@
 # This is free software; you can do what the LICENCE file allows you to.
 #
 from dataclasses import dataclass, field
+from functools import partial
 from typing import Any
 
 from hypothesis import assume
 from hypothesis import strategies as st
-from hypothesis.stateful import Bundle, consumes, rule
+from hypothesis.stateful import Bundle, consumes, invariant, rule
 from xotl.tools.symbols import Unset
 
-from xotl.crdt.sets import GSet, ORSet, TwoPhaseSet, USet
+from xotl.crdt.concurrent import ConcurrentGSet, ConcurrentTwoPhaseSet
+from xotl.crdt.sets import AWSet, GSet, ORSet, TwoPhaseSet, USet, items_digest
+from xotl.crdt.sharded import ShardedGSet, ShardedORSet
 from xotl.crdt.testing.base import ModelBasedCRDTMachine, SyncBasedCRDTMachine
 
 atoms = (
@@ -45,6 +48,10 @@ class Set:
         "Add item to the set."
         self.value.add(item)
 
+    def add_many(self, items):
+        "Add all items to the set."
+        self.value.update(items)
+
 
 class GSetMachine(ModelBasedCRDTMachine):
     """The stateful machinery to test the `~xotl.crdt.sets.GSet`:class:."""
@@ -60,6 +67,12 @@ class GSetMachine(ModelBasedCRDTMachine):
         self.model.add(item)
         replica.add(item)
 
+    @rule(replica=ModelBasedCRDTMachine.replicas, items=st.lists(values, max_size=5))
+    def add_items(self, replica, items):
+        "Add several items to an arbitrary replica"
+        self.model.add_many(items)
+        replica.update(items)
+
     @rule(item=values)
     def reset_all_replicas_with_item(self, item):
         "Reset all replicas with a the set ``{item}``"
@@ -68,6 +81,28 @@ class GSetMachine(ModelBasedCRDTMachine):
         for replica in self.subjects:
             replica.reset({item})
 
+    @invariant()
+    def digests_are_consistent(self):
+        "The rolling digest of each replica matches its items."
+        for replica in self.subjects:
+            assert replica.digest == items_digest(replica.value)
+
+
+class ConcurrentGSetMachine(GSetMachine):
+    """The stateful machinery to test `~xotl.crdt.concurrent.ConcurrentGSet`:class:."""
+
+    def __init__(self):
+        super().__init__()
+        self.subjects = self.create_subjects(ConcurrentGSet)
+
+
+class ShardedGSetMachine(GSetMachine):
+    """The stateful machinery to test `~xotl.crdt.sharded.ShardedGSet`:class:."""
+
+    def __init__(self):
+        super().__init__()
+        self.subjects = self.create_subjects(partial(ShardedGSet, shards=4))
+
 
 class TPSetMachine(SyncBasedCRDTMachine):
     """The stateful machinery to test the `~xotl.crdt.sets.TwoPhaseSet`:class:."""
@@ -91,6 +126,17 @@ class TPSetMachine(SyncBasedCRDTMachine):
         "Remove an item (if present) from an arbitrary replica"
         replica.remove(item)
 
+    @rule(replica=SyncBasedCRDTMachine.replicas, items=st.lists(items, max_size=5))
+    def add_items(self, replica, items):
+        "Add several items to an arbitrary replica"
+        replica.add_many(items)
+
+    @rule(replica=SyncBasedCRDTMachine.replicas, items=st.lists(items, max_size=5))
+    def remove_items(self, replica, items):
+        "Remove several items (if present) from an arbitrary replica"
+        removed = replica.remove_many(items)
+        assert not (removed & replica.value)
+
     @rule(item=items)
     def reset_all_replicas_with_item(self, item):
         "Reset all replicas with the set ``{item}``."
@@ -100,6 +146,17 @@ class TPSetMachine(SyncBasedCRDTMachine):
             assert item in replica.value, f"{item} is not present in {replica}"
 
 
+class ConcurrentTPSetMachine(TPSetMachine):
+    """The stateful machinery to test
+    `~xotl.crdt.concurrent.ConcurrentTwoPhaseSet`:class:.
+
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.subjects = self.create_subjects(ConcurrentTwoPhaseSet)
+
+
 @dataclass(unsafe_hash=True)
 class Item:
     payload: Any
@@ -213,6 +270,24 @@ class ORSetMachine(SyncBasedSetMachine):
         replica.remove(item)
         print(f"       Result: {replica}")
 
+    @rule(
+        replica=SyncBasedCRDTMachine.replicas,
+        items=st.lists(SyncBasedSetMachine.items, max_size=5),
+    )
+    def add_items(self, replica, items):
+        print(f"Adding items {items} in replica {replica}")
+        replica.add_many(items)
+        assert all(item in replica.value for item in items)
+
+    @rule(
+        replica=SyncBasedCRDTMachine.replicas,
+        items=st.lists(SyncBasedSetMachine.items, max_size=5),
+    )
+    def remove_items(self, replica, items):
+        print(f"Remove items {items}; if present in {replica}")
+        replica.remove_many(items)
+        assert not any(item in replica.value for item in items)
+
     @rule(
         replica1=SyncBasedCRDTMachine.replicas,
         replica2=SyncBasedCRDTMachine.replicas,
@@ -231,3 +306,19 @@ class ORSetMachine(SyncBasedSetMachine):
     def teardown(self):
         super().teardown()
         print("------------ End ORSet case -------------")
+
+
+class ShardedORSetMachine(ORSetMachine):
+    """The stateful machinery to test `~xotl.crdt.sharded.ShardedORSet`:class:."""
+
+    def __init__(self):
+        super().__init__()
+        self.subjects = self.create_subjects(partial(ShardedORSet, shards=4))
+
+
+class AWSetMachine(ORSetMachine):
+    """The stateful machinery to test `~xotl.crdt.sets.AWSet`:class:."""
+
+    def __init__(self):
+        super().__init__()
+        self.subjects = self.create_subjects(AWSet)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""A deterministic discrete-event simulator of the convergence of CRDTs.
+
+The state machines of `xotl.crdt.testing.base`:mod: run a handful of
+replicas over a fixed topology.  `Simulator`:class: runs many replicas of any
+CvRDT (hundreds are fine) over a simulated network with latency, loss,
+duplication, reordering and partitions; all the random choices come from a
+seeded `random.Random`:class:, so a simulation can be repeated exactly.
+
+Time is measured in *rounds*: at the start of each round, every replica
+gossips with `fanout` random peers.  Latencies are fractions of a round.  The
+strategies are:
+
+``full``
+   Send the whole state to each peer.
+
+``delta``
+   Send the state only if it changed since the peer acknowledged it.  Each
+   replica is held in a `~xotl.crdt.store.ReplicaStore`:class:, and peers
+   acknowledge the versions they receive.  (The CRDTs of this package have
+   no delta mutators, so the whole state is sent when it's sent.)
+
+``digest``
+   Send a digest of the state.  A peer whose digest differs replies with its
+   state, and the sender replies with the merged state if the peer is
+   missing something.
+
+The `Report`:class: of a simulation gives the rounds until all the replicas
+converged, the messages and bytes sent, and the CPU time spent merging.
+Bytes are those of the states (as encoded by
+`~xotl.crdt.base.get_state`:func:); digests and acknowledgments count 8
+bytes each.
+
+.. note:: `~xotl.crdt.sets.ORSet`:class: may not converge when items are
+   removed concurrently: merging concurrent states takes the union of their
+   tagged items.  Use `~xotl.crdt.sets.AWSet`:class: instead.
+
+"""
+
+from __future__ import annotations
+
+import heapq
+import typing as t
+from dataclasses import dataclass, field
+from itertools import count
+from random import Random
+from time import thread_time
+
+from xotl.crdt.base import CvRDT, Process, from_state, get_state
+from xotl.crdt.store import ReplicaStore
+
+STRATEGIES = ("full", "delta", "digest")
+DIGEST_SIZE = 8
+KEY = "crdt"
+
+Workload = t.Callable[[CvRDT, Random], None]
+
+
+def state_digest(replica: CvRDT) -> int:
+    """Return a digest of the state of `replica`.
+
+    Equal states have equal digests (in the same Python process).  We use
+    the `~xotl.crdt.sets.GSet.digest`:attr: of grow-only sets, and the vector
+    clock of the CRDTs that have one; composite CRDTs (and lists of CRDTs,
+    like the shards of a `~xotl.crdt.sharded.ShardedSet`:class:) combine the
+    digests of their parts.  Otherwise, we hash the value.
+
+    """
+    digest = getattr(replica, "digest", None)
+    if isinstance(digest, int):
+        return digest
+    vclock = getattr(replica, "vclock", None)
+    if vclock is not None:
+        return hash(vclock)
+    parts = []
+    for cls in type(replica).__mro__:
+        for slot in cls.__dict__.get("__slots__", ()):
+            attr = getattr(replica, slot, None)
+            if isinstance(attr, CvRDT):
+                parts.append(attr)
+            elif isinstance(attr, list) and all(isinstance(x, CvRDT) for x in attr):
+                parts.extend(attr)
+    if parts:
+        return hash(tuple(state_digest(part) for part in parts))
+    return hash(replica.value)
+
+
+@dataclass(frozen=True)
+class Partition:
+    """A partition of the network between the rounds `start` and `end`.
+
+    `groups` are collections of indexes of replicas.  While the partition is
+    active, replicas in different groups can't communicate; nor can the
+    replicas which are not in any group.
+
+    """
+
+    groups: t.Sequence[t.Collection[int]]
+    start: float
+    end: float
+
+    def separates(self, a: int, b: int, time: float) -> bool:
+        "True if the replicas `a` and `b` can't communicate at `time`."
+        if not (self.start <= time < self.end):
+            return False
+        return not any(a in group and b in group for group in self.groups)
+
+
+@dataclass
+class Report:
+    """The results of a simulation.
+
+    `rounds` is the number of rounds run until the replicas converged (or
+    until the limit, if `converged` is False).  `lost` counts the messages
+    dropped by the network or by partitions.
+
+    """
+
+    strategy: str
+    replicas: int
+    converged: bool = False
+    rounds: int = 0
+    messages: int = 0
+    lost: int = 0
+    duplicated: int = 0
+    bytes: int = 0
+    merges: int = 0
+    merge_seconds: float = 0.0
+
+    def __str__(self):
+        outcome = "converged" if self.converged else "did not converge"
+        return (
+            f"{self.strategy}: {outcome} after {self.rounds} rounds; "
+            f"{self.messages} messages ({self.lost} lost), {self.bytes} bytes; "
+            f"{self.merges} merges in {self.merge_seconds:.3f}s"
+        )
+
+
+@dataclass(order=True)
+class _Event:
+    time: float
+    seq: int
+    receiver: int = field(compare=False)
+    kind: str = field(compare=False)
+    sender: int = field(compare=False)
+    payload: t.Any = field(compare=False)
+
+
+class Simulator:
+    """Simulate the gossip of `replicas` replicas built by `factory`.
+
+    :param factory: A callable that takes the keyword argument `process` and
+                    returns a new replica (e.g. a CvRDT class).
+
+    :param latency: The range of the latency of messages (in rounds).
+
+    :param loss: The probability that a message is lost.
+
+    :param duplication: The probability that a message is delivered twice.
+
+    :param reordering: The probability that a message is delayed one more
+                       round, so that it arrives after later messages.
+
+    :param partitions: The `partitions <Partition>`:class: of the network.
+
+    :param digest: The function to compute the digests of the states for the
+                   ``digest`` strategy.
+
+    """
+
+    def __init__(
+        self,
+        factory: t.Callable[..., CvRDT],
+        replicas: int = 100,
+        *,
+        strategy: str = "full",
+        fanout: int = 1,
+        seed: int = 0,
+        latency: t.Tuple[float, float] = (0.1, 0.5),
+        loss: float = 0.0,
+        duplication: float = 0.0,
+        reordering: float = 0.0,
+        partitions: t.Sequence[Partition] = (),
+        digest: t.Callable[[CvRDT], int] = state_digest,
+    ) -> None:
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Invalid strategy: {strategy!r}")
+        if replicas < 2:
+            raise ValueError(f"Invalid number of replicas: {replicas!r}")
+        self.strategy = strategy
+        self.fanout = min(fanout, replicas - 1)
+        self.random = Random(seed)
+        # The updates have their own generator, so that they are the same
+        # regardless of the strategy and the faults of the network.
+        self.updates = Random(f"updates:{seed}")
+        self.latency = latency
+        self.loss = loss
+        self.duplication = duplication
+        self.reordering = reordering
+        self.partitions = list(partitions)
+        self.digest = digest
+        self.replicas = [
+            factory(process=Process(f"R{i}", i)) for i in range(replicas)
+        ]
+        self.stores = [ReplicaStore({KEY: replica}) for replica in self.replicas]
+        self.names = [replica.process.name for replica in self.replicas]
+        self.report = Report(strategy=strategy, replicas=replicas)
+        self.time = 0.0
+        self.queue: t.List[_Event] = []
+        self.seq = count()
+
+    def __repr__(self):
+        return f"<Simulator: {len(self.replicas)} replicas; {self.strategy}>"
+
+    def update(self, index: int, workload: Workload) -> None:
+        "Apply `workload` to the replica at `index`."
+        with self.stores[index].mutate(KEY) as replica:
+            workload(replica, self.updates)
+
+    def run(
+        self,
+        workload: Workload,
+        *,
+        updates: int = 100,
+        update_rounds: int = 1,
+        max_rounds: int = 1000,
+    ) -> Report:
+        """Run the simulation and return its report.
+
+        `workload` is called `updates` times with a random replica (and a
+        seeded random generator) to change it.  The updates are spread over the
+        first `update_rounds` rounds.  Then the replicas gossip until they
+        converge, or until `max_rounds` rounds have run.
+
+        """
+        report = self.report
+        size = len(self.replicas)
+        for n in range(max_rounds):
+            if n < update_rounds:
+                share = updates // update_rounds + (n < updates % update_rounds)
+                for _ in range(share):
+                    self.update(self.updates.randrange(size), workload)
+            self._deliver_until(float(n))
+            self.time = float(n)
+            self._round()
+            self._deliver_until(n + 1.0)
+            report.rounds = n + 1
+            if n + 1 >= update_rounds and self.converged():
+                report.converged = True
+                break
+        return report
+
+    def converged(self) -> bool:
+        "True if all the replicas have the same state."
+        first = self.replicas[0]
+        value = first.value
+        return all(
+            replica.value == value and replica <= first and first <= replica
+            for replica in self.replicas[1:]
+        )
+
+    def _round(self) -> None:
+        random, size = self.random, len(self.replicas)
+        for index, replica in enumerate(self.replicas):
+            others = random.sample(range(size - 1), self.fanout)
+            peers = [peer if peer < index else peer + 1 for peer in others]
+            if self.strategy == "full":
+                state = get_state(replica)
+                for peer in peers:
+                    self._send(index, peer, "state", (state, None))
+            elif self.strategy == "delta":
+                store = self.stores[index]
+                for peer in peers:
+                    if store.outdated(self.names[peer]):
+                        payload = (get_state(replica), store.version(KEY))
+                        self._send(index, peer, "state", payload)
+            else:
+                digest = self.digest(replica)
+                for peer in peers:
+                    self._send(index, peer, "digest", digest)
+
+    def _send(self, sender: int, receiver: int, kind: str, payload) -> None:
+        random, report = self.random, self.report
+        report.messages += 1
+        if kind in ("state", "want"):
+            report.bytes += len(payload[0])
+        else:
+            report.bytes += DIGEST_SIZE
+        if random.random() < self.loss or any(
+            p.separates(sender, receiver, self.time) for p in self.partitions
+        ):
+            report.lost += 1
+            return
+        copies = 1
+        if random.random() < self.duplication:
+            report.duplicated += 1
+            copies = 2
+        for _ in range(copies):
+            delay = random.uniform(*self.latency)
+            if random.random() < self.reordering:
+                delay += 1
+            event = _Event(
+                self.time + delay, next(self.seq), receiver, kind, sender, payload
+            )
+            heapq.heappush(self.queue, event)
+
+    def _deliver_until(self, time: float) -> None:
+        queue = self.queue
+        while queue and queue[0].time < time:
+            event = heapq.heappop(queue)
+            self.time = event.time
+            self._receive(event)
+
+    def _receive(self, event: _Event) -> None:
+        index, sender, kind = event.receiver, event.sender, event.kind
+        replica = self.replicas[index]
+        if kind == "state":
+            state, version = event.payload
+            self._merge(index, from_state(state), sender)
+            if version is not None:
+                self._send(index, sender, "ack", version)
+        elif kind == "ack":
+            self.stores[index].ack(self.names[sender], {KEY: event.payload})
+        elif kind == "digest":
+            if self.digest(replica) != event.payload:
+                self._send(index, sender, "want", (get_state(replica), None))
+        elif kind == "want":
+            other = from_state(event.payload[0])
+            self._merge(index, other, sender)
+            if not (replica <= other):
+                self._send(index, sender, "state", (get_state(replica), None))
+        else:
+            raise ValueError(f"Invalid message: {kind!r}")  # pragma: no cover
+
+    def _merge(self, index: int, other: CvRDT, sender: int) -> None:
+        start = thread_time()
+        self.stores[index].merge(KEY, other, peer=self.names[sender])
+        self.report.merge_seconds += thread_time() - start
+        self.report.merges += 1
+
+
+def compare_strategies(
+    factory: t.Callable[..., CvRDT],
+    workload: Workload,
+    replicas: int = 100,
+    *,
+    strategies: t.Sequence[str] = STRATEGIES,
+    updates: int = 100,
+    update_rounds: int = 1,
+    max_rounds: int = 1000,
+    **options,
+) -> t.Dict[str, Report]:
+    """Run the same simulation with each of the `strategies`.
+
+    The other `options` are passed to `Simulator`:class:; with the same seed,
+    all the simulations apply the same updates to the same replicas.
+
+    """
+    return {
+        strategy: Simulator(factory, replicas, strategy=strategy, **options).run(
+            workload,
+            updates=updates,
+            update_rounds=update_rounds,
+            max_rounds=max_rounds,
+        )
+        for strategy in strategies
+    }